@@ -0,0 +1,103 @@
+"""Documentação Swagger da API.
+
+As rotas registram a especificação com o `swag_from` deste módulo, que só
+guarda o dicionário na função (no atributo que o flasgger lê) sem envolvê-la
+nem importar o flasgger. O flasgger, e com ele o Swagger UI em /apidocs/,
+só é carregado com SWAGGER_ENABLED=1 (desabilitado por padrão, como em
+produção; o docker-compose local o habilita). Se APISPEC_FILE apontar para um
+apispec.json gerado no build, a especificação é lida do arquivo em vez de
+ser montada a partir das rotas no primeiro acesso de cada worker.
+
+Uso:
+    python apidocs.py [apispec.json]    # gera a especificação em arquivo
+"""
+import json
+import os
+import sys
+from flask import Response
+
+SWAGGER_ENABLED = os.getenv("SWAGGER_ENABLED", "0") == "1"
+APISPEC_FILE = os.getenv("APISPEC_FILE")
+
+SPEC_ENDPOINT = "apispec"
+SPEC_ROUTE = "/apispec.json"
+DOCS_ROUTE = "/apidocs/"
+
+SWAGGER_TEMPLATE = {
+    "swagger": "2.0",
+    "info": {
+        "title": "Lumína - Sistema de Gerenciamento Escolar",
+        "description": "API RESTful completa para gerenciamento de escola infantil",
+        "version": "1.0.0"
+    },
+    "host": "localhost:5000",
+    "basePath": "/",
+    "schemes": ["http"]
+}
+
+
+def swag_from(specs):
+    """Associa a especificação Swagger (dicionário) à função da rota"""
+    def decorator(function):
+        function.specs_dict = specs
+        return function
+    return decorator
+
+def _load_spec_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def init_docs(app):
+    """Registra /apispec.json e, se habilitado, o Swagger UI em /apidocs/.
+
+    Retorna a instância do Swagger, ou None com a documentação desabilitada.
+    """
+    prebuilt = _load_spec_file(APISPEC_FILE) if APISPEC_FILE and os.path.exists(APISPEC_FILE) else None
+    if not SWAGGER_ENABLED:
+        if prebuilt is not None:
+            app.add_url_rule(SPEC_ROUTE, SPEC_ENDPOINT,
+                             lambda: Response(prebuilt, mimetype="application/json"), methods=["GET"])
+        return None
+
+    from flasgger import Swagger
+
+    def documented(rule):
+        return hasattr(app.view_functions.get(rule.endpoint), "specs_dict")
+
+    config = {
+        "headers": [],
+        "specs": [
+            {
+                "endpoint": SPEC_ENDPOINT,
+                "route": SPEC_ROUTE,
+                "rule_filter": documented,
+                "model_filter": lambda tag: True,
+            }
+        ],
+        "static_url_path": "/flasgger_static",
+        "swagger_ui": True,
+        "specs_route": DOCS_ROUTE
+    }
+    swagger = Swagger(app, config=config, template=SWAGGER_TEMPLATE)
+    if prebuilt is not None:
+        # Fora do modo debug o flasgger responde com o que já está em cache
+        swagger.apispecs[SPEC_ENDPOINT] = json.loads(prebuilt)
+    return swagger
+
+def build_spec(app, swagger):
+    """Monta a especificação a partir das rotas registradas"""
+    with app.test_request_context("/"):
+        return swagger.get_apispecs(SPEC_ENDPOINT)
+
+def main(argv):
+    os.environ["SWAGGER_ENABLED"] = "1"
+    os.environ.pop("APISPEC_FILE", None)
+    from app import app, swagger
+    output = argv[1] if len(argv) > 1 else "apispec.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(build_spec(app, swagger), f, ensure_ascii=False, sort_keys=True, default=str)
+    print(f"Especificação gravada em {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
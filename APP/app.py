@@ -1,5 +1,5 @@
-from flask import Flask
-from flasgger import Swagger
+from flask import Flask, request
+from apidocs import DOCS_ROUTE, SWAGGER_ENABLED, init_docs
 from routes.aluno import aluno_bp
 from routes.turma import turma_bp
 from routes.professor import professor_bp
@@ -8,6 +8,15 @@ from routes.presenca import presenca_bp
 from routes.atividade import atividade_bp
 from routes.atividade_aluno import atividade_aluno_bp
 from routes.usuario import usuario_bp
+from routes.batch import batch_bp
+from cache import reference_cache
+from compression import init_compression
+from db import connect_db, pool_stats
+from json_provider import init_json
+from log_config import init_logging
+from metrics import init_metrics
+from migrate import apply_migrations
+from prepared import plan_stats, prepared_stats
 import os
 
 app = Flask(__name__)
@@ -16,35 +25,21 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['JSON_SORT_KEYS'] = False
 
-# Configuração do Swagger
-swagger_config = {
-    "headers": [],
-    "specs": [
-        {
-            "endpoint": 'apispec',
-            "route": '/apispec.json',
-            "rule_filter": lambda rule: True,
-            "model_filter": lambda tag: True,
-        }
-    ],
-    "static_url_path": "/flasgger_static",
-    "swagger_ui": True,
-    "specs_route": "/apidocs/"
-}
+# Serialização JSON das respostas (orjson, datas em ISO 8601, Decimal numérico)
+init_json(app)
 
-swagger_template = {
-    "swagger": "2.0",
-    "info": {
-        "title": "Lumína - Sistema de Gerenciamento Escolar",
-        "description": "API RESTful completa para gerenciamento de escola infantil",
-        "version": "1.0.0"
-    },
-    "host": "localhost:5000",
-    "basePath": "/",
-    "schemes": ["http"]
-}
+# Documentação Swagger (UI só com SWAGGER_ENABLED=1; especificação pré-gerada em APISPEC_FILE)
+swagger = init_docs(app)
 
-swagger = Swagger(app, config=swagger_config, template=swagger_template)
+# Id de cada requisição (X-Request-ID), incluído nos logs
+init_logging(app)
+
+# Métricas Prometheus da própria API em /metrics
+init_metrics(app)
+
+# Compressão gzip/brotli das respostas (registrada depois das métricas, roda
+# antes delas no after_request e o tamanho medido é o comprimido)
+init_compression(app)
 
 # Registro dos blueprints para cada CRUD
 app.register_blueprint(aluno_bp, url_prefix='/alunos')
@@ -55,6 +50,7 @@ app.register_blueprint(presenca_bp, url_prefix='/presencas')
 app.register_blueprint(atividade_bp, url_prefix='/atividades')
 app.register_blueprint(atividade_aluno_bp, url_prefix='/atividades_alunos')
 app.register_blueprint(usuario_bp, url_prefix='/usuarios')
+app.register_blueprint(batch_bp, url_prefix='/batch')
 
 # Rota de teste para verificar se o servidor está funcionando
 @app.route('/', methods=['GET'])
@@ -63,13 +59,26 @@ def index():
     return {
         "message": "API do sistema de gerenciamento escolar está funcionando!",
         "version": "1.0.0",
-        "documentation": "/apidocs/"
+        "documentation": DOCS_ROUTE if SWAGGER_ENABLED else None
     }
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Endpoint para verificação de saúde"""
-    return {"status": "healthy", "service": "lumina-api"}
+    saude = {"status": "healthy", "service": "lumina-api", "db_pool": pool_stats(), "cache": reference_cache.stats(),
+             "prepared_statements": prepared_stats()}
+    if request.args.get('planos') == '1':
+        # Planos genéricos/específicos em uma conexão do pool (amostra, não o total)
+        conn = None
+        try:
+            conn = connect_db()
+            saude["prepared_statements"]["plans"] = plan_stats(conn.cursor())
+        except Exception as e:
+            saude["prepared_statements"]["plans"] = {"error": str(e)}
+        finally:
+            if conn:
+                conn.close()
+    return saude
 
 # Tratamento de erros globais
 @app.errorhandler(404)
@@ -81,4 +90,8 @@ def internal_error(error):
     return {"error": "Erro interno do servidor"}, 500
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # No gunicorn as migrações rodam uma vez no master (on_starting), não em cada worker
+    if os.getenv('DB_MIGRATE_ON_STARTUP', '0') == '1':
+        apply_migrations()
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py app:app
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG', '0') == '1')
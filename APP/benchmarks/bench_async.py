@@ -0,0 +1,130 @@
+"""Benchmark do modo assíncrono (gevent) contra o modo síncrono (gthread).
+
+Sobe o gunicorn uma vez em cada modo, com o mesmo número de workers, o
+mesmo DB_POOL_MAX e, se o `taskset` existir, preso aos mesmos núcleos
+(--cpus), e dispara a mesma carga do loadtest.py com muitas conexões
+simultâneas. Ao final compara vazão, latências e o tempo de CPU gasto
+pelos processos do servidor.
+
+O banco precisa estar populado (python seed.py ou loadtest.py --semear).
+
+Uso (a partir de APP/, com DB_HOST etc. apontando para o banco de teste):
+    python benchmarks/bench_async.py --concorrencia 200 --duracao 30 --cpus 0
+    python benchmarks/bench_async.py --json
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import psycopg2
+from db import DB_CONFIG
+from loadtest import alvos, executar, operacoes, resumir
+
+# Variáveis de ambiente de cada modo; o resto da configuração é igual
+MODOS = {
+    "sync": {"GUNICORN_WORKER_CLASS": "gthread"},
+    "async": {"GUNICORN_WORKER_CLASS": "gevent"},
+}
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _aguardar(porta, limite=30):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", porta, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"O gunicorn não respondeu em {limite}s na porta {porta}")
+
+def _cpu_segundos(pid):
+    """CPU (usuário + sistema) do processo e dos filhos vivos, lida do /proc"""
+    tick = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # Após o nome: estado, ppid, ... utime e stime são o 12º e o 13º campos
+        if int(entrada) == pid or int(campos[1]) == pid:
+            total += (int(campos[11]) + int(campos[12])) / tick
+    return total
+
+def medir(modo, args, lista):
+    porta = _porta_livre()
+    env = dict(os.environ, PORT=str(porta), WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads),
+               GUNICORN_WORKER_CONNECTIONS=str(max(args.concorrencia * 2, 1000)), DB_POOL_MAX=str(args.pool),
+               GUNICORN_MAX_REQUESTS="0", LOG_FILE="-", LOG_LEVEL="WARNING", **MODOS[modo])
+    comando = ["gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    if args.cpus and shutil.which("taskset"):
+        comando = ["taskset", "-c", args.cpus] + comando
+    servidor = subprocess.Popen(comando, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _aguardar(porta)
+        cpu_inicial = _cpu_segundos(servidor.pid)
+        amostras = executar(f"http://127.0.0.1:{porta}", lista, args.concorrencia, args.duracao,
+                            args.aquecimento, args.seed)
+        cpu = _cpu_segundos(servidor.pid) - cpu_inicial
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=60)
+    resultado = resumir(amostras, args.duracao)["total"]
+    resultado["cpu_s"] = round(cpu, 2)
+    # A CPU medida inclui o aquecimento, que não entra na contagem: o valor é um teto
+    resultado["cpu_ms_por_req"] = round(cpu * 1000 / resultado["requisicoes"], 3) if resultado["requisicoes"] else None
+    return resultado
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara os modos síncrono e assíncrono do gunicorn")
+    parser.add_argument("--concorrencia", type=int, default=200, help="conexões simultâneas do cliente")
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de medição por modo")
+    parser.add_argument("--aquecimento", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=1, help="workers do gunicorn (iguais nos dois modos)")
+    parser.add_argument("--threads", type=int, default=4, help="threads por worker no modo síncrono")
+    parser.add_argument("--pool", type=int, default=10, help="DB_POOL_MAX (igual nos dois modos)")
+    parser.add_argument("--cpus", default="0", help="núcleos do servidor para o taskset ('' para não prender)")
+    parser.add_argument("--escritas", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        lista = operacoes(alvos(conn), args.escritas)
+    finally:
+        conn.close()
+    resultados = {modo: medir(modo, args, lista) for modo in MODOS}
+
+    if args.json:
+        print(json.dumps({"parametros": vars(args), "resultados": resultados}, indent=2))
+    else:
+        print(f"{args.concorrencia} conexões, {args.workers} worker(s), pool {args.pool}, "
+              f"CPUs {args.cpus or 'livres'}, {args.duracao:.0f}s por modo")
+        print(f"{'modo':<8}{'req':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'erros':>8}{'cpu s':>8}{'cpu ms/req':>12}")
+        for modo, r in resultados.items():
+            print(f"{modo:<8}{r['requisicoes']:>8}{r['vazao_rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                  f"{r['p99_ms']:>9}{r['taxa_erros']:>8.2%}{r['cpu_s']:>8}{str(r['cpu_ms_por_req']):>12}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
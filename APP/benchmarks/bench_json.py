@@ -0,0 +1,82 @@
+"""Micro-benchmark da serialização JSON das listagens.
+
+Compara o provedor padrão do Flask (caminho anterior: datas no formato
+HTTP e Decimal como string) com os provedores de json_provider.py,
+serializando uma página sintética de pagamentos como faz o jsonify.
+
+Uso (a partir de APP/):
+    python benchmarks/bench_json.py [--itens 1000] [--repeticoes 50] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import timeit
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import IsoJSONProvider, OrjsonProvider, orjson
+
+
+def pagamentos(itens):
+    inicio = date(2025, 1, 1)
+    return [
+        {
+            "id_pagamento": i,
+            "id_aluno": i % 500 + 1,
+            "data_pagamento": inicio + timedelta(days=i % 365),
+            "valor_pago": Decimal(f"{250 + i % 300}.{i % 100:02d}"),
+            "forma_pagamento": ("Cartão de Crédito", "Boleto", "PIX")[i % 3],
+            "referencia": f"Mensalidade {i % 12 + 1:02d}/2025",
+            "status": ("Pago", "Pendente")[i % 2]
+        }
+        for i in range(1, itens + 1)
+    ]
+
+def provedores():
+    yield "flask_padrao", DefaultJSONProvider
+    yield "iso_stdlib", IsoJSONProvider
+    if orjson is not None:
+        yield "orjson", OrjsonProvider
+
+def medir(provider_class, dados, repeticoes):
+    app = Flask(__name__)
+    app.json = provider_class(app)
+    with app.app_context():
+        resposta = app.json.response(dados)
+        tempos = timeit.repeat(lambda: app.json.response(dados).get_data(), number=1, repeat=repeticoes)
+    return {
+        "mediana_ms": round(statistics.median(tempos) * 1000, 3),
+        "min_ms": round(min(tempos) * 1000, 3),
+        "bytes": len(resposta.get_data())
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara os provedores de JSON da API")
+    parser.add_argument("--itens", type=int, default=1000, help="itens na página serializada")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args(argv)
+
+    dados = pagamentos(args.itens)
+    resultados = {nome: medir(classe, dados, args.repeticoes) for nome, classe in provedores()}
+    base = resultados["flask_padrao"]["mediana_ms"]
+    for resultado in resultados.values():
+        resultado["ganho"] = round(base / resultado["mediana_ms"], 2) if resultado["mediana_ms"] else None
+
+    if args.json:
+        print(json.dumps({"itens": args.itens, "repeticoes": args.repeticoes, "resultados": resultados}, indent=2))
+    else:
+        print(f"{args.itens} pagamentos, {args.repeticoes} repetições")
+        print(f"{'provedor':<14}{'mediana (ms)':>14}{'mín (ms)':>10}{'bytes':>10}{'ganho':>8}")
+        for nome, r in resultados.items():
+            print(f"{nome:<14}{r['mediana_ms']:>14}{r['min_ms']:>10}{r['bytes']:>10}{r['ganho']:>7}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
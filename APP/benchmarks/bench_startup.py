@@ -0,0 +1,77 @@
+"""Benchmark do tempo de inicialização da API.
+
+Cada medição roda em um processo Python novo (como um worker recém-criado)
+e registra o tempo de `import app` e o da primeira requisição a
+/apispec.json, em três cenários: Swagger habilitado montando a
+especificação, Swagger habilitado com apispec.json pré-gerado e
+documentação desabilitada.
+
+Uso (a partir de APP/):
+    python benchmarks/bench_startup.py [--repeticoes 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado no processo filho: imprime os tempos em JSON na última linha
+_PROBE = """
+import json, time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+cliente = app.app.test_client()
+status = cliente.get("/apispec.json").status_code
+fim = time.perf_counter()
+print(json.dumps({"import_ms": (importado - inicio) * 1000, "apispec_ms": (fim - importado) * 1000, "status": status}))
+"""
+
+
+def medir(env_extra, repeticoes):
+    env = dict(os.environ, LOG_FILE="-", LOG_LEVEL="WARNING", **env_extra)
+    amostras = []
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, "-c", _PROBE], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        amostras.append(json.loads(saida.strip().splitlines()[-1]))
+    return {
+        "import_ms": round(statistics.median(a["import_ms"] for a in amostras), 1),
+        "apispec_ms": round(statistics.median(a["apispec_ms"] for a in amostras), 1),
+        "apispec_status": amostras[-1]["status"]
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização da API")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        apispec = os.path.join(tmp, "apispec.json")
+        subprocess.run([sys.executable, "apidocs.py", apispec], cwd=APP_DIR, check=True,
+                       capture_output=True, env=dict(os.environ, LOG_FILE="-"))
+        cenarios = {
+            "swagger": {"SWAGGER_ENABLED": "1"},
+            "swagger_prebuilt": {"SWAGGER_ENABLED": "1", "APISPEC_FILE": apispec},
+            "sem_swagger": {"SWAGGER_ENABLED": "0"},
+            "sem_swagger_prebuilt": {"SWAGGER_ENABLED": "0", "APISPEC_FILE": apispec},
+        }
+        resultados = {nome: medir(env, args.repeticoes) for nome, env in cenarios.items()}
+
+    if args.json:
+        print(json.dumps({"repeticoes": args.repeticoes, "resultados": resultados}, indent=2))
+    else:
+        print(f"Medianas de {args.repeticoes} processos")
+        print(f"{'cenário':<22}{'import (ms)':>12}{'1º apispec (ms)':>17}{'status':>8}")
+        for nome, r in resultados.items():
+            print(f"{nome:<22}{r['import_ms']:>12}{r['apispec_ms']:>17}{r['apispec_status']:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
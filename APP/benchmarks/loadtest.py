@@ -0,0 +1,315 @@
+"""Teste de carga da API contra um Postgres local.
+
+Aplica as migrações, opcionalmente apaga e popula o banco na escala pedida
+(escolas x turmas x alunos x anos de presença) e dispara requisições
+concorrentes, com uma mistura ponderada de rotas de todos os blueprints.
+Ao final mostra, por rota, p50/p95/p99, vazão e taxa de erros, e grava o
+mesmo resultado em JSON (--saida) para comparar versões (--comparar).
+
+Sem --base-url a API sobe no próprio processo, em um servidor HTTP com
+threads numa porta livre. Com --base-url a carga vai para um servidor já
+em execução (ex.: gunicorn), que deve apontar para o mesmo banco.
+
+O esquema não tem a entidade escola: cada escola da escala corresponde a
+um bloco de turmas, cada uma com o próprio professor.
+
+Uso (a partir de APP/, com DB_HOST etc. apontando para um banco descartável):
+    python benchmarks/loadtest.py --semear --escolas 2 --turmas 10 --alunos 25 --anos 2
+    python benchmarks/loadtest.py --duracao 60 --concorrencia 32 --saida resultado.json
+    python benchmarks/loadtest.py --comparar resultado.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from db import DB_CONFIG
+from migrate import apply_migrations
+from seed import FIM_PADRAO, Plano, gerar, inicio_periodo
+
+Escala = namedtuple("Escala", ["escolas", "turmas_por_escola", "alunos_por_turma", "anos", "ate"])
+# Uma operação da carga: rótulo da rota, peso no sorteio, método e gerador de (caminho, corpo)
+Operacao = namedtuple("Operacao", ["rota", "peso", "metodo", "gerar"])
+
+
+def semear(escala, seed):
+    """Apaga os dados e popula todas as tabelas na escala pedida (gerador do seed.py)"""
+    plano = Plano(seed, escala.escolas * escala.turmas_por_escola, escala.alunos_por_turma,
+                  inicio_periodo(escala.ate, escala.anos), escala.ate, atividades_por_mes=4)
+    return gerar(plano, limpar=True, log=lambda mensagem: None)
+
+def alvos(conn):
+    """Identificadores e datas existentes, usados para montar as requisições"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT min(id_aluno), max(id_aluno) FROM aluno")
+        alunos = cursor.fetchone()
+        cursor.execute("SELECT min(id_turma), max(id_turma) FROM turma")
+        turmas = cursor.fetchone()
+        cursor.execute("SELECT min(data_presenca), max(data_presenca) FROM presenca")
+        datas = cursor.fetchone()
+        # Alunos de algumas turmas, para os lotes de chamada
+        cursor.execute("""
+            SELECT id_turma, array_agg(id_aluno ORDER BY id_aluno)
+            FROM aluno
+            WHERE id_turma IN (SELECT id_turma FROM turma ORDER BY id_turma LIMIT 200)
+            GROUP BY id_turma
+        """)
+        chamadas = dict(cursor.fetchall())
+    if alunos[0] is None or turmas[0] is None:
+        raise SystemExit("Banco vazio: rode com --semear")
+    inicio, fim = datas if datas[0] else (date.today(), date.today())
+    meses = sorted({f"{a}-{m:02d}" for a in range(inicio.year, fim.year + 1) for m in range(1, 13)
+                    if (inicio.year, inicio.month) <= (a, m) <= (fim.year, fim.month)})
+    return {"alunos": alunos, "turmas": turmas, "inicio": inicio, "fim": fim, "meses": meses, "chamadas": chamadas}
+
+def operacoes(a, escritas):
+    """Mistura de rotas de todos os blueprints, com pesos aproximando o uso real"""
+    aluno = lambda r: r.randint(*a["alunos"])
+    turma = lambda r: r.randint(*a["turmas"])
+    mes = lambda r: r.choice(a["meses"])
+
+    def intervalo(r):
+        dia = a["inicio"].toordinal() + r.randint(0, max((a["fim"] - a["inicio"]).days - 30, 0))
+        return date.fromordinal(dia), date.fromordinal(dia + 30)
+
+    def presencas(r):
+        inicio, fim = intervalo(r)
+        return f"/presencas/?id_aluno={aluno(r)}&data_inicio={inicio}&data_fim={fim}", None
+
+    def lote(r):
+        id_turma = r.choice(list(a["chamadas"]))
+        dia = a["inicio"] + (a["fim"] - a["inicio"]) * r.random()
+        registros = [{"id_aluno": i, "presente": r.random() < 0.9} for i in a["chamadas"][id_turma]]
+        return "/presencas/lote", {"id_turma": id_turma, "data_presenca": str(dia), "registros": registros}
+
+    def pagamento(r):
+        return "/pagamentos/", {"id_aluno": aluno(r), "data_pagamento": str(a["fim"]), "valor_pago": 500.0,
+                                "forma_pagamento": "PIX", "referencia": "Carga", "status": "Pago"}
+
+    lista = [
+        Operacao("GET /alunos/", 8, "GET", lambda r: ("/alunos/?limit=100", None)),
+        Operacao("GET /alunos/?id_turma", 8, "GET", lambda r: (f"/alunos/?id_turma={turma(r)}", None)),
+        Operacao("GET /alunos/?fields", 4, "GET", lambda r: ("/alunos/?fields=nome_completo&limit=500", None)),
+        Operacao("GET /alunos/{id}/completo", 12, "GET", lambda r: (f"/alunos/{aluno(r)}/completo", None)),
+        Operacao("GET /turmas/", 4, "GET", lambda r: ("/turmas/", None)),
+        Operacao("GET /professores/", 4, "GET", lambda r: ("/professores/", None)),
+        Operacao("GET /pagamentos/?status", 6, "GET", lambda r: ("/pagamentos/?status=Pendente&limit=100", None)),
+        Operacao("GET /pagamentos/?id_aluno", 8, "GET", lambda r: (f"/pagamentos/?id_aluno={aluno(r)}", None)),
+        Operacao("GET /pagamentos/resumo", 3, "GET", lambda r: ("/pagamentos/resumo?agrupar=mes,status", None)),
+        Operacao("GET /presencas/?id_aluno", 12, "GET", presencas),
+        Operacao("GET /presencas/relatorio", 5, "GET",
+                 lambda r: (f"/presencas/relatorio?id_turma={turma(r)}&mes={mes(r)}", None)),
+        Operacao("GET /atividades/", 3, "GET", lambda r: ("/atividades/?order_by=-data_realizacao", None)),
+        Operacao("GET /atividades_alunos/?id_aluno", 4, "GET",
+                 lambda r: (f"/atividades_alunos/?id_aluno={aluno(r)}", None)),
+        Operacao("GET /usuarios/", 2, "GET", lambda r: ("/usuarios/", None)),
+    ]
+    if escritas > 0:
+        # Pesos das escritas proporcionais à fração pedida do total
+        total = sum(o.peso for o in lista)
+        peso = total * escritas / (1 - escritas) / 2 if escritas < 1 else total
+        lista += [
+            Operacao("POST /presencas/lote", peso, "POST", lote),
+            Operacao("POST /pagamentos/", peso, "POST", pagamento),
+        ]
+    return lista
+
+
+class _Cliente:
+    """Conexão HTTP keep-alive de uma thread de carga"""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.conn = None
+
+    def requisitar(self, metodo, caminho, corpo):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {"Accept-Encoding": "gzip"}
+        dados = None
+        if corpo is not None:
+            dados = json.dumps(corpo).encode()
+            headers["Content-Type"] = "application/json"
+        try:
+            self.conn.request(metodo, caminho, body=dados, headers=headers)
+            resposta = self.conn.getresponse()
+            resposta.read()
+            return resposta.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+def executar(base_url, lista, concorrencia, duracao, aquecimento, seed):
+    """Dispara a carga por `duracao` segundos e devolve as amostras por rota"""
+    amostras = defaultdict(list)
+    lock = threading.Lock()
+    pesos = [o.peso for o in lista]
+    inicio_medicao = time.monotonic() + aquecimento
+    fim = inicio_medicao + duracao
+
+    def trabalhador(indice):
+        rng = random.Random(seed + indice)
+        cliente = _Cliente(base_url)
+        locais = []
+        while True:
+            agora = time.monotonic()
+            if agora >= fim:
+                break
+            op = rng.choices(lista, pesos)[0]
+            caminho, corpo = op.gerar(rng)
+            t0 = time.perf_counter()
+            try:
+                status = cliente.requisitar(op.metodo, caminho, corpo)
+            except Exception:
+                status = None
+            if agora >= inicio_medicao:
+                locais.append((op.rota, time.perf_counter() - t0, status))
+        with lock:
+            for rota, latencia, status in locais:
+                amostras[rota].append((latencia, status))
+
+    with ThreadPoolExecutor(concorrencia) as executor:
+        list(executor.map(trabalhador, range(concorrencia)))
+    return amostras
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo (valores já ordenados)"""
+    if not valores:
+        return None
+    return valores[max(math.ceil(p / 100 * len(valores)), 1) - 1]
+
+def resumir(amostras, duracao):
+    """Estatísticas por rota e do total, em milissegundos e requisições/s"""
+    def estatisticas(itens):
+        latencias = sorted(l * 1000 for l, _ in itens)
+        status = defaultdict(int)
+        for _, s in itens:
+            status[str(s) if s is not None else "falha"] += 1
+        erros = sum(n for s, n in status.items() if s == "falha" or s.startswith("5"))
+        return {
+            "requisicoes": len(itens),
+            "vazao_rps": round(len(itens) / duracao, 2),
+            "p50_ms": round(percentil(latencias, 50), 2) if latencias else None,
+            "p95_ms": round(percentil(latencias, 95), 2) if latencias else None,
+            "p99_ms": round(percentil(latencias, 99), 2) if latencias else None,
+            "media_ms": round(statistics.fmean(latencias), 2) if latencias else None,
+            "taxa_erros": round(erros / len(itens), 4) if itens else 0.0,
+            "status": dict(sorted(status.items()))
+        }
+    rotas = {rota: estatisticas(itens) for rota, itens in sorted(amostras.items())}
+    total = estatisticas([item for itens in amostras.values() for item in itens])
+    return {"rotas": rotas, "total": total}
+
+def _versao():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _servidor_local():
+    """Sobe a API em uma thread, numa porta livre, e devolve a URL base"""
+    from werkzeug.serving import make_server
+    from app import app
+    # O log de acesso de cada requisição distorceria a medição
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", servidor
+
+def imprimir(resultado, anterior=None):
+    print(f"{'rota':<36}{'req':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'erros':>8}" + ("  Δp95" if anterior else ""))
+    linhas = list(resultado["rotas"].items()) + [("TOTAL", resultado["total"])]
+    for rota, r in linhas:
+        linha = (f"{rota:<36}{r['requisicoes']:>8}{r['vazao_rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                 f"{r['p99_ms']:>9}{r['taxa_erros']:>8.2%}")
+        if anterior:
+            antes = anterior["total"] if rota == "TOTAL" else anterior["rotas"].get(rota)
+            if antes and antes.get("p95_ms") and r["p95_ms"]:
+                linha += f"  {(r['p95_ms'] / antes['p95_ms'] - 1):+.1%}"
+        print(linha)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API contra um Postgres local")
+    parser.add_argument("--semear", action="store_true", help="APAGA os dados do banco e popula na escala pedida")
+    parser.add_argument("--escolas", type=int, default=1)
+    parser.add_argument("--turmas", type=int, default=10, help="turmas por escola")
+    parser.add_argument("--alunos", type=int, default=25, help="alunos por turma")
+    parser.add_argument("--anos", type=int, default=1, help="anos de presenças e pagamentos")
+    parser.add_argument("--ate", type=date.fromisoformat, default=FIM_PADRAO,
+                        help=f"último dia dos dados (padrão {FIM_PADRAO.isoformat()})")
+    parser.add_argument("--base-url", help="servidor já em execução (padrão: sobe a API no processo)")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de medição")
+    parser.add_argument("--aquecimento", type=float, default=5, help="segundos descartados no início")
+    parser.add_argument("--escritas", type=float, default=0.0, help="fração de escritas (0 a 1)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo")
+    parser.add_argument("--comparar", help="resultado JSON anterior para comparar o p95")
+    args = parser.parse_args(argv)
+
+    apply_migrations()
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        escala = Escala(args.escolas, args.turmas, args.alunos, args.anos, args.ate)
+        if args.semear:
+            inicio = time.perf_counter()
+            contagens = semear(escala, args.seed)
+            print(f"Banco populado em {time.perf_counter() - inicio:.1f}s: {contagens}")
+        a = alvos(conn)
+    finally:
+        conn.close()
+
+    servidor = None
+    base_url = args.base_url
+    if not base_url:
+        base_url, servidor = _servidor_local()
+    try:
+        lista = operacoes(a, args.escritas)
+        print(f"Carga em {base_url}: {args.concorrencia} conexões, {args.duracao:.0f}s (+{args.aquecimento:.0f}s de aquecimento)")
+        amostras = executar(base_url, lista, args.concorrencia, args.duracao, args.aquecimento, args.seed)
+    finally:
+        if servidor:
+            servidor.shutdown()
+
+    resultado = resumir(amostras, args.duracao)
+    resultado["meta"] = {
+        "versao": _versao(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "base_url": args.base_url or "local",
+        "concorrencia": args.concorrencia,
+        "duracao_s": args.duracao,
+        "escritas": args.escritas,
+        "seed": args.seed,
+        "escala": {"escolas": args.escolas, "turmas_por_escola": args.turmas, "alunos_por_turma": args.alunos,
+                   "anos": args.anos} if args.semear else None
+    }
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+    imprimir(resultado, anterior)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    return 1 if resultado["total"]["taxa_erros"] > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Configuração do cache das tabelas de referência (turma, professor, atividade)
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "256"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+
+
+class TTLCache:
+    """Cache LRU em memória, thread-safe, com expiração por tempo.
+
+    As chaves são tuplas cujo primeiro elemento é o namespace (nome da tabela),
+    o que permite invalidar de uma vez todas as páginas de uma tabela.
+    """
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, namespace):
+        """Remove todas as entradas do namespace (chamado após escritas)"""
+        with self._lock:
+            for key in [k for k in self._data if k[0] == namespace]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions
+            }
+
+
+reference_cache = TTLCache()
@@ -0,0 +1,77 @@
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # dependência opcional: sem ela só o gzip é oferecido
+    brotli = None
+
+# Respostas menores que isso (em bytes) vão sem compressão
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Nível do gzip (1 = mais rápido, 9 = menor) e qualidade do brotli (0 a 11)
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+COMPRESS_BR_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "4"))
+
+COMPRESS_MIMETYPES = {"application/json", "application/x-ndjson", "text/plain", "text/html"}
+
+
+def _gzip():
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def _brotli():
+    compressor = brotli.Compressor(quality=COMPRESS_BR_QUALITY)
+    return compressor.process, compressor.flush, compressor.finish
+
+# Codificações oferecidas, em ordem de preferência do servidor
+CODECS = {"br": _brotli} if brotli else {}
+CODECS["gzip"] = _gzip
+
+
+def choose_encoding():
+    """Codificação aceita pelo cliente (Accept-Encoding), ou None"""
+    return request.accept_encodings.best_match(list(CODECS))
+
+def _compress_stream(chunks, codec):
+    """Comprime um corpo transmitido pedaço a pedaço.
+
+    Cada pedaço é descarregado (flush) ao ser enviado, então o cliente
+    continua recebendo os dados enquanto a exportação avança.
+    """
+    compress, flush, finish = CODECS[codec]()
+    for chunk in chunks:
+        data = compress(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+def _compress(response):
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    codec = choose_encoding()
+    if codec is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), codec)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        compress, _, finish = CODECS[codec]()
+        response.set_data(compress(data) + finish())
+
+    response.headers["Content-Encoding"] = codec
+    # O corpo comprimido é outra representação: a ETag passa a ser fraca
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_compression(app):
+    """Comprime as respostas conforme o Accept-Encoding do cliente"""
+    app.after_request(_compress)
@@ -0,0 +1,68 @@
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from flask import Response, request
+from prepared import prepared
+
+# Versão de uma tabela, mantida pelos triggers da migração 0008
+TableVersion = namedtuple("TableVersion", ["table", "version", "modified_at"])
+
+# Lida em toda listagem: preparada uma vez por conexão
+_VERSION = prepared("tabela_versao_faixa",
+                    "SELECT sum(versao)::bigint, max(alterado_em) FROM tabela_versao_faixa WHERE tabela = %s")
+
+
+_VERSIONS = prepared("tabela_versao_faixas", """
+    SELECT tabela, sum(versao)::bigint, max(alterado_em) FROM tabela_versao_faixa
+    WHERE tabela = ANY(%s) GROUP BY tabela
+""")
+
+
+def table_version(cursor, table):
+    """Lê a versão atual da tabela (soma das faixas, pela PK de tabela_versao_faixa)"""
+    _VERSION.execute(cursor, (table,))
+    row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    modified_at = row[1] if isinstance(row[1], datetime) else None
+    return TableVersion(table, int(row[0]), modified_at)
+
+def tables_version(cursor, tables):
+    """Versão combinada das tabelas lidas por uma listagem (ex.: filtro por subconsulta)"""
+    if len(tables) == 1:
+        return table_version(cursor, tables[0])
+    _VERSIONS.execute(cursor, (list(tables),))
+    rows = {row[0]: row for row in cursor.fetchall()}
+    if set(rows) != set(tables):
+        return None
+    dates = [rows[t][2] for t in tables if isinstance(rows[t][2], datetime)]
+    return TableVersion("+".join(tables), ".".join(str(int(rows[t][1])) for t in tables),
+                        max(dates) if len(dates) == len(tables) else None)
+
+def etag_for(version):
+    """ETag da representação: versão da tabela + parâmetros da consulta"""
+    return f"{version.table}-{version.version}-{zlib.crc32(request.query_string):08x}"
+
+def not_modified(version):
+    """Resposta 304 se o cliente já tem a versão atual, senão None.
+
+    Só o If-None-Match decide. O If-Modified-Since sozinho é ignorado:
+    alterado_em é registrado quando o comando roda, não no commit, e tem
+    resolução de segundos no cabeçalho. Uma transação longa que confirma
+    depois de uma curta não avança o Last-Modified, e um 304 por data
+    entregaria dados antigos. A soma das versões, no ETag, só muda no commit.
+    """
+    if version is None or not request.if_none_match:
+        return None
+    # Comparação fraca (RFC 9110): a versão comprimida tem ETag W/"..."
+    if not request.if_none_match.contains_weak(etag_for(version)):
+        return None
+    return with_version(Response(status=304), version)
+
+def with_version(response, version):
+    """Adiciona ETag e Last-Modified à resposta da listagem"""
+    if version is not None:
+        response.set_etag(etag_for(version))
+        if version.modified_at:
+            response.last_modified = version.modified_at
+    return response
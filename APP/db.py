@@ -1,5 +1,11 @@
 import psycopg2
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
 from psycopg2.extras import RealDictCursor
 
 DB_CONFIG = {
@@ -10,10 +16,407 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT", "5432")
 }
 
+# Configuração do pool de conexões (valores em segundos)
+POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("DB_POOL_MAX", "10")),
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+    "check_idle": float(os.getenv("DB_POOL_CHECK_IDLE", "30"))
+}
+
+
+class PoolTimeout(PoolError):
+    """Nenhuma conexão ficou disponível dentro do tempo limite de checkout"""
+
+
+class _Slot:
+    """Conexão física do pool com seus metadados de uso"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+# Tempo gasto no banco pela thread atual (lido pelas métricas por requisição)
+_db_time = threading.local()
+
+def reset_db_time(total=0.0):
+    _db_time.total = total
+
+def db_time():
+    return getattr(_db_time, "total", 0.0)
+
+
+class TimedCursor:
+    """Proxy do cursor que acumula o tempo das idas ao banco da thread atual"""
+
+    _TIMED = ("execute", "executemany", "copy_expert", "fetchone", "fetchmany", "fetchall")
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name not in self._TIMED:
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                _db_time.total = db_time() + time.perf_counter() - start
+        return timed
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._cursor.__exit__(exc_type, exc, tb)
+
+
+class PooledConnection:
+    """Proxy da conexão psycopg2 que devolve a conexão ao pool em close()"""
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+
+    @property
+    def raw(self):
+        if self._slot is None:
+            raise psycopg2.InterfaceError("Conexão já devolvida ao pool")
+        return self._slot.conn
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self.raw.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._slot is not None:
+            slot, self._slot = self._slot, None
+            self._pool.putconn(slot)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        self.raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self.raw.__exit__(exc_type, exc, tb)
+
+
+class ConnectionPool:
+    """Pool de conexões thread-safe com timeout, reciclagem e estatísticas"""
+
+    def __init__(self, minconn, maxconn, timeout, max_lifetime, check_idle, **dsn):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        self._dsn = dsn
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = 0
+        self._opening = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0
+        }
+        for _ in range(minconn):
+            self._idle.append(self._new_slot())
+
+    def _new_slot(self):
+        conn = psycopg2.connect(**self._dsn)
+        with self._cond:
+            self._stats["created"] += 1
+        return _Slot(conn)
+
+    def _discard(self, slot):
+        with self._cond:
+            self._stats["discarded"] += 1
+        try:
+            slot.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, slot):
+        return self.max_lifetime > 0 and time.monotonic() - slot.created_at > self.max_lifetime
+
+    def _healthy(self, slot):
+        """Verifica se a conexão ociosa ainda responde antes de entregá-la"""
+        if slot.conn.closed or self._expired(slot):
+            return False
+        if time.monotonic() - slot.last_used < self.check_idle:
+            return True
+        try:
+            with slot.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            slot.conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=None):
+        """Retira uma conexão do pool, aguardando até `timeout` segundos"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Pool de conexões encerrado")
+                if self._idle:
+                    slot = self._idle.pop()
+                    break
+                if self._in_use + self._opening < self.maxconn:
+                    slot = None
+                    self._opening += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"Nenhuma conexão disponível após {timeout:.1f}s "
+                        f"({self.maxconn} em uso)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            if slot is not None:
+                self._in_use += 1
+
+        if slot is None:
+            try:
+                slot = self._new_slot()
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    if slot is None:
+                        self._cond.notify()
+                    else:
+                        self._in_use += 1
+        elif not self._healthy(slot):
+            self._discard(slot)
+            try:
+                slot = self._new_slot()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_time_total"] += elapsed
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], elapsed)
+        return PooledConnection(self, slot)
+
+    def putconn(self, slot):
+        """Devolve a conexão ao pool, descartando-a se estiver quebrada ou velha"""
+        conn = slot.conn
+        reusable = not conn.closed and not self._closed and not self._expired(slot)
+        if reusable:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                reusable = False
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                # Transação não confirmada pelo handler: nunca vaza para o próximo uso
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    reusable = False
+        slot.last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append(slot)
+            else:
+                self._discard(slot)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._stats["checkouts"]
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": checkouts,
+                "waits": self._stats["waits"],
+                "timeouts": self._stats["timeouts"],
+                "created": self._stats["created"],
+                "discarded": self._stats["discarded"],
+                "wait_time_avg_ms": round(self._stats["wait_time_total"] * 1000 / checkouts, 3) if checkouts else 0.0,
+                "wait_time_max_ms": round(self._stats["wait_time_max"] * 1000, 3)
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools herdados do processo pai após um fork. Ficam referenciados para
+# nunca serem fechados (nem coletados) no filho: fechar um socket herdado
+# encerraria a sessão do pai no servidor.
+_inherited_pools = []
+
+def _forget_inherited_pool():
+    global _pool
+    if _pool is not None and _pool_pid != os.getpid():
+        _inherited_pools.append(_pool)
+        _pool = None
+
+def reset_after_fork():
+    """Descarta o pool herdado do processo pai; o filho abre o seu no primeiro uso"""
+    with _pool_lock:
+        _forget_inherited_pool()
+
+def get_pool():
+    """Retorna o pool do processo, criando-o no primeiro uso (e após um fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            _forget_inherited_pool()
+            if _pool is None:
+                _pool = ConnectionPool(**POOL_CONFIG, **DB_CONFIG)
+                _pool_pid = os.getpid()
+    return _pool
+
+def close_pool():
+    """Fecha as conexões do pool deste processo (encerramento do worker)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+def pool_stats():
+    """Estatísticas do pool, ou None se nenhuma conexão foi aberta ainda"""
+    return _pool.stats() if _pool is not None and _pool_pid == os.getpid() else None
+
+def _gevent_wait(conn, timeout=None):
+    """Espera do psycopg2 que cede o processador a outros greenlets"""
+    from gevent.socket import wait_read, wait_write
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Estado inesperado do poll: {state!r}")
+
+def enable_green():
+    """Modo assíncrono: as consultas rodam no modo assíncrono do psycopg2 e,
+    enquanto esperam o Postgres, o worker gevent atende outras requisições.
+
+    Deve ser chamado depois do monkey patch do gevent (worker já iniciado).
+    """
+    extensions.set_wait_callback(_gevent_wait)
+
+def green_enabled():
+    """True se as conexões estão no modo cooperativo (COPY fica indisponível)"""
+    return extensions.get_wait_callback() is not None
+
+class BatchConnection:
+    """Conexão de um POST /batch, compartilhada por todas as operações do lote.
+
+    A transação pertence ao lote: commit() e close() dos handlers não têm
+    efeito e rollback() desfaz só a operação corrente (até o savepoint).
+    """
+
+    SAVEPOINT = "operacao_lote"
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def _execute(self, sql):
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql)
+
+    def begin_operation(self):
+        self._execute(f"SAVEPOINT {self.SAVEPOINT}")
+
+    def end_operation(self, success):
+        """Mantém (RELEASE) ou desfaz (ROLLBACK TO) a operação corrente"""
+        if success:
+            self._execute(f"RELEASE SAVEPOINT {self.SAVEPOINT}")
+        else:
+            self.rollback()
+
+    def commit_batch(self):
+        """Confirma todas as operações mantidas do lote"""
+        self._conn.commit()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        self._execute(f"ROLLBACK TO SAVEPOINT {self.SAVEPOINT}")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# Lote em execução na thread atual: enquanto definido, connect_db devolve a
+# conexão do lote em vez de retirar outra do pool
+_batch = threading.local()
+
+@contextmanager
+def batch_connection():
+    """Retira uma conexão do pool para um lote e a empresta aos handlers.
+
+    Ao sair do bloco a conexão volta ao pool, que desfaz a transação se o
+    chamador não a confirmou com commit_batch().
+    """
+    conn = connect_db()
+    _batch.conn = BatchConnection(conn)
+    try:
+        yield _batch.conn
+    finally:
+        _batch.conn = None
+        conn.close()
+
 def connect_db():
-    """Estabelece conexão com o banco PostgreSQL"""
+    """Obtém uma conexão do pool; conn.close() a devolve ao pool"""
+    batch = getattr(_batch, "conn", None)
+    if batch is not None:
+        return batch
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_pool().getconn()
         return conn
     except psycopg2.Error as e:
         print(f"Erro ao conectar com o banco de dados: {e}")
@@ -21,4 +424,4 @@ def connect_db():
 
 def get_db_cursor(conn):
     """Retorna cursor com formato de dicionário para facilitar uso"""
-    return conn.cursor(cursor_factory=RealDictCursor)
\ No newline at end of file
+    return conn.cursor(cursor_factory=RealDictCursor)
@@ -0,0 +1,165 @@
+from collections import namedtuple
+from datetime import datetime
+from flask import request
+from pagination import keyset_query, read_page_args
+
+# Um filtro aceito na query string: o nome do parâmetro, o trecho SQL com um
+# único %s e a função que converte (e valida) o valor recebido. `tables` são
+# as outras tabelas que o trecho SQL lê (subconsultas): quando o filtro é
+# usado, a versão delas também entra no ETag da listagem.
+Filter = namedtuple("Filter", ["param", "sql", "convert", "description", "tables"], defaults=((),))
+
+# Consulta pronta para executar e as colunas do SELECT, na ordem em que vêm
+PageQuery = namedtuple("PageQuery", ["sql", "params", "limit", "key_columns", "columns"])
+
+
+class FilterError(ValueError):
+    """Filtro ou ordenação inválidos na query string"""
+
+
+def _int(value):
+    return int(value)
+
+def _date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def _bool(value):
+    if value.lower() in ("true", "1"):
+        return True
+    if value.lower() in ("false", "0"):
+        return False
+    raise ValueError(value)
+
+def eq(column, convert=str, param=None):
+    """Filtro de igualdade em uma coluna da tabela"""
+    return Filter(param or column, f"{column} = %s", convert, f"Filtra por {column}.")
+
+def integer(column, param=None):
+    return eq(column, _int, param)
+
+def boolean(column, param=None):
+    return eq(column, _bool, param)
+
+def date_range(column):
+    """Filtros data_inicio/data_fim (inclusivos, AAAA-MM-DD) sobre a coluna de data"""
+    return (
+        Filter("data_inicio", f"{column} >= %s", _date, f"Primeiro dia de {column} (AAAA-MM-DD)."),
+        Filter("data_fim", f"{column} <= %s", _date, f"Último dia de {column} (AAAA-MM-DD).")
+    )
+
+
+class Listing:
+    """Colunas, filtros e ordenações permitidos na listagem de uma tabela.
+
+    Só parâmetros declarados aqui viram SQL, e sempre com o valor passado
+    como parâmetro da consulta; os nomes de colunas vêm da lista branca,
+    nunca da requisição. `order_by=coluna` (ou `-coluna`, decrescente)
+    acrescenta a coluna antes da PK na chave da paginação, então a ordem é
+    estável e continua paginada por chave. As colunas ordenáveis devem ser
+    NOT NULL, pois a comparação do cursor não trata nulos.
+
+    `columns` é a lista explícita de colunas públicas (nunca `SELECT *`) e
+    `fields=a,b` seleciona um subconjunto delas; as linhas são convertidas
+    em dicionários pelo nome da coluna.
+    """
+
+    def __init__(self, table, key_columns, columns, filters=(), sortable=()):
+        self.table = table
+        self.key_columns = tuple(key_columns)
+        self.columns = tuple(columns)
+        self.filters = {f.param: f for f in filters}
+        self.sortable = tuple(sortable)
+
+    @property
+    def parameters(self):
+        """Parâmetros documentados no Swagger da listagem"""
+        parameters = [
+            {"name": f.param, "in": "query", "type": "string", "required": False, "description": f.description}
+            for f in self.filters.values()
+        ]
+        if self.sortable:
+            parameters.append({
+                "name": "order_by", "in": "query", "type": "string", "required": False,
+                "description": f"Ordenação: {', '.join(self.sortable)} (prefixo '-' para decrescente)."
+            })
+        parameters.append({
+            "name": "fields", "in": "query", "type": "string", "required": False,
+            "description": f"Campos retornados, separados por vírgula: {', '.join(self.columns)}. "
+                           "As colunas da chave de paginação sempre vêm."
+        })
+        return parameters
+
+    def where(self):
+        """Converte os filtros da requisição atual em (cláusula WHERE, parâmetros)"""
+        conditions, params = [], []
+        for param, f in self.filters.items():
+            value = request.args.get(param)
+            if value is None or value == "":
+                continue
+            try:
+                params.append(f.convert(value))
+            except (TypeError, ValueError):
+                raise FilterError(f"Valor inválido para o filtro {param}: {value}")
+            conditions.append(f.sql)
+        return " AND ".join(conditions) or None, params
+
+    def tables(self):
+        """Tabelas lidas pela listagem com os filtros da requisição atual"""
+        tables = [self.table]
+        for param, f in self.filters.items():
+            if request.args.get(param):
+                tables.extend(t for t in f.tables if t not in tables)
+        return tables
+
+    def order(self):
+        """Lê `order_by` e retorna (colunas da chave, decrescente)"""
+        order_by = request.args.get("order_by", "").strip()
+        if not order_by:
+            return self.key_columns, False
+        descending = order_by.startswith("-")
+        column = order_by.lstrip("-")
+        if column not in self.sortable:
+            raise FilterError(f"order_by aceita apenas: {', '.join(self.sortable)}")
+        if column in self.key_columns:
+            return self.key_columns, descending
+        return (column,) + self.key_columns, descending
+
+    def fields(self, key_columns):
+        """Lê `fields` e retorna as colunas do SELECT, na ordem declarada"""
+        requested = [name.strip() for name in request.args.get("fields", "").split(",") if name.strip()]
+        if not requested:
+            return self.columns
+        if not set(requested) <= set(self.columns):
+            raise FilterError(f"fields aceita apenas: {', '.join(self.columns)}")
+        # O cursor da próxima página é montado com os valores da chave
+        return tuple(c for c in self.columns if c in requested or c in key_columns)
+
+    def page_query(self):
+        """Lê filtros, ordenação, campos e paginação da requisição atual"""
+        where, params = self.where()
+        key_columns, descending = self.order()
+        columns = self.fields(key_columns)
+        limit, after = read_page_args(key_columns)
+        sql, params = keyset_query(
+            self.table, key_columns, after, limit, ", ".join(columns), where, params, descending
+        )
+        return PageQuery(sql, params, limit, key_columns, columns)
+
+    def full_query(self):
+        """SELECT completo (sem paginação) com os mesmos filtros, ordenação e campos"""
+        where, params = self.where()
+        key_columns, descending = self.order()
+        columns = self.fields(key_columns)
+        direction = " DESC" if descending else ""
+        sql = f"SELECT {', '.join(columns)} FROM {self.table}"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {', '.join(column + direction for column in key_columns)}"
+        return PageQuery(sql, params, None, key_columns, columns)
+
+    def to_item(self, columns):
+        """Função que converte uma linha do SELECT em dicionário pelo nome da coluna"""
+        return lambda row: dict(zip(columns, row))
+
+    def to_items(self, rows, columns):
+        return [dict(zip(columns, row)) for row in rows]
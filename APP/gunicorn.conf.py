@@ -0,0 +1,78 @@
+"""Configuração do gunicorn para produção.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Workers e threads vêm de WEB_CONCURRENCY e GUNICORN_THREADS (padrão: 2 x CPUs + 1
+workers com 4 threads cada). Cada worker abre o próprio pool de conexões depois
+do fork, então WEB_CONCURRENCY x DB_POOL_MAX deve ficar abaixo do
+max_connections do Postgres. SIGTERM encerra com graceful_timeout e SIGHUP
+recarrega os workers um a um sem recusar conexões.
+
+Com GUNICORN_WORKER_CLASS=gevent (modo assíncrono) cada worker mantém até
+GUNICORN_WORKER_CONNECTIONS requisições em andamento em greenlets, e o
+psycopg2 passa a ceder o processador enquanto espera o Postgres. As
+requisições além do DB_POOL_MAX aguardam uma conexão sem ocupar threads.
+"""
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+
+# Vários processos não podem girar o mesmo arquivo de log: por padrão, saída
+# padrão (coletada pelo Docker). Para arquivos, use LOG_FILE=logs/api-{pid}.log
+os.environ.setdefault("LOG_FILE", "-")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# "gthread" (padrão) ou "gevent"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Recicla workers periodicamente para conter vazamentos de memória
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+# Com preload o app é importado uma vez no master (boot e memória menores),
+# mas o SIGHUP deixa de recarregar o código. Não vale para o gevent, que
+# precisa aplicar o monkey patch antes de o app ser importado
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1" and worker_class != "gevent"
+accesslog = os.getenv("GUNICORN_ACCESSLOG")
+errorlog = "-"
+
+
+def on_starting(server):
+    # Métricas de uma execução anterior não podem ser somadas às novas
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+    # Migrações uma vez, antes dos workers e fora do timeout deles. Roda em
+    # outro processo para o master não abrir conexões nem threads de log
+    # que os workers herdariam; se falhar, o gunicorn não sobe
+    if os.getenv("DB_MIGRATE_ON_STARTUP", "0") == "1":
+        server.log.info("Aplicando migrações pendentes")
+        subprocess.run([sys.executable, "migrate.py"], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+def post_fork(server, worker):
+    # Conexões nunca são compartilhadas entre processos: o worker abre as suas
+    if not preload_app:
+        return  # o app (e o pool) só é carregado no worker, depois do fork
+    from db import reset_after_fork
+    reset_after_fork()
+
+def post_worker_init(worker):
+    if worker_class == "gevent":
+        from db import enable_green
+        enable_green()
+
+def worker_exit(server, worker):
+    from db import close_pool
+    close_pool()
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,75 @@
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependência opcional: sem ela vale o provedor da biblioteca padrão
+    orjson = None
+
+# Provedor de JSON da aplicação: "orjson" (padrão, se instalado) ou "padrao"
+JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")
+
+# Dígitos significativos que um float representa sem perda: até esse tamanho
+# o número impresso é exatamente o valor do Decimal (DECIMAL(14,2) cabe com folga)
+_DECIMAL_DIGITOS_EXATOS = 15
+
+
+def _default(obj):
+    """Tipos que o encoder não conhece: datas em ISO 8601 e Decimal como número.
+
+    O Decimal vira float só quando o valor impresso continua exato
+    (500.10 sai como 500.1); valores com mais dígitos saem como string para
+    não perder precisão.
+    """
+    if isinstance(obj, Decimal):
+        if obj.is_finite() and len(obj.as_tuple().digits) <= _DECIMAL_DIGITOS_EXATOS:
+            return float(obj)
+        return str(obj)
+    if isinstance(obj, (date, datetime, time)):
+        return obj.isoformat()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """Provedor da biblioteca padrão com datas em ISO 8601 e Decimal numérico"""
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+
+class OrjsonProvider(JSONProvider):
+    """Provedor baseado no orjson, com a mesma saída do IsoJSONProvider.
+
+    O orjson já codifica date/datetime em ISO 8601; o resto passa por
+    `_default`. Na resposta, os bytes gerados vão direto para o corpo, sem
+    a volta por str.
+    """
+
+    mimetype = "application/json"
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option | orjson.OPT_APPEND_NEWLINE
+        if self._app.debug:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=option), mimetype=self.mimetype
+        )
+
+
+def init_json(app):
+    """Instala na aplicação o provedor de JSON configurado em JSON_PROVIDER"""
+    if JSON_PROVIDER == "orjson" and orjson is not None:
+        app.json = OrjsonProvider(app)
+    else:
+        app.json = IsoJSONProvider(app)
+    return app.json
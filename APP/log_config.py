@@ -1,8 +1,224 @@
+"""Configuração de logs da API.
+
+As threads das requisições só enfileiram os registros (QueueHandler, sem
+bloquear: com a fila cheia o registro é descartado e contado). Uma thread
+de fundo (QueueListener) formata e grava em disco, com rotação por tamanho
+ou por tempo. Cada linha é um JSON com o id da requisição (cabeçalho
+X-Request-ID). Eventos INFO de alto volume, marcados com `extra=SAMPLED`,
+podem ser amostrados com LOG_INFO_SAMPLE_RATE.
+
+No gunicorn (vários processos) o padrão é a saída padrão (LOG_FILE=-, ver
+gunicorn.conf.py); para gravar em arquivo, use um por processo com "{pid}"
+no nome. Com o gevent, a gravação roda em uma thread do sistema, fora do
+laço de eventos.
+"""
+import atexit
+import json
 import logging
+import os
+import queue
+import random
+import re
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from flask import g, has_request_context, request
+
+# Arquivo de log ("-" escreve na saída padrão, útil em containers; "{pid}" é
+# trocado pelo id do processo, um arquivo e uma rotação por worker)
+LOG_FILE = os.getenv("LOG_FILE", "escola_infantil.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (uma linha JSON por evento) ou "texto"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Rotação por tamanho (padrão) ou por tempo, se LOG_ROTATE_WHEN for definido (ex.: "midnight")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fração dos eventos INFO marcados com SAMPLED que é gravada (1.0 = todos)
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
+
+# Marca um evento INFO de alto volume como sujeito à amostragem
+SAMPLED = {"sampled": True}
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+_REQUEST_ID_RE = re.compile(r"^[\w.-]{1,128}$")
+
+
+class RequestIdFilter(logging.Filter):
+    """Anota o registro com o id da requisição corrente (na thread da requisição)"""
+
+    def filter(self, record):
+        record.request_id = g.get("request_id", "-") if has_request_context() else "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém só uma fração dos eventos INFO marcados com SAMPLED.
+
+    A decisão usa o id da requisição, então os eventos amostrados de uma
+    mesma requisição são mantidos ou descartados juntos.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno != logging.INFO or not getattr(record, "sampled", False):
+            return True
+        request_id = getattr(record, "request_id", "-")
+        if request_id == "-":
+            return random.random() < self.rate
+        return zlib.crc32(request_id.encode()) % 10000 < self.rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por evento"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que nunca bloqueia a requisição: com a fila cheia, descarta"""
+
+    dropped = 0
+    # Depois de um fork, a thread de escrita só é criada no primeiro registro
+    start_on_emit = False
+
+    def enqueue(self, record):
+        if self.start_on_emit:
+            start_listener()
+        try:
+            if self.queue.qsize() >= LOG_QUEUE_SIZE:
+                raise queue.Full
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class NativeThreadListener(QueueListener):
+    """QueueListener em uma thread do sistema mesmo com o monkey patch do gevent.
+
+    Com o threading trocado por greenlets, a thread de escrita viraria um
+    greenlet e cada gravação em disco pararia o laço de eventos.
+    """
+
+    def start(self):
+        from gevent import monkey
+        start_new_thread = monkey.get_original("_thread", "start_new_thread")
+        self._done = monkey.get_original("_thread", "allocate_lock")()
+        self._done.acquire()
+        start_new_thread(self._run, ())
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._done.release()
+
+    def stop(self):
+        self.enqueue_sentinel()
+        self._done.acquire()
+
+
+def _green():
+    """True se o gevent já trocou o threading por greenlets (worker gevent)"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+def _new_queue():
+    if _green():
+        # Fila do módulo C, com lock do sistema: a thread de escrita espera
+        # nela sem depender do laço de eventos (o limite vem do enqueue)
+        from gevent import monkey
+        return monkey.get_original("queue", "SimpleQueue")()
+    return queue.Queue(LOG_QUEUE_SIZE)
+
+def _output_handler():
+    filename = LOG_FILE.replace("{pid}", str(os.getpid()))
+    if LOG_FILE == "-":
+        handler = logging.StreamHandler()
+    elif LOG_ROTATE_WHEN:
+        handler = TimedRotatingFileHandler(filename, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    else:
+        handler = RotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+_handler = NonBlockingQueueHandler(_new_queue())
+_handler.addFilter(RequestIdFilter())
+_handler.addFilter(SamplingFilter(LOG_INFO_SAMPLE_RATE))
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def start_listener():
+    """Inicia a thread que grava os registros enfileirados"""
+    global _listener
+    with _listener_lock:
+        _handler.start_on_emit = False
+        if _listener is None:
+            listener_class = NativeThreadListener if _green() else QueueListener
+            _listener = listener_class(_handler.queue, _output_handler(), respect_handler_level=True)
+            _listener.start()
+
+def stop_listener():
+    """Grava o que falta na fila e encerra a thread de escrita"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def _restart_after_fork():
+    # A thread de escrita não sobrevive ao fork (ex.: workers do gunicorn com
+    # preload): o processo filho recomeça com fila própria, e a thread só é
+    # criada no primeiro registro. Filhos que não registram nada (ex.: os
+    # processos de carga do seed.py) não ganham thread nem arquivo
+    global _listener, _listener_lock
+    _listener = None
+    _listener_lock = threading.Lock()
+    _handler.queue = _new_queue()
+    _handler.start_on_emit = True
+
+def init_logging(app):
+    """Atribui um id a cada requisição (X-Request-ID) e o devolve na resposta"""
+
+    @app.before_request
+    def _request_id():
+        request_id = request.headers.get("X-Request-ID", "")
+        g.request_id = request_id if _REQUEST_ID_RE.match(request_id) else uuid.uuid4().hex
+
+    @app.after_request
+    def _request_id_header(response):
+        if "request_id" in g:
+            response.headers["X-Request-ID"] = g.request_id
+        return response
+
+
+_root = logging.getLogger()
+_root.setLevel(LOG_LEVEL)
+_root.addHandler(_handler)
+start_listener()
+atexit.register(stop_listener)
+os.register_at_fork(after_in_child=_restart_after_fork)
 
-logging.basicConfig(
-    filename="escola_infantil.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
@@ -0,0 +1,101 @@
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from db import db_time, pool_stats, reset_db_time
+
+# Com vários workers (gunicorn), cada processo grava suas métricas em
+# PROMETHEUS_MULTIPROC_DIR e o /metrics agrega todos os arquivos.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LABELS = ["blueprint", "endpoint", "method"]
+
+REQUEST_LATENCY = Histogram(
+    "lumina_http_request_duration_seconds",
+    "Latência das requisições HTTP",
+    LABELS,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "lumina_http_requests_in_progress",
+    "Requisições HTTP em andamento",
+    multiprocess_mode="livesum"
+)
+RESPONSE_SIZE = Histogram(
+    "lumina_http_response_size_bytes",
+    "Tamanho do corpo das respostas HTTP (respostas em streaming não entram)",
+    LABELS,
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000)
+)
+REQUEST_ERRORS = Counter(
+    "lumina_http_errors_total",
+    "Respostas HTTP com status de erro (4xx e 5xx)",
+    LABELS + ["status"]
+)
+DB_TIME = Histogram(
+    "lumina_db_time_seconds",
+    "Tempo gasto no banco de dados por requisição",
+    LABELS,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "lumina_db_pool_connections",
+    "Conexões do pool por estado",
+    ["state"],
+    multiprocess_mode="livesum"
+)
+
+
+def _labels():
+    return {
+        "blueprint": request.blueprint or "app",
+        "endpoint": request.endpoint or "desconhecido",
+        "method": request.method
+    }
+
+def _before_request():
+    if request.path == "/metrics":
+        return
+    g.metrics_start = time.perf_counter()
+    g.metrics_in_progress = True
+    reset_db_time()
+    REQUESTS_IN_PROGRESS.inc()
+
+def _after_request(response):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return response
+    labels = _labels()
+    REQUEST_LATENCY.labels(**labels).observe(time.perf_counter() - start)
+    DB_TIME.labels(**labels).observe(db_time())
+    if not response.is_streamed:
+        RESPONSE_SIZE.labels(**labels).observe(response.calculate_content_length() or 0)
+    if response.status_code >= 400:
+        REQUEST_ERRORS.labels(status=str(response.status_code), **labels).inc()
+    stats = pool_stats()
+    if stats:
+        DB_POOL_CONNECTIONS.labels(state="in_use").set(stats["in_use"])
+        DB_POOL_CONNECTIONS.labels(state="idle").set(stats["idle"])
+    return response
+
+def _teardown_request(exc):
+    if g.pop("metrics_in_progress", False):
+        REQUESTS_IN_PROGRESS.dec()
+
+def metrics_view():
+    """Exposição das métricas no formato texto do Prometheus"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+def init_metrics(app):
+    """Registra a coleta de métricas e a rota /metrics na aplicação"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
@@ -0,0 +1,171 @@
+"""Executor de migrações versionadas do banco.
+
+As migrações são arquivos `migrations/NNNN_descricao.sql`, aplicados em ordem
+numérica e registrados na tabela `schema_version`. Um arquivo cuja primeira
+linha é `-- migrate: no-transaction` roda fora de transação, um comando por vez
+(necessário para CREATE INDEX CONCURRENTLY); os demais rodam em uma transação.
+Um CREATE INDEX CONCURRENTLY interrompido deixa o índice INVALID, que o
+IF NOT EXISTS pularia: antes de cada migração desse tipo, os índices
+inválidos que ela cria são removidos.
+
+No gunicorn, as migrações rodam uma vez no master, antes dos workers
+(DB_MIGRATE_ON_STARTUP=1, hook on_starting), sem o timeout dos workers.
+
+Uso:
+    python migrate.py           # aplica as migrações pendentes
+    python migrate.py status    # lista migrações aplicadas e pendentes
+"""
+import os
+import re
+import sys
+import psycopg2
+from db import DB_CONFIG
+from log_config import logger
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+NO_TRANSACTION = "-- migrate: no-transaction"
+# Chave do advisory lock que impede dois processos de migrarem ao mesmo tempo
+LOCK_KEY = 7468132
+
+_FILE_RE = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+_INDEX_RE = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Lista as migrações disponíveis como (versão, nome, caminho), em ordem"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILE_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Há migrações com o mesmo número de versão")
+    return migrations
+
+def split_statements(sql):
+    """Separa um script em comandos (um por `;` no fim da linha), ignorando comentários"""
+    statements, current = [], []
+    for line in sql.splitlines():
+        if line.strip().startswith("--") or not line.strip():
+            continue
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statements.append("\n".join(current))
+            current = []
+    if current:
+        statements.append("\n".join(current))
+    return statements
+
+def concurrent_indexes(statements):
+    """Nomes dos índices criados com CREATE INDEX CONCURRENTLY nos comandos"""
+    return [m.group(1) for m in map(_INDEX_RE.search, statements) if m]
+
+def _drop_invalid_indexes(cursor, names):
+    """Remove os índices da lista que ficaram INVALID por um build interrompido"""
+    if not names:
+        return
+    cursor.execute("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid AND c.relname = ANY(%s) AND pg_table_is_visible(c.oid)
+    """, (names,))
+    for (index,) in cursor.fetchall():
+        logger.warning("MIGRATE: Removendo o índice inválido %s para recriá-lo", index)
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index}"')
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """)
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+def _apply(conn, version, name, path):
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+    cursor = conn.cursor()
+    try:
+        if sql.lstrip().startswith(NO_TRANSACTION):
+            conn.autocommit = True
+            statements = split_statements(sql)
+            _drop_invalid_indexes(cursor, concurrent_indexes(statements))
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)", (version, name))
+        else:
+            conn.autocommit = False
+            cursor.execute(sql)
+            cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+    except Exception:
+        if not conn.autocommit:
+            conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+        cursor.close()
+
+def apply_migrations(conn=None):
+    """Aplica as migrações pendentes e retorna os nomes das aplicadas"""
+    own_conn = conn is None
+    if own_conn:
+        conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    applied = []
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        try:
+            _ensure_version_table(cursor)
+            done = applied_versions(cursor)
+            for version, name, path in discover():
+                if version in done:
+                    continue
+                logger.info("MIGRATE: Aplicando migração %04d_%s", version, name)
+                _apply(conn, version, name, path)
+                applied.append(f"{version:04d}_{name}")
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+    except Exception as e:
+        logger.error("MIGRATE: Erro ao aplicar migrações - %s", e)
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+    return applied
+
+def status():
+    """Retorna [(versão, nome, aplicada)] para todas as migrações conhecidas"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            _ensure_version_table(cursor)
+            done = applied_versions(cursor)
+    finally:
+        conn.close()
+    return [(version, name, version in done) for version, name, _ in discover()]
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "up"
+    if command == "status":
+        for version, name, applied in status():
+            print(f"{version:04d}_{name}: {'aplicada' if applied else 'pendente'}")
+    elif command == "up":
+        applied = apply_migrations()
+        print("\n".join(applied) if applied else "Nenhuma migração pendente.")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
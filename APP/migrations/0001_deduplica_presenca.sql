@@ -0,0 +1,7 @@
+-- Remove presenças duplicadas (mesmo aluno na mesma data) mantendo o registro
+-- mais recente, para que a restrição única da migração 0003 possa ser criada.
+DELETE FROM presenca p
+USING presenca mais_recente
+WHERE p.id_aluno = mais_recente.id_aluno
+  AND p.data_presenca = mais_recente.data_presenca
+  AND p.id_presenca < mais_recente.id_presenca;
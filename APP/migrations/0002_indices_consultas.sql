@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- Índices das consultas por aluno e por turma. CONCURRENTLY não bloqueia
+-- escritas nas tabelas de instalações existentes durante a criação.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_presenca_aluno_data ON presenca (id_aluno, data_presenca);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_aluno_status_data ON pagamento (id_aluno, status, data_pagamento);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluno_turma ON aluno (id_turma);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_atividade_aluno_aluno ON atividade_aluno (id_aluno);
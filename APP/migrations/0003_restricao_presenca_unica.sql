@@ -0,0 +1,3 @@
+-- Promove o índice único a restrição: um registro de presença por aluno e data.
+ALTER TABLE presenca
+    ADD CONSTRAINT uq_presenca_aluno_data UNIQUE USING INDEX uq_presenca_aluno_data;
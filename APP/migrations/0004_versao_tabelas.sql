@@ -0,0 +1,38 @@
+-- Versão por tabela para GET condicional (ETag/Last-Modified). Um trigger por
+-- comando incrementa a versão a cada INSERT, UPDATE, DELETE ou TRUNCATE, seja
+-- qual for o processo ou cliente que escreveu.
+CREATE TABLE IF NOT EXISTS tabela_versao (
+    tabela VARCHAR(63) PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 1,
+    alterado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION incrementa_versao_tabela() RETURNS trigger AS $$
+BEGIN
+    UPDATE tabela_versao
+    SET versao = versao + 1, alterado_em = now()
+    WHERE tabela = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+INSERT INTO tabela_versao (tabela)
+VALUES ('aluno'), ('turma'), ('professor'), ('pagamento'), ('presenca'), ('atividade'), ('atividade_aluno'), ('usuario')
+ON CONFLICT (tabela) DO NOTHING;
+
+CREATE TRIGGER trg_versao_aluno AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON aluno
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
+CREATE TRIGGER trg_versao_turma AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON turma
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
+CREATE TRIGGER trg_versao_professor AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON professor
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
+CREATE TRIGGER trg_versao_pagamento AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pagamento
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
+CREATE TRIGGER trg_versao_presenca AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON presenca
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
+CREATE TRIGGER trg_versao_atividade AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON atividade
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
+CREATE TRIGGER trg_versao_atividade_aluno AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON atividade_aluno
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
+CREATE TRIGGER trg_versao_usuario AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON usuario
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela();
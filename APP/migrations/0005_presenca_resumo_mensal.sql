@@ -0,0 +1,29 @@
+-- Resumo de presenças por aluno e mês, usado por /presencas/relatorio. Os
+-- handlers de presença aplicam deltas (+1/-1) na mesma transação da escrita,
+-- então só os meses tocados são atualizados e o relatório não cresce com o
+-- histórico.
+CREATE TABLE presenca_resumo_mensal (
+    id_aluno INT NOT NULL REFERENCES aluno(id_aluno) ON DELETE CASCADE,
+    mes DATE NOT NULL,                      -- Primeiro dia do mês
+    presentes INT NOT NULL DEFAULT 0,
+    ausentes INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_aluno, mes)
+);
+
+-- Reconstrói o resumo inteiro a partir de presenca (após cargas em massa
+-- feitas fora da API, por exemplo).
+CREATE OR REPLACE FUNCTION recalcula_presenca_resumo_mensal() RETURNS void AS $$
+BEGIN
+    DELETE FROM presenca_resumo_mensal;
+    INSERT INTO presenca_resumo_mensal (id_aluno, mes, presentes, ausentes)
+    SELECT id_aluno,
+           date_trunc('month', data_presenca)::date,
+           count(*) FILTER (WHERE presente),
+           count(*) FILTER (WHERE NOT presente)
+    FROM presenca
+    WHERE id_aluno IS NOT NULL
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT recalcula_presenca_resumo_mensal();
@@ -0,0 +1,26 @@
+-- Totais de pagamentos por mês, status, forma de pagamento e referência, usados
+-- por /pagamentos/resumo. Os handlers de pagamento (e a importação CSV) aplicam
+-- deltas de quantidade e valor na mesma transação da escrita.
+CREATE TABLE pagamento_resumo_mensal (
+    mes DATE NOT NULL,                          -- Primeiro dia do mês
+    status VARCHAR(20) NOT NULL,
+    forma_pagamento VARCHAR(50) NOT NULL,
+    referencia VARCHAR(100) NOT NULL DEFAULT '', -- '' representa referência nula
+    quantidade INT NOT NULL DEFAULT 0,
+    total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (mes, status, forma_pagamento, referencia)
+);
+
+-- Reconstrói o resumo inteiro a partir de pagamento.
+CREATE OR REPLACE FUNCTION recalcula_pagamento_resumo_mensal() RETURNS void AS $$
+BEGIN
+    DELETE FROM pagamento_resumo_mensal;
+    INSERT INTO pagamento_resumo_mensal (mes, status, forma_pagamento, referencia, quantidade, total)
+    SELECT date_trunc('month', data_pagamento)::date, status, forma_pagamento,
+           coalesce(referencia, ''), count(*), sum(valor_pago)
+    FROM pagamento
+    GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT recalcula_pagamento_resumo_mensal();
@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- Índices dos filtros e ordenações das listagens. A PK vem por último em
+-- cada índice para que a paginação por chave (coluna, PK) use o índice.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_data ON pagamento (data_pagamento, id_pagamento);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pagamento_status ON pagamento (status, id_pagamento);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_presenca_data ON presenca (data_presenca, id_presenca);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_atividade_data ON atividade (data_realizacao, id_atividade);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_turma_professor ON turma (id_professor);
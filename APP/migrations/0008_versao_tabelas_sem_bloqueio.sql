@@ -0,0 +1,73 @@
+-- Versão das tabelas sem fila de escritores. Na 0004, todo comando de escrita
+-- atualizava a mesma linha de tabela_versao e segurava o lock dela até o
+-- commit: os escritores de uma tabela rodavam um de cada vez, e transações
+-- longas (lote de presenças, /batch, importação de CSV) travavam as demais.
+--
+-- Agora cada tabela tem 16 faixas e o trigger incrementa a faixa da própria
+-- conexão (pg_backend_pid() % 16). Conexões diferentes só disputam a mesma
+-- linha quando caem na mesma faixa. A versão é a soma das faixas: cada
+-- incremento só fica visível no commit e sempre aumenta a soma, seja qual
+-- for a ordem dos commits (um nextval() seria visível antes do commit e
+-- deixaria uma listagem cachear dados antigos com a versão nova).
+--
+-- Comandos que não alteram nenhuma linha não mudam a versão: INSERT, UPDATE e
+-- DELETE têm triggers separados, com tabela de transição, e o incremento só
+-- acontece se ela não estiver vazia. TRUNCATE sempre incrementa.
+CREATE TABLE tabela_versao_faixa (
+    tabela VARCHAR(63) NOT NULL,
+    faixa SMALLINT NOT NULL,
+    versao BIGINT NOT NULL DEFAULT 0,
+    alterado_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (tabela, faixa)
+);
+
+-- A faixa 0 herda a versão atual, e as ETags já emitidas continuam válidas
+INSERT INTO tabela_versao_faixa (tabela, faixa, versao, alterado_em)
+SELECT v.tabela, f.faixa, CASE WHEN f.faixa = 0 THEN v.versao ELSE 0 END, v.alterado_em
+FROM tabela_versao v, generate_series(0, 15) AS f(faixa);
+
+CREATE OR REPLACE FUNCTION incrementa_versao_tabela() RETURNS trigger AS $$
+BEGIN
+    UPDATE tabela_versao_faixa
+    SET versao = versao + 1, alterado_em = now()
+    WHERE tabela = TG_TABLE_NAME AND faixa = pg_backend_pid() % 16;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Para INSERT, UPDATE e DELETE: a tabela de transição `linhas` tem as linhas
+-- afetadas pelo comando
+CREATE OR REPLACE FUNCTION incrementa_versao_tabela_alterada() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM linhas) THEN
+        UPDATE tabela_versao_faixa
+        SET versao = versao + 1, alterado_em = now()
+        WHERE tabela = TG_TABLE_NAME AND faixa = pg_backend_pid() % 16;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOR t IN SELECT tabela FROM tabela_versao LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_versao_' || t, t);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS linhas '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela_alterada()',
+                       'trg_versao_' || t || '_insert', t);
+        EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS linhas '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela_alterada()',
+                       'trg_versao_' || t || '_update', t);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS linhas '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela_alterada()',
+                       'trg_versao_' || t || '_delete', t);
+        EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela()',
+                       'trg_versao_' || t || '_truncate', t);
+    END LOOP;
+END;
+$$;
+
+DROP TABLE tabela_versao;
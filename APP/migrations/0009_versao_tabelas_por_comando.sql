@@ -0,0 +1,37 @@
+-- Triggers de versão sem tabelas de transição. Os da 0008 guardavam todas as
+-- linhas de cada comando de escrita (REFERENCING NEW/OLD TABLE) só para saber
+-- se alguma foi afetada, um custo proporcional ao tamanho das escritas em
+-- massa (importação de CSV, chamada em lote, /batch). Volta a haver um
+-- trigger FOR EACH STATEMENT por tabela, sem tabela de transição: um comando
+-- que não altera nenhuma linha também incrementa a versão, o que só custa
+-- uma revalidação dos clientes.
+--
+-- alterado_em passa a ser clock_timestamp() (hora do comando), não now()
+-- (início da transação). Continua não sendo a hora do commit: por isso a
+-- API responde 304 só pelo ETag, nunca pelo If-Modified-Since sozinho.
+CREATE OR REPLACE FUNCTION incrementa_versao_tabela() RETURNS trigger AS $$
+BEGIN
+    UPDATE tabela_versao_faixa
+    SET versao = versao + 1, alterado_em = clock_timestamp()
+    WHERE tabela = TG_TABLE_NAME AND faixa = pg_backend_pid() % 16;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOR t IN SELECT DISTINCT tabela FROM tabela_versao_faixa LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_versao_' || t || '_insert', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_versao_' || t || '_update', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_versao_' || t || '_delete', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_versao_' || t || '_truncate', t);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versao_tabela()',
+                       'trg_versao_' || t, t);
+    END LOOP;
+END;
+$$;
+
+DROP FUNCTION incrementa_versao_tabela_alterada();
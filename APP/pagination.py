@@ -0,0 +1,104 @@
+import base64
+import json
+import os
+from urllib.parse import urlencode
+from flask import jsonify, request
+
+# Tamanho de página padrão e máximo aceito pelo servidor
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+
+# Parâmetros de paginação documentados no Swagger de todas as listagens
+PAGE_PARAMETERS = [
+    {
+        "name": "limit",
+        "in": "query",
+        "type": "integer",
+        "required": False,
+        "description": f"Itens por página (padrão {PAGE_SIZE_DEFAULT}, máximo {PAGE_SIZE_MAX})."
+    },
+    {
+        "name": "after",
+        "in": "query",
+        "type": "string",
+        "required": False,
+        "description": "Cursor devolvido no cabeçalho X-Next-Cursor da página anterior."
+    }
+]
+
+PAGE_HEADERS = {
+    "X-Next-Cursor": {"type": "string", "description": "Cursor da próxima página (ausente na última)."},
+    "Link": {"type": "string", "description": "URL da próxima página (rel=\"next\")."}
+}
+
+
+class PaginationError(ValueError):
+    """Parâmetros de paginação inválidos"""
+
+
+def encode_cursor(values):
+    """Codifica os valores da chave do último item em um cursor opaco"""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, key_columns):
+    """Decodifica um cursor, validando que corresponde à chave da tabela"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError("Cursor inválido")
+    if not isinstance(values, list) or len(values) != len(key_columns):
+        raise PaginationError("Cursor inválido")
+    return values
+
+def read_page_args(key_columns):
+    """Lê `limit` e `after` da query string da requisição atual"""
+    limit = request.args.get("limit", PAGE_SIZE_DEFAULT)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("Parâmetro limit deve ser um inteiro")
+    if limit < 1:
+        raise PaginationError("Parâmetro limit deve ser maior que zero")
+    limit = min(limit, PAGE_SIZE_MAX)
+
+    after = request.args.get("after")
+    if after:
+        after = decode_cursor(after, key_columns)
+    return limit, after or None
+
+def keyset_query(table, key_columns, after, limit, columns="*", where=None, params=(), descending=False):
+    """Monta o SELECT por chave: sempre usa o índice da PK, qualquer que seja a página.
+
+    Busca `limit + 1` linhas para saber se existe próxima página sem COUNT(*).
+    `where`/`params` restringem a consulta (filtros já validados) e
+    `descending` inverte a ordem da chave e a comparação com o cursor.
+    """
+    keys = ", ".join(key_columns)
+    conditions = [where] if where else []
+    params = list(params)
+    if after is not None:
+        placeholders = ", ".join(["%s"] * len(key_columns))
+        conditions.append(f"({keys}) {'<' if descending else '>'} ({placeholders})")
+        params.extend(after)
+    sql = f"SELECT {columns} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    direction = " DESC" if descending else ""
+    sql += f" ORDER BY {', '.join(column + direction for column in key_columns)} LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+def page_response(items, limit, key_columns):
+    """Resposta JSON da página, com o cursor da próxima página nos cabeçalhos"""
+    has_next = len(items) > limit
+    items = items[:limit]
+    response = jsonify(items)
+    if has_next:
+        cursor = encode_cursor(items[-1][column] for column in key_columns)
+        args = request.args.to_dict()
+        args["after"] = cursor
+        response.headers["X-Next-Cursor"] = cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from prepared import prepared
+
+# UPDATE pronto para executar; a linha devolvida traz `columns` e, depois
+# delas, os valores anteriores de `previous_columns`. `name` identifica a
+# combinação de colunas alteradas (nome do comando preparado).
+UpdateQuery = namedtuple("UpdateQuery", ["sql", "params", "columns", "previous_columns", "name"])
+
+
+class PatchError(ValueError):
+    """Corpo do PATCH vazio, que não é um objeto ou com colunas não editáveis"""
+
+
+class PartialUpdate:
+    """Colunas editáveis por PATCH em uma tabela.
+
+    O UPDATE altera só as colunas enviadas no corpo, e os nomes vêm da lista
+    branca `editable`, nunca da requisição. A linha atualizada volta no
+    mesmo comando (RETURNING `columns`). Com `previous`, o comando também
+    devolve os valores anteriores dessas colunas, lidos com FOR UPDATE no
+    mesmo UPDATE, para manter tabelas derivadas (ex.: resumos mensais).
+    Com `prepare`, cada combinação de colunas vira um comando preparado.
+    """
+
+    def __init__(self, table, key_column, editable, columns, previous=(), prepare=False):
+        self.table = table
+        self.key_column = key_column
+        self.editable = tuple(editable)
+        self.columns = tuple(columns)
+        self.previous = tuple(previous)
+        self.prepare = prepare
+
+    @property
+    def parameters(self):
+        """Parâmetros documentados no Swagger do PATCH"""
+        return [
+            {"name": "id", "in": "path", "required": True, "type": "integer"},
+            {
+                "name": "body",
+                "in": "body",
+                "required": True,
+                "description": f"Somente os campos a alterar, entre: {', '.join(self.editable)}.",
+                "schema": {"type": "object"}
+            }
+        ]
+
+    def set_columns(self, dados):
+        """Colunas enviadas, na ordem da lista branca"""
+        if not isinstance(dados, dict) or not dados:
+            raise PatchError("Informe ao menos um campo para atualizar")
+        invalid = [c for c in dados if c not in self.editable]
+        if invalid:
+            raise PatchError(f"Campos não editáveis: {', '.join(invalid)} (aceitos: {', '.join(self.editable)})")
+        return [c for c in self.editable if c in dados]
+
+    def query(self, id, dados):
+        set_columns = self.set_columns(dados)
+        assignments = ", ".join(f"{c} = %s" for c in set_columns)
+        values = [dados[c] for c in set_columns]
+        name = f"{self.table}_patch_" + "_".join(str(self.editable.index(c)) for c in set_columns)
+        if not self.previous:
+            sql = (f"UPDATE {self.table} SET {assignments} WHERE {self.key_column} = %s "
+                   f"RETURNING {', '.join(self.columns)}")
+            return UpdateQuery(sql, values + [id], self.columns, (), name)
+        returning = [f"{self.table}.{c}" for c in self.columns] + [f"anterior.{c}" for c in self.previous]
+        sql = (f"WITH anterior AS (SELECT {', '.join(self.previous)} FROM {self.table} "
+               f"WHERE {self.key_column} = %s FOR UPDATE) "
+               f"UPDATE {self.table} SET {assignments} FROM anterior WHERE {self.table}.{self.key_column} = %s "
+               f"RETURNING {', '.join(returning)}")
+        return UpdateQuery(sql, [id] + values + [id], self.columns, self.previous, name)
+
+    def execute(self, cursor, query):
+        if self.prepare:
+            prepared(query.name, query.sql).execute(cursor, query.params)
+        else:
+            cursor.execute(query.sql, query.params)
+
+    @staticmethod
+    def split(row, query):
+        """Separa a linha devolvida em (registro atualizado, valores anteriores)"""
+        n = len(query.columns)
+        return dict(zip(query.columns, row[:n])), dict(zip(query.previous_columns, row[n:]))
@@ -0,0 +1,155 @@
+"""Comandos preparados por conexão.
+
+Os comandos mais executados são registrados uma vez (`prepared(nome, sql)`)
+e, em cada conexão física do pool, preparados no primeiro uso com PREPARE.
+Depois disso vão como EXECUTE nome (...), e o Postgres não analisa nem
+reescreve o SQL de novo. A partir da sexta execução, se o plano genérico
+não for mais caro, ele também deixa de planejar. O controle é por conexão:
+uma conexão nova (reconexão, reciclagem do pool, outro worker) prepara de
+novo, e um "prepared statement does not exist" faz a mesma chamada
+preparar outra vez e repetir o comando.
+
+Desligue com DB_PREPARED_STATEMENTS=0 (ex.: atrás de um PgBouncer em modo
+transaction, onde a sessão do servidor muda a cada transação).
+"""
+import os
+import re
+import threading
+import weakref
+from psycopg2 import errors, extensions
+from prometheus_client import Counter
+
+PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "1") == "1"
+
+PREPARED_EVENTS = Counter(
+    "lumina_db_prepared_statements_total",
+    "Execuções dos comandos registrados: prepare (PREPARE numa conexão), reprepare (sessão perdeu o comando) e execute (EXECUTE por nome)",
+    ["statement", "event"]
+)
+
+# Nomes já preparados em cada conexão psycopg2 (some junto com a conexão)
+_prepared_on = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_registry = {}
+# Savepoint do PREPARE feito no meio de uma transação
+_SAVEPOINT = "comando_preparado"
+
+
+class PreparedStatement:
+    """Comando SQL (com %s) executado por nome nas conexões do pool.
+
+    O EXECUTE vai sempre sozinho, sem savepoint: nenhuma ida extra ao banco
+    nem subtransação no caminho comum. A sessão só perde os comandos entre
+    transações (DISCARD ALL, um pooler que trocou a sessão do servidor), e
+    isso aparece no primeiro EXECUTE da transação seguinte: nada foi feito
+    ainda, então a transação é desfeita, todos os comandos da conexão são
+    dados como perdidos e este é preparado e executado de novo, na mesma
+    chamada. Os demais são preparados no próximo uso. Se a perda aparecer
+    no meio de uma transação (ex.: dentro de um /batch), a requisição falha
+    e a seguinte prepara de novo.
+    """
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.param_count = sql.count("%s")
+        numbers = iter(range(1, self.param_count + 1))
+        self.prepare_sql = f"PREPARE {name} AS " + re.sub(r"%s", lambda _: f"${next(numbers)}", sql)
+        self.execute_sql = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * self.param_count)})" if self.param_count else "")
+        self.prepares = 0
+        self.executions = 0
+
+    def execute(self, cursor, params=()):
+        """Executa o comando no cursor, preparando-o antes se a conexão ainda não o tem"""
+        if not PREPARED_STATEMENTS:
+            cursor.execute(self.sql, params)
+            return
+        conn = cursor.connection
+        with _lock:
+            names = _prepared_on.setdefault(conn, set())
+            prepare = self.name not in names
+        in_transaction = conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INTRANS
+        if prepare:
+            self._prepare(cursor, conn, names, in_transaction)
+            cursor.execute(self.execute_sql, params)
+        else:
+            try:
+                cursor.execute(self.execute_sql, params)
+            except errors.InvalidSqlStatementName:
+                # Sessão reiniciada: nenhum comando desta conexão vale mais
+                with _lock:
+                    names.clear()
+                PREPARED_EVENTS.labels(statement=self.name, event="reprepare").inc()
+                if in_transaction:
+                    raise
+                conn.rollback()
+                self._prepare(cursor, conn, names, False)
+                cursor.execute(self.execute_sql, params)
+        with _lock:
+            self.executions += 1
+        PREPARED_EVENTS.labels(statement=self.name, event="execute").inc()
+
+    def _prepare(self, cursor, conn, names, in_transaction):
+        # Só no primeiro uso em cada conexão: o savepoint protege a
+        # transação de um DuplicatePreparedStatement (sessão reaproveitada)
+        if in_transaction:
+            cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+        try:
+            cursor.execute(self.prepare_sql)
+        except errors.DuplicatePreparedStatement:
+            # A sessão já tinha o comando (mesmo nome, mesmo SQL): só executa
+            self._recover(cursor, conn, in_transaction)
+        else:
+            with _lock:
+                self.prepares += 1
+            PREPARED_EVENTS.labels(statement=self.name, event="prepare").inc()
+        if in_transaction:
+            _release(conn)
+        with _lock:
+            names.add(self.name)
+
+    @staticmethod
+    def _recover(cursor, conn, in_transaction):
+        """Desfaz o comando que falhou, sem perder o que a transação já fez"""
+        if in_transaction:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+        else:
+            conn.rollback()
+
+
+def _release(conn):
+    # Em outro cursor, para não descartar o resultado do EXECUTE
+    with conn.cursor() as cursor:
+        cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+
+def prepared(name, sql):
+    """Registra um comando preparado; o nome deve ser único no processo"""
+    statement = _registry.get(name)
+    if statement is None:
+        statement = _registry[name] = PreparedStatement(name, sql)
+    elif statement.sql != sql:
+        raise ValueError(f"Comando preparado {name} já registrado com outro SQL")
+    return statement
+
+def prepared_stats():
+    """Execuções por comando e quantas dispensaram a análise (parse) do SQL"""
+    with _lock:
+        statements = {
+            name: {
+                "prepares": s.prepares,
+                "executions": s.executions,
+                "parses_saved": max(s.executions - s.prepares, 0)
+            }
+            for name, s in sorted(_registry.items())
+        }
+    return {
+        "enabled": PREPARED_STATEMENTS,
+        "executions": sum(s["executions"] for s in statements.values()),
+        "parses_saved": sum(s["parses_saved"] for s in statements.values()),
+        "statements": statements
+    }
+
+def plan_stats(cursor):
+    """Planos genéricos e específicos por comando nesta sessão (Postgres 14+)"""
+    cursor.execute("SELECT name, generic_plans, custom_plans FROM pg_prepared_statements ORDER BY name")
+    return {name: {"generic_plans": generic, "custom_plans": custom} for name, generic, custom in cursor.fetchall()}
@@ -1,18 +1,43 @@
+import json
+from decimal import Decimal
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
+from apidocs import swag_from
+from conditional import not_modified, table_version, with_version
 from db import connect_db
-from log_config import logger  # Importando configuração de logs
+from filters import FilterError, Listing, integer
+from partial_update import PartialUpdate, PatchError
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
+from log_config import SAMPLED, logger  # Importando configuração de logs
 
 aluno_bp = Blueprint('aluno', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing(
+    "aluno", ("id_aluno",),
+    ("id_aluno", "nome_completo", "data_nascimento", "id_turma", "nome_responsavel",
+     "telefone_responsavel", "email_responsavel", "informacoes_adicionais"),
+    filters=[integer("id_turma")],
+    sortable=("id_aluno", "nome_completo", "data_nascimento")
+)
+
+# Colunas que o PATCH pode alterar; a resposta traz as colunas da listagem
+EDICAO = PartialUpdate("aluno", "id_aluno", LISTAGEM.columns[1:], LISTAGEM.columns)
+
+# Itens padrão e máximos em /alunos/<id>/completo
+PERFIL_PAGAMENTOS = 12
+PERFIL_MESES = 12
+PERFIL_MAX_ITENS = 120
+
 @aluno_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar alunos",
     "description": "Retorna todos os alunos cadastrados na escola.",
     "tags": ["Aluno"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters,
     "responses": {
         200: {
             "description": "Lista de alunos cadastrados.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -33,32 +58,131 @@ aluno_bp = Blueprint('aluno', __name__)
     }
 })
 def listar_alunos():
-    """Endpoint que retorna todos os alunos cadastrados."""
+    """Endpoint que retorna uma página de alunos cadastrados."""
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM aluno")
+        versao = table_version(cursor, "aluno")
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        cursor.execute(consulta.sql, consulta.params)
         alunos = cursor.fetchall()
-        logger.info(f"READ: Listagem de {len(alunos)} alunos realizada.")
+        logger.info("READ: Listagem de %s alunos realizada.", len(alunos), extra=SAMPLED)
     except Exception as e:
-        logger.error(f"READ: Erro ao listar alunos - {str(e)}")
+        logger.error("READ: Erro ao listar alunos - %s", e)
         return jsonify({"error": f"Erro ao listar alunos: {str(e)}"}), 500
     finally:
         cursor.close()
         conn.close()
     
-    return jsonify([
-        {
-            "id_aluno": row[0],
-            "nome_completo": row[1], 
-            "data_nascimento": str(row[2]),
-            "id_turma": row[3],
-            "nome_responsavel": row[4],
-            "telefone_responsavel": row[5],
-            "email_responsavel": row[6],
-            "informacoes_adicionais": row[7]
-        } for row in alunos
-    ])
+    return with_version(page_response(LISTAGEM.to_items(alunos, consulta.columns), consulta.limit, consulta.key_columns), versao)
+
+@aluno_bp.route('/<int:id>/completo', methods=['GET'])
+@swag_from({
+    "summary": "Perfil completo do aluno",
+    "description": "Retorna o aluno com turma, professor, pagamentos recentes, resumo de presenças e atividades, montados em uma única consulta.",
+    "tags": ["Aluno"],
+    "parameters": [
+        {"name": "id", "in": "path", "type": "integer", "required": True},
+        {"name": "pagamentos", "in": "query", "type": "integer", "required": False,
+         "description": f"Quantidade de pagamentos recentes (padrão {PERFIL_PAGAMENTOS}, máximo {PERFIL_MAX_ITENS})."},
+        {"name": "meses", "in": "query", "type": "integer", "required": False,
+         "description": f"Meses de presença detalhados (padrão {PERFIL_MESES}, máximo {PERFIL_MAX_ITENS})."}
+    ],
+    "responses": {
+        200: {"description": "Perfil completo do aluno."},
+        404: {"description": "Aluno não encontrado."},
+        500: {"description": "Erro ao buscar aluno."}
+    }
+})
+def perfil_aluno(id):
+    """Endpoint que monta o perfil do aluno em uma ida ao banco."""
+    pagamentos = min(max(request.args.get('pagamentos', PERFIL_PAGAMENTOS, type=int), 0), PERFIL_MAX_ITENS)
+    meses = min(max(request.args.get('meses', PERFIL_MESES, type=int), 0), PERFIL_MAX_ITENS)
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT json_build_object(
+                'id_aluno', a.id_aluno,
+                'nome_completo', a.nome_completo,
+                'data_nascimento', a.data_nascimento,
+                'id_turma', a.id_turma,
+                'nome_responsavel', a.nome_responsavel,
+                'telefone_responsavel', a.telefone_responsavel,
+                'email_responsavel', a.email_responsavel,
+                'informacoes_adicionais', a.informacoes_adicionais,
+                'turma', CASE WHEN t.id_turma IS NULL THEN NULL ELSE json_build_object(
+                    'id_turma', t.id_turma, 'nome_turma', t.nome_turma, 'horario', t.horario
+                ) END,
+                'professor', CASE WHEN p.id_professor IS NULL THEN NULL ELSE json_build_object(
+                    'id_professor', p.id_professor, 'nome_completo', p.nome_completo,
+                    'email', p.email, 'telefone', p.telefone
+                ) END,
+                'pagamentos_recentes', coalesce((
+                    SELECT json_agg(pg ORDER BY pg.data_pagamento DESC, pg.id_pagamento DESC)
+                    FROM (
+                        SELECT id_pagamento, data_pagamento, valor_pago, forma_pagamento, referencia, status
+                        FROM pagamento
+                        WHERE id_aluno = a.id_aluno
+                        ORDER BY data_pagamento DESC, id_pagamento DESC
+                        LIMIT %(pagamentos)s
+                    ) pg
+                ), '[]'),
+                'presencas', (
+                    SELECT json_build_object(
+                        'presentes', coalesce(sum(r.presentes), 0),
+                        'ausentes', coalesce(sum(r.ausentes), 0),
+                        'meses', coalesce((
+                            SELECT json_agg(json_build_object(
+                                'mes', to_char(m.mes, 'YYYY-MM'), 'presentes', m.presentes, 'ausentes', m.ausentes
+                            ) ORDER BY m.mes DESC)
+                            FROM (
+                                SELECT mes, presentes, ausentes
+                                FROM presenca_resumo_mensal
+                                WHERE id_aluno = a.id_aluno
+                                ORDER BY mes DESC
+                                LIMIT %(meses)s
+                            ) m
+                        ), '[]')
+                    )
+                    FROM presenca_resumo_mensal r
+                    WHERE r.id_aluno = a.id_aluno
+                ),
+                'atividades', coalesce((
+                    SELECT json_agg(json_build_object(
+                        'id_atividade', at.id_atividade, 'descricao', at.descricao, 'data_realizacao', at.data_realizacao
+                    ) ORDER BY at.data_realizacao DESC, at.id_atividade)
+                    FROM atividade_aluno aa
+                    JOIN atividade at ON at.id_atividade = aa.id_atividade
+                    WHERE aa.id_aluno = a.id_aluno
+                ), '[]')
+            )::text
+            FROM aluno a
+            LEFT JOIN turma t ON t.id_turma = a.id_turma
+            LEFT JOIN professor p ON p.id_professor = t.id_professor
+            WHERE a.id_aluno = %(id)s
+        """, {"id": id, "pagamentos": pagamentos, "meses": meses})
+        row = cursor.fetchone()
+        if row is None:
+            logger.error("READ: Perfil do aluno %s - Não encontrado.", id)
+            return jsonify({"error": "Aluno não encontrado."}), 404
+        # Decimal preserva os centavos de valor_pago (float perderia precisão)
+        perfil = json.loads(row[0], parse_float=Decimal)
+    except Exception as e:
+        logger.error("READ: Erro ao buscar perfil do aluno %s - %s", id, e)
+        return jsonify({"error": f"Erro ao buscar aluno: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(perfil)
 
 @aluno_bp.route('/', methods=['POST'])
 @swag_from({
@@ -103,20 +227,21 @@ def criar_aluno():
         cursor.execute("""
             INSERT INTO aluno (nome_completo, data_nascimento, id_turma, nome_responsavel, telefone_responsavel, email_responsavel, informacoes_adicionais)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id_aluno
         """, (dados['nome_completo'], dados['data_nascimento'], dados['id_turma'], 
               dados['nome_responsavel'], dados['telefone_responsavel'], dados['email_responsavel'], 
               dados.get('informacoes_adicionais')))
+        aluno_id = cursor.fetchone()[0]
         conn.commit()
-        aluno_id = cursor.lastrowid
-        logger.info(f"CREATE: Aluno {dados['nome_completo']} criado com sucesso. ID: {aluno_id}")
+        logger.info("CREATE: Aluno %s criado com sucesso. ID: %s", dados['nome_completo'], aluno_id)
     except Exception as e:
-        logger.error(f"CREATE: Erro ao criar aluno {dados['nome_completo']} - {str(e)}")
+        logger.error("CREATE: Erro ao criar aluno %s - %s", dados['nome_completo'], e)
         return jsonify({"error": f"Erro ao criar aluno: {str(e)}"}), 400
     finally:
         cursor.close()
         conn.close()
 
-    return jsonify({"message": "Aluno criado com sucesso!"}), 201
+    return jsonify({"message": "Aluno criado com sucesso!", "id_aluno": aluno_id}), 201
 
 @aluno_bp.route('/<int:id>', methods=['PUT'])
 @swag_from({
@@ -147,9 +272,9 @@ def atualizar_aluno(id):
               dados['nome_responsavel'], dados['telefone_responsavel'], dados['email_responsavel'], 
               dados.get('informacoes_adicionais'), id))
         conn.commit()
-        logger.info(f"UPDATE: Aluno com ID {id} atualizado. Novos dados: {dados}")
+        logger.info("UPDATE: Aluno com ID %s atualizado. Campos: %s", id, ", ".join(dados))
     except Exception as e:
-        logger.error(f"UPDATE: Erro ao atualizar aluno {id} - {str(e)}")
+        logger.error("UPDATE: Erro ao atualizar aluno %s - %s", id, e)
         return jsonify({"error": f"Erro ao atualizar aluno: {str(e)}"}), 400
     finally:
         cursor.close()
@@ -157,6 +282,45 @@ def atualizar_aluno(id):
 
     return jsonify({"message": "Aluno atualizado com sucesso!"})
 
+@aluno_bp.route('/<int:id>', methods=['PATCH'])
+@swag_from({
+    "summary": "Atualizar aluno parcialmente",
+    "description": "Altera só os campos enviados e devolve o registro atualizado, em um único comando (UPDATE ... RETURNING).",
+    "tags": ["Aluno"],
+    "parameters": EDICAO.parameters,
+    "responses": {
+        200: {"description": "Registro atualizado."},
+        400: {"description": "Campos inválidos ou erro ao atualizar."},
+        404: {"description": "Aluno não encontrado."}
+    }
+})
+def atualizar_aluno_parcial(id):
+    """Atualiza só os campos enviados e devolve o registro atualizado."""
+    dados = request.get_json(silent=True)
+    try:
+        consulta = EDICAO.query(id, dados)
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute(consulta.sql, consulta.params)
+        row = cursor.fetchone()
+        if row is None:
+            return jsonify({"error": "Aluno não encontrado"}), 404
+        item, _ = EDICAO.split(row, consulta)
+        conn.commit()
+        logger.info("UPDATE: Aluno com ID %s atualizado parcialmente. Campos: %s", id, ", ".join(dados))
+    except Exception as e:
+        logger.error("UPDATE: Erro ao atualizar aluno %s - %s", id, e)
+        return jsonify({"error": f"Erro ao atualizar aluno: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(item)
+
 @aluno_bp.route('/<int:id>', methods=['DELETE'])
 @swag_from({
     "summary": "Excluir aluno",
@@ -174,12 +338,12 @@ def excluir_aluno(id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM aluno WHERE id_aluno=%s", (id,))
         if cursor.rowcount == 0:
-            logger.error(f"DELETE: Falha ao deletar aluno {id} - Não encontrado.")
+            logger.error("DELETE: Falha ao deletar aluno %s - Não encontrado.", id)
             return jsonify({"error": "Aluno não encontrado."}), 404
         conn.commit()
-        logger.info(f"DELETE: Aluno com ID {id} removido com sucesso.")
+        logger.info("DELETE: Aluno com ID %s removido com sucesso.", id)
     except Exception as e:
-        logger.error(f"DELETE: Erro ao excluir aluno {id} - {str(e)}")
+        logger.error("DELETE: Erro ao excluir aluno %s - %s", id, e)
         return jsonify({"error": f"Erro ao excluir aluno: {str(e)}"}), 400
     finally:
         cursor.close()
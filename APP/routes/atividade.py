@@ -1,17 +1,32 @@
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
+from apidocs import swag_from
+from cache import reference_cache
+from conditional import not_modified, table_version, with_version
 from db import connect_db
+from filters import FilterError, Listing, date_range
+from partial_update import PartialUpdate, PatchError
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
 
 atividade_bp = Blueprint('atividade', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing("atividade", ("id_atividade",), ("id_atividade", "descricao", "data_realizacao"), filters=[
+    *date_range("data_realizacao")
+], sortable=("id_atividade", "data_realizacao"))
+
+# Colunas que o PATCH pode alterar; a resposta traz as colunas da listagem
+EDICAO = PartialUpdate("atividade", "id_atividade", LISTAGEM.columns[1:], LISTAGEM.columns)
+
 @atividade_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar atividades",
     "description": "Retorna todas as atividades cadastradas.",
     "tags": ["Atividade"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters,
     "responses": {
         200: {
             "description": "Lista de atividades cadastradas.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -28,19 +43,33 @@ atividade_bp = Blueprint('atividade', __name__)
     }
 })
 def listar_atividades():
-    """Lista todas as atividades cadastradas no banco de dados."""
+    """Lista, por página, as atividades cadastradas no banco de dados."""
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM atividade")
-        atividades = cursor.fetchall()
+        versao = table_version(cursor, "atividade")
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        # A versão na chave faz o cache de outros processos expirar após escritas
+        chave_cache = ("atividade", versao and versao.version, consulta.sql, tuple(consulta.params))
+        atividades = reference_cache.get(chave_cache)
+        if atividades is None:
+            cursor.execute(consulta.sql, consulta.params)
+            atividades = LISTAGEM.to_items(cursor.fetchall(), consulta.columns)
+            reference_cache.set(chave_cache, atividades)
     except Exception as e:
         return jsonify({"error": f"Erro ao listar atividades: {str(e)}"}), 500
     finally:
         cursor.close()
         conn.close()
-    
-    return jsonify([{"id_atividade": row[0], "descricao": row[1], "data_realizacao": row[2]} for row in atividades])
+
+    return with_version(page_response(atividades, consulta.limit, consulta.key_columns), versao)
 
 @atividade_bp.route('/', methods=['POST'])
 @swag_from({
@@ -75,15 +104,18 @@ def criar_atividade():
         cursor.execute("""
             INSERT INTO atividade (descricao, data_realizacao)
             VALUES (%s, %s)
+            RETURNING id_atividade
         """, (dados['descricao'], dados['data_realizacao']))
+        atividade_id = cursor.fetchone()[0]
         conn.commit()
+        reference_cache.invalidate("atividade")
     except Exception as e:
         return jsonify({"error": f"Erro ao criar atividade: {str(e)}"}), 400
     finally:
         cursor.close()
         conn.close()
 
-    return jsonify({"message": "Atividade criada com sucesso!"}), 201
+    return jsonify({"message": "Atividade criada com sucesso!", "id_atividade": atividade_id}), 201
 
 @atividade_bp.route('/<int:id>', methods=['PUT'])
 @swag_from({
@@ -127,6 +159,7 @@ def atualizar_atividade(id):
             WHERE id_atividade=%s
         """, (dados['descricao'], dados['data_realizacao'], id))
         conn.commit()
+        reference_cache.invalidate("atividade")
     except Exception as e:
         return jsonify({"error": f"Erro ao atualizar atividade: {str(e)}"}), 400
     finally:
@@ -135,6 +168,44 @@ def atualizar_atividade(id):
 
     return jsonify({"message": "Atividade atualizada com sucesso!"})
 
+@atividade_bp.route('/<int:id>', methods=['PATCH'])
+@swag_from({
+    "summary": "Atualizar atividade parcialmente",
+    "description": "Altera só os campos enviados e devolve o registro atualizado, em um único comando (UPDATE ... RETURNING).",
+    "tags": ["Atividade"],
+    "parameters": EDICAO.parameters,
+    "responses": {
+        200: {"description": "Registro atualizado."},
+        400: {"description": "Campos inválidos ou erro ao atualizar."},
+        404: {"description": "Atividade não encontrada."}
+    }
+})
+def atualizar_atividade_parcial(id):
+    """Atualiza só os campos enviados e devolve o registro atualizado."""
+    dados = request.get_json(silent=True)
+    try:
+        consulta = EDICAO.query(id, dados)
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute(consulta.sql, consulta.params)
+        row = cursor.fetchone()
+        if row is None:
+            return jsonify({"error": "Atividade não encontrada"}), 404
+        item, _ = EDICAO.split(row, consulta)
+        conn.commit()
+        reference_cache.invalidate("atividade")
+    except Exception as e:
+        return jsonify({"error": f"Erro ao atualizar atividade: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(item)
+
 @atividade_bp.route('/<int:id>', methods=['DELETE'])
 @swag_from({
     "summary": "Excluir uma atividade",
@@ -160,6 +231,7 @@ def excluir_atividade(id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM atividade WHERE id_atividade=%s", (id,))
         conn.commit()
+        reference_cache.invalidate("atividade")
     except Exception as e:
         return jsonify({"error": f"Erro ao excluir atividade: {str(e)}"}), 400
     finally:
@@ -1,17 +1,28 @@
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
+from apidocs import swag_from
+from conditional import not_modified, table_version, with_version
 from db import connect_db
+from filters import FilterError, Listing, integer
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
 
 atividade_aluno_bp = Blueprint('atividade_aluno', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing("atividade_aluno", ("id_atividade", "id_aluno"), ("id_atividade", "id_aluno"), filters=[
+    integer("id_atividade"),
+    integer("id_aluno")
+])
+
 @atividade_aluno_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar associações entre Atividade e Aluno",
     "description": "Retorna todas as associações entre atividades e alunos.",
     "tags": ["Atividade_Aluno"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters,
     "responses": {
         200: {
             "description": "Lista de associações entre atividades e alunos.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -27,11 +38,20 @@ atividade_aluno_bp = Blueprint('atividade_aluno', __name__)
     }
 })
 def listar_atividades_alunos():
-    """Lista todas as associações entre Atividade e Aluno no banco de dados."""
+    """Lista, por página, as associações entre Atividade e Aluno no banco de dados."""
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM atividade_aluno")
+        versao = table_version(cursor, "atividade_aluno")
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        cursor.execute(consulta.sql, consulta.params)
         atividades_alunos = cursor.fetchall()
     except Exception as e:
         return jsonify({"error": f"Erro ao listar atividades e alunos: {str(e)}"}), 500
@@ -39,7 +59,7 @@ def listar_atividades_alunos():
         cursor.close()
         conn.close()
     
-    return jsonify([{"id_atividade": row[0], "id_aluno": row[1]} for row in atividades_alunos])
+    return with_version(page_response(LISTAGEM.to_items(atividades_alunos, consulta.columns), consulta.limit, consulta.key_columns), versao)
 
 @atividade_aluno_bp.route('/', methods=['POST'])
 @swag_from({
@@ -0,0 +1,161 @@
+import re
+from flask import Blueprint, current_app, g, jsonify, request
+from werkzeug.test import EnvironBuilder
+from apidocs import swag_from
+from db import batch_connection, db_time, reset_db_time
+from log_config import logger
+
+batch_bp = Blueprint('batch', __name__)
+
+# Quantidade máxima de operações por lote
+BATCH_MAX_OPERACOES = 50
+# Só escritas: leituras dentro da transação do lote poderiam ver (e cachear) dados desfeitos depois
+BATCH_METODOS = ("POST", "PUT", "PATCH", "DELETE")
+BATCH_MODOS = ("atomico", "por_operacao")
+
+# "$0.id_aluno": campo id_aluno da resposta da operação 0 do mesmo lote
+_REFERENCIA = re.compile(r"\$(\d+)\.(\w+)")
+
+
+class ReferenciaInvalida(ValueError):
+    """Referência a uma operação anterior que falhou, não existe ou não tem o campo"""
+
+
+def _resolver(valor, resultados):
+    """Substitui as referências $N.campo pelos valores das respostas anteriores"""
+    def buscar(match):
+        indice, campo = int(match.group(1)), match.group(2)
+        corpo = resultados[indice]["corpo"] if indice < len(resultados) and resultados[indice]["status"] < 400 else None
+        if not isinstance(corpo, dict) or campo not in corpo:
+            raise ReferenciaInvalida(f"Referência inválida: {match.group(0)}")
+        return corpo[campo]
+
+    if isinstance(valor, str):
+        inteira = _REFERENCIA.fullmatch(valor)
+        if inteira:
+            return buscar(inteira)
+        return _REFERENCIA.sub(lambda m: str(buscar(m)), valor)
+    if isinstance(valor, list):
+        return [_resolver(v, resultados) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _resolver(v, resultados) for k, v in valor.items()}
+    return valor
+
+def _validar(dados):
+    """Mensagem de erro da estrutura do lote, ou None se válida"""
+    if not isinstance(dados, dict) or not isinstance(dados.get('operacoes'), list) or not dados['operacoes']:
+        return "Informe a lista operacoes"
+    if dados.get('modo', 'atomico') not in BATCH_MODOS:
+        return f"modo deve ser um de: {', '.join(BATCH_MODOS)}"
+    if len(dados['operacoes']) > BATCH_MAX_OPERACOES:
+        return f"Máximo de {BATCH_MAX_OPERACOES} operações por lote"
+    for indice, op in enumerate(dados['operacoes']):
+        if not isinstance(op, dict) or op.get('metodo') not in BATCH_METODOS:
+            return f"Operação {indice}: metodo deve ser um de {', '.join(BATCH_METODOS)}"
+        caminho = op.get('caminho')
+        if not isinstance(caminho, str) or not caminho.startswith('/') or caminho.startswith('/batch'):
+            return f"Operação {indice}: caminho inválido"
+    return None
+
+def _executar(indice, metodo, caminho, corpo):
+    """Despacha a operação para o handler do blueprint, como uma requisição interna.
+
+    Cada operação tem o próprio contexto de aplicação (e o próprio `g`): os
+    hooks de métricas e de log da operação não tocam nos valores do /batch.
+    O tempo de banco da operação é somado ao do lote.
+    """
+    builder = EnvironBuilder(path=caminho, method=metodo, json=corpo, base_url=request.host_url,
+                             headers={"X-Request-ID": f"{g.get('request_id', 'lote')}.{indice}"})
+    tempo_banco = db_time()
+    try:
+        with current_app.app_context(), current_app.request_context(builder.get_environ()):
+            resposta = current_app.full_dispatch_request()
+            corpo_resposta = resposta.get_json(silent=True)
+            if corpo_resposta is None:
+                corpo_resposta = resposta.get_data(as_text=True) or None
+            return resposta.status_code, corpo_resposta
+    except Exception as e:
+        logger.error("BATCH: Erro na operação %s (%s %s) - %s", indice, metodo, caminho, e)
+        return 500, {"error": "Erro interno do servidor"}
+    finally:
+        reset_db_time(tempo_banco + db_time())
+        builder.close()
+
+@batch_bp.route('', methods=['POST'])
+@swag_from({
+    "summary": "Executar operações em lote",
+    "description": "Executa em ordem uma lista de escritas (POST, PUT, PATCH, DELETE) nas rotas da API, todas na mesma conexão e na mesma transação. No modo atomico (padrão) a primeira falha desfaz o lote inteiro; no modo por_operacao cada falha desfaz só a própria operação (savepoint) e o restante é confirmado. Valores \"$N.campo\" no caminho ou no corpo são substituídos pelo campo da resposta da operação N (ex.: \"$0.id_aluno\").",
+    "tags": ["Lote"],
+    "parameters": [
+        {
+            "name": "body",
+            "in": "body",
+            "required": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "modo": {"type": "string", "enum": list(BATCH_MODOS), "example": "atomico"},
+                    "operacoes": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "metodo": {"type": "string", "enum": list(BATCH_METODOS), "example": "POST"},
+                                "caminho": {"type": "string", "example": "/atividades_alunos/"},
+                                "corpo": {"type": "object", "example": {"id_atividade": 1, "id_aluno": "$0.id_aluno"}}
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    ],
+    "responses": {
+        200: {"description": "Lote confirmado, com o status e o corpo de cada operação."},
+        400: {"description": "Lote inválido ou desfeito por uma falha no modo atomico."}
+    }
+})
+def executar_lote():
+    """Executa várias escritas dos blueprints em uma conexão e uma transação."""
+    dados = request.get_json(silent=True)
+    erro = _validar(dados)
+    if erro:
+        return jsonify({"error": erro}), 400
+    modo = dados.get('modo', 'atomico')
+    operacoes = dados['operacoes']
+
+    resultados = []
+    falhas = 0
+    try:
+        with batch_connection() as lote:
+            for indice, op in enumerate(operacoes):
+                resultado = {"indice": indice, "metodo": op['metodo']}
+                try:
+                    caminho = _resolver(op['caminho'], resultados)
+                    corpo = _resolver(op.get('corpo'), resultados)
+                except ReferenciaInvalida as e:
+                    resultado.update(caminho=op['caminho'], status=400, corpo={"error": str(e)})
+                else:
+                    lote.begin_operation()
+                    status, corpo_resposta = _executar(indice, op['metodo'], caminho, corpo)
+                    lote.end_operation(status < 400)
+                    resultado.update(caminho=caminho, status=status, corpo=corpo_resposta)
+                resultados.append(resultado)
+                if resultado["status"] >= 400:
+                    falhas += 1
+                    if modo == 'atomico':
+                        break
+            confirmado = modo == 'por_operacao' or falhas == 0
+            if confirmado:
+                lote.commit_batch()
+    except Exception as e:
+        logger.error("BATCH: Erro ao executar lote de %s operações - %s", len(operacoes), e)
+        return jsonify({"error": f"Erro ao executar lote: {str(e)}"}), 400
+
+    for indice in range(len(resultados), len(operacoes)):
+        resultados.append({"indice": indice, "metodo": operacoes[indice]['metodo'],
+                           "caminho": operacoes[indice]['caminho'], "status": None,
+                           "corpo": {"error": "Não executada: o lote foi desfeito"}})
+    logger.info("BATCH: %s operações (%s), %s com falha, %s", len(operacoes), modo, falhas,
+                "confirmado" if confirmado else "desfeito")
+    return jsonify({"modo": modo, "confirmado": confirmado, "resultados": resultados}), 200 if confirmado else 400
@@ -1,17 +1,111 @@
+import csv
+from datetime import datetime
+from decimal import Decimal
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
-from db import connect_db
+from apidocs import swag_from
+from conditional import not_modified, table_version, with_version
+from psycopg2.extras import execute_values
+from db import connect_db, green_enabled
+from filters import FilterError, Listing, date_range, eq, integer
+from partial_update import PartialUpdate, PatchError
+from prepared import prepared
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
+from streaming import STREAM_PARAMETERS, stream_query, wants_stream
 
 pagamento_bp = Blueprint('pagamento', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing("pagamento", ("id_pagamento",), ("id_pagamento", "id_aluno", "data_pagamento", "valor_pago", "forma_pagamento", "referencia", "status"), filters=[
+    integer("id_aluno"),
+    eq("status"),
+    eq("forma_pagamento"),
+    *date_range("data_pagamento")
+], sortable=("id_pagamento", "data_pagamento", "valor_pago"))
+
+# Colunas que o PATCH pode alterar; a resposta traz as colunas da listagem
+EDICAO = PartialUpdate("pagamento", "id_pagamento", LISTAGEM.columns[1:], LISTAGEM.columns,
+                       previous=("data_pagamento", "status", "forma_pagamento", "referencia", "valor_pago"), prepare=True)
+
+# Comandos mais executados, preparados uma vez por conexão do pool
+INSERIR = prepared("pagamento_inserir", """
+    INSERT INTO pagamento (id_aluno, data_pagamento, valor_pago, forma_pagamento, referencia, status)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    RETURNING id_pagamento
+""")
+ANTERIOR = prepared("pagamento_anterior", """
+    SELECT data_pagamento, status, forma_pagamento, referencia, valor_pago
+    FROM pagamento WHERE id_pagamento = %s FOR UPDATE
+""")
+ATUALIZAR = prepared("pagamento_atualizar", """
+    UPDATE pagamento
+    SET id_aluno = %s, data_pagamento = %s, valor_pago = %s, forma_pagamento = %s, referencia = %s, status = %s
+    WHERE id_pagamento = %s
+""")
+EXCLUIR = prepared("pagamento_excluir", """
+    DELETE FROM pagamento WHERE id_pagamento = %s
+    RETURNING data_pagamento, status, forma_pagamento, referencia, valor_pago
+""")
+
+# Dimensões do resumo financeiro, na ordem de agrupamento
+RESUMO_DIMENSOES = ("mes", "status", "forma_pagamento", "referencia")
+# Colunas aceitas no CSV de /pagamentos/importar
+IMPORTACAO_COLUNAS = ("id_aluno", "data_pagamento", "valor_pago", "forma_pagamento", "referencia", "status")
+IMPORTACAO_OBRIGATORIAS = ("id_aluno", "data_pagamento", "valor_pago", "forma_pagamento", "status")
+# Quantidade máxima de linhas rejeitadas detalhadas na resposta
+IMPORTACAO_MAX_REJEITADAS = 1000
+# Linhas por INSERT na carga da staging sem COPY (modo assíncrono)
+IMPORTACAO_LOTE = 1000
+
+def _atualizar_resumo(cursor, deltas):
+    """Aplica deltas (data_pagamento, status, forma_pagamento, referencia, valor_pago, sinal) ao resumo mensal"""
+    if not deltas:
+        return
+    execute_values(cursor, """
+        INSERT INTO pagamento_resumo_mensal AS r (mes, status, forma_pagamento, referencia, quantidade, total)
+        SELECT date_trunc('month', data_pagamento)::date, status, forma_pagamento, coalesce(referencia, ''),
+               sum(sinal), sum(sinal * valor_pago)
+        FROM (VALUES %s) AS v(data_pagamento, status, forma_pagamento, referencia, valor_pago, sinal)
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (mes, status, forma_pagamento, referencia) DO UPDATE
+        SET quantidade = r.quantidade + EXCLUDED.quantidade,
+            total = r.total + EXCLUDED.total
+    """, deltas, template="(%s::date, %s, %s, %s, %s::numeric, %s::int)", page_size=len(deltas))
+
+def _carregar_staging(cursor, colunas, stream):
+    """Carrega o CSV na tabela de staging.
+
+    No modo assíncrono (gevent) o psycopg2 não aceita COPY; as linhas vão
+    em INSERTs de IMPORTACAO_LOTE linhas, com campos vazios como NULL.
+    """
+    if not green_enabled():
+        cursor.copy_expert(
+            f"COPY pagamento_importacao ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)",
+            stream
+        )
+        return
+    sql = f"INSERT INTO pagamento_importacao ({', '.join(colunas)}) VALUES %s"
+    lote = []
+    for numero, campos in enumerate(csv.reader(linha.decode('utf-8') for linha in stream), 2):
+        if len(campos) != len(colunas):
+            raise ValueError(f"Linha {numero} do CSV tem {len(campos)} campos, esperados {len(colunas)}")
+        lote.append([campo or None for campo in campos])
+        if len(lote) == IMPORTACAO_LOTE:
+            execute_values(cursor, sql, lote, page_size=IMPORTACAO_LOTE)
+            lote = []
+    if lote:
+        execute_values(cursor, sql, lote, page_size=IMPORTACAO_LOTE)
+
 @pagamento_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar pagamentos",
     "description": "Retorna todos os pagamentos registrados.",
     "tags": ["Pagamento"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters + STREAM_PARAMETERS,
+    "produces": ["application/json", "application/x-ndjson"],
     "responses": {
         200: {
             "description": "Lista de pagamentos.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -32,11 +126,29 @@ pagamento_bp = Blueprint('pagamento', __name__)
     }
 })
 def listar_pagamentos():
-    """Lista todos os pagamentos registrados no sistema."""
+    """Lista, por página, os pagamentos registrados no sistema."""
+    if wants_stream():
+        try:
+            consulta = LISTAGEM.full_query()
+            return stream_query(consulta.sql, consulta.params, LISTAGEM.to_item(consulta.columns))
+        except FilterError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": f"Erro ao exportar pagamentos: {str(e)}"}), 500
+
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM pagamento")
+        versao = table_version(cursor, "pagamento")
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        cursor.execute(consulta.sql, consulta.params)
         pagamentos = cursor.fetchall()
     except Exception as e:
         return jsonify({"error": f"Erro ao listar pagamentos: {str(e)}"}), 500
@@ -44,10 +156,7 @@ def listar_pagamentos():
         cursor.close()
         conn.close()
     
-    return jsonify([
-        {"id_pagamento": row[0], "id_aluno": row[1], "data_pagamento": row[2], "valor_pago": row[3], 
-         "forma_pagamento": row[4], "referencia": row[5], "status": row[6]} for row in pagamentos
-    ])
+    return with_version(page_response(LISTAGEM.to_items(pagamentos, consulta.columns), consulta.limit, consulta.key_columns), versao)
 
 @pagamento_bp.route('/', methods=['POST'])
 @swag_from({
@@ -83,18 +192,197 @@ def criar_pagamento():
     try:
         conn = connect_db()
         cursor = conn.cursor()
+        INSERIR.execute(cursor, (dados['id_aluno'], dados['data_pagamento'], dados['valor_pago'], dados['forma_pagamento'], dados['referencia'], dados['status']))
+        pagamento_id = cursor.fetchone()[0]
+        _atualizar_resumo(cursor, [
+            (dados['data_pagamento'], dados['status'], dados['forma_pagamento'], dados['referencia'], dados['valor_pago'], 1)
+        ])
+        conn.commit()
+    except Exception as e:
+        return jsonify({"error": f"Erro ao registrar pagamento: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify({"message": "Pagamento registrado com sucesso!", "id_pagamento": pagamento_id}), 201
+
+@pagamento_bp.route('/resumo', methods=['GET'])
+@swag_from({
+    "summary": "Resumo financeiro dos pagamentos",
+    "description": "Quantidade e valor total de pagamentos por mês, status, forma de pagamento e referência, lidos do resumo mensal mantido a cada escrita.",
+    "tags": ["Pagamento"],
+    "parameters": [
+        {"name": "mes_inicio", "in": "query", "type": "string", "required": False, "description": "Primeiro mês (AAAA-MM).", "example": "2025-01"},
+        {"name": "mes_fim", "in": "query", "type": "string", "required": False, "description": "Último mês (AAAA-MM).", "example": "2025-12"},
+        {"name": "status", "in": "query", "type": "string", "required": False, "example": "Pendente"},
+        {"name": "forma_pagamento", "in": "query", "type": "string", "required": False},
+        {"name": "referencia", "in": "query", "type": "string", "required": False},
+        {"name": "agrupar", "in": "query", "type": "string", "required": False,
+         "description": "Dimensões separadas por vírgula (mes, status, forma_pagamento, referencia). Padrão: todas."}
+    ],
+    "responses": {
+        200: {"description": "Totais gerais e por grupo."},
+        400: {"description": "Parâmetros inválidos."},
+        500: {"description": "Erro ao gerar resumo."}
+    }
+})
+def resumo_pagamentos():
+    """Totais de pagamentos agregados a partir do resumo mensal."""
+    agrupar = [d.strip() for d in request.args.get('agrupar', ','.join(RESUMO_DIMENSOES)).split(',') if d.strip()]
+    if not set(agrupar) <= set(RESUMO_DIMENSOES):
+        return jsonify({"error": f"agrupar aceita apenas: {', '.join(RESUMO_DIMENSOES)}"}), 400
+    agrupar = [d for d in RESUMO_DIMENSOES if d in agrupar]
+
+    condicoes, params = ["TRUE"], []
+    for parametro, operador in (('mes_inicio', '>='), ('mes_fim', '<=')):
+        if request.args.get(parametro):
+            try:
+                mes = datetime.strptime(request.args[parametro], "%Y-%m").date()
+            except ValueError:
+                return jsonify({"error": f"{parametro} deve estar no formato AAAA-MM"}), 400
+            condicoes.append(f"mes {operador} %s")
+            params.append(mes)
+    for coluna in ('status', 'forma_pagamento', 'referencia'):
+        if coluna in request.args:
+            condicoes.append(f"{coluna} = %s")
+            params.append(request.args[coluna])
+
+    colunas = ", ".join(agrupar)
+    sql = f"""
+        SELECT {colunas + ',' if agrupar else ''} sum(quantidade), sum(total)
+        FROM pagamento_resumo_mensal
+        WHERE {' AND '.join(condicoes)}
+        {'GROUP BY ' + colunas if agrupar else ''}
+        HAVING sum(quantidade) <> 0
+        {'ORDER BY ' + colunas if agrupar else ''}
+    """
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        linhas = cursor.fetchall()
+    except Exception as e:
+        return jsonify({"error": f"Erro ao gerar resumo de pagamentos: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+    grupos = []
+    for row in linhas:
+        grupo = dict(zip(agrupar, row))
+        if 'mes' in grupo:
+            grupo['mes'] = grupo['mes'].strftime("%Y-%m")
+        if grupo.get('referencia') == '':
+            grupo['referencia'] = None
+        grupo.update(quantidade=row[-2], total=row[-1])
+        grupos.append(grupo)
+    return jsonify({
+        "quantidade": sum(g["quantidade"] for g in grupos),
+        "total": sum((g["total"] for g in grupos), Decimal("0")),
+        "grupos": grupos
+    })
+
+@pagamento_bp.route('/importar', methods=['POST'])
+@swag_from({
+    "summary": "Importar pagamentos via CSV",
+    "description": "Carrega um CSV (cabeçalho com id_aluno, data_pagamento, valor_pago, forma_pagamento, referencia, status) com COPY em uma tabela de staging, valida as linhas e insere as válidas em pagamento com um único INSERT ... SELECT. Pagamentos idênticos a um já registrado são rejeitados, o que torna a reimportação do mesmo arquivo segura.",
+    "tags": ["Pagamento"],
+    "consumes": ["multipart/form-data", "text/csv"],
+    "parameters": [
+        {
+            "name": "arquivo",
+            "in": "formData",
+            "type": "file",
+            "required": False,
+            "description": "Arquivo CSV (ou envie o CSV direto no corpo com Content-Type text/csv)."
+        }
+    ],
+    "responses": {
+        200: {"description": "Resumo da importação com as linhas rejeitadas."},
+        400: {"description": "Erro ao importar pagamentos."}
+    }
+})
+def importar_pagamentos():
+    """Importa pagamentos em massa de um CSV lido em streaming."""
+    arquivo = request.files.get('arquivo')
+    stream = arquivo.stream if arquivo else request.stream
+    cabecalho = stream.readline().decode('utf-8-sig').strip()
+    colunas = [c.strip() for c in cabecalho.split(',')] if cabecalho else []
+    if not set(IMPORTACAO_OBRIGATORIAS) <= set(colunas) or not set(colunas) <= set(IMPORTACAO_COLUNAS) \
+            or len(set(colunas)) != len(colunas):
+        return jsonify({"error": f"Cabeçalho do CSV deve conter as colunas {', '.join(IMPORTACAO_COLUNAS)}"}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE pagamento_importacao (
+                linha BIGINT GENERATED ALWAYS AS IDENTITY (START WITH 2),
+                id_aluno TEXT, data_pagamento TEXT, valor_pago TEXT,
+                forma_pagamento TEXT, referencia TEXT, status TEXT,
+                motivo TEXT
+            ) ON COMMIT DROP
+        """)
+        _carregar_staging(cursor, colunas, stream)
+        # Classifica todas as linhas de uma vez; a primeira regra violada vira o motivo
+        cursor.execute(r"""
+            UPDATE pagamento_importacao s SET motivo = CASE
+                WHEN s.id_aluno IS NULL OR s.id_aluno !~ '^\s*\d{1,9}\s*$' THEN 'id_aluno inválido'
+                WHEN NOT EXISTS (SELECT 1 FROM aluno a WHERE a.id_aluno = s.id_aluno::int) THEN 'Aluno não encontrado'
+                WHEN s.data_pagamento IS NULL OR s.data_pagamento !~ '^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$' THEN 'data_pagamento inválida'
+                WHEN substr(s.data_pagamento, 9, 2)::int > extract(day from (substr(s.data_pagamento, 1, 8) || '01')::date + interval '1 month - 1 day') THEN 'data_pagamento inválida'
+                WHEN s.valor_pago IS NULL OR s.valor_pago !~ '^\s*-?\d{1,8}(\.\d{1,2})?\s*$' THEN 'valor_pago inválido'
+                WHEN coalesce(trim(s.forma_pagamento), '') = '' OR length(s.forma_pagamento) > 50 THEN 'forma_pagamento inválida'
+                WHEN length(s.referencia) > 100 THEN 'referencia inválida'
+                WHEN coalesce(trim(s.status), '') = '' OR length(s.status) > 20 THEN 'status inválido'
+                WHEN EXISTS (
+                    SELECT 1 FROM pagamento p
+                    WHERE p.id_aluno = s.id_aluno::int AND p.data_pagamento = s.data_pagamento::date
+                      AND p.valor_pago = s.valor_pago::numeric AND p.forma_pagamento = s.forma_pagamento
+                      AND p.referencia IS NOT DISTINCT FROM s.referencia AND p.status = s.status
+                ) THEN 'Pagamento já registrado'
+            END
+        """)
+        total = cursor.rowcount
         cursor.execute("""
             INSERT INTO pagamento (id_aluno, data_pagamento, valor_pago, forma_pagamento, referencia, status)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (dados['id_aluno'], dados['data_pagamento'], dados['valor_pago'], dados['forma_pagamento'], dados['referencia'], dados['status']))
+            SELECT id_aluno::int, data_pagamento::date, valor_pago::numeric(10,2), forma_pagamento, referencia, status
+            FROM pagamento_importacao
+            WHERE motivo IS NULL
+            ORDER BY linha
+        """)
+        importados = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO pagamento_resumo_mensal AS r (mes, status, forma_pagamento, referencia, quantidade, total)
+            SELECT date_trunc('month', data_pagamento::date)::date, status, forma_pagamento, coalesce(referencia, ''),
+                   count(*), sum(valor_pago::numeric(10,2))
+            FROM pagamento_importacao
+            WHERE motivo IS NULL
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (mes, status, forma_pagamento, referencia) DO UPDATE
+            SET quantidade = r.quantidade + EXCLUDED.quantidade,
+                total = r.total + EXCLUDED.total
+        """)
+        cursor.execute("""
+            SELECT linha, motivo FROM pagamento_importacao
+            WHERE motivo IS NOT NULL
+            ORDER BY linha
+            LIMIT %s
+        """, (IMPORTACAO_MAX_REJEITADAS,))
+        rejeitadas = [{"linha": row[0], "motivo": row[1]} for row in cursor.fetchall()]
         conn.commit()
     except Exception as e:
-        return jsonify({"error": f"Erro ao registrar pagamento: {str(e)}"}), 400
+        return jsonify({"error": f"Erro ao importar pagamentos: {str(e)}"}), 400
     finally:
         cursor.close()
         conn.close()
 
-    return jsonify({"message": "Pagamento registrado com sucesso!"}), 201
+    return jsonify({
+        "total": total,
+        "importados": importados,
+        "rejeitados": total - importados,
+        "linhas_rejeitadas": rejeitadas
+    })
 
 @pagamento_bp.route('/<int:id>', methods=['PUT'])
 @swag_from({
@@ -136,11 +424,14 @@ def atualizar_pagamento(id):
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE pagamento
-            SET id_aluno=%s, data_pagamento=%s, valor_pago=%s, forma_pagamento=%s, referencia=%s, status=%s
-            WHERE id_pagamento=%s
-        """, (dados['id_aluno'], dados['data_pagamento'], dados['valor_pago'], dados['forma_pagamento'], dados['referencia'], dados['status'], id))
+        ANTERIOR.execute(cursor, (id,))
+        anterior = cursor.fetchone()
+        ATUALIZAR.execute(cursor, (dados['id_aluno'], dados['data_pagamento'], dados['valor_pago'], dados['forma_pagamento'], dados['referencia'], dados['status'], id))
+        if anterior:
+            _atualizar_resumo(cursor, [
+                (*anterior, -1),
+                (dados['data_pagamento'], dados['status'], dados['forma_pagamento'], dados['referencia'], dados['valor_pago'], 1)
+            ])
         conn.commit()
     except Exception as e:
         return jsonify({"error": f"Erro ao atualizar pagamento: {str(e)}"}), 400
@@ -150,6 +441,46 @@ def atualizar_pagamento(id):
 
     return jsonify({"message": "Pagamento atualizado com sucesso!"})
 
+@pagamento_bp.route('/<int:id>', methods=['PATCH'])
+@swag_from({
+    "summary": "Atualizar pagamento parcialmente",
+    "description": "Altera só os campos enviados e devolve o registro atualizado, em um único comando (UPDATE ... RETURNING).",
+    "tags": ["Pagamento"],
+    "parameters": EDICAO.parameters,
+    "responses": {
+        200: {"description": "Registro atualizado."},
+        400: {"description": "Campos inválidos ou erro ao atualizar."},
+        404: {"description": "Pagamento não encontrado."}
+    }
+})
+def atualizar_pagamento_parcial(id):
+    """Atualiza só os campos enviados e devolve o registro atualizado."""
+    dados = request.get_json(silent=True)
+    try:
+        consulta = EDICAO.query(id, dados)
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        EDICAO.execute(cursor, consulta)
+        row = cursor.fetchone()
+        if row is None:
+            return jsonify({"error": "Pagamento não encontrado"}), 404
+        item, anterior = EDICAO.split(row, consulta)
+        novo = tuple(item[c] for c in EDICAO.previous)
+        if novo != tuple(anterior[c] for c in EDICAO.previous):
+            _atualizar_resumo(cursor, [(*anterior.values(), -1), (*novo, 1)])
+        conn.commit()
+    except Exception as e:
+        return jsonify({"error": f"Erro ao atualizar pagamento: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(item)
+
 @pagamento_bp.route('/<int:id>', methods=['DELETE'])
 @swag_from({
     "summary": "Excluir pagamento",
@@ -173,7 +504,10 @@ def excluir_pagamento(id):
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM pagamento WHERE id_pagamento=%s", (id,))
+        EXCLUIR.execute(cursor, (id,))
+        removido = cursor.fetchone()
+        if removido:
+            _atualizar_resumo(cursor, [(*removido, -1)])
         conn.commit()
     except Exception as e:
         return jsonify({"error": f"Erro ao excluir pagamento: {str(e)}"}), 400
@@ -1,17 +1,76 @@
+import os
+from datetime import datetime
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
+from apidocs import swag_from
+from psycopg2.extras import execute_values
+from conditional import not_modified, tables_version, with_version
 from db import connect_db
+from filters import Filter, FilterError, Listing, boolean, date_range, integer
+from partial_update import PartialUpdate, PatchError
+from prepared import prepared
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
+from streaming import STREAM_PARAMETERS, stream_query, wants_stream
 
 presenca_bp = Blueprint('presenca', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing("presenca", ("id_presenca",), ("id_presenca", "id_aluno", "data_presenca", "presente"), filters=[
+    integer("id_aluno"),
+    Filter("id_turma", "id_aluno IN (SELECT id_aluno FROM aluno WHERE id_turma = %s)", int, "Presenças dos alunos da turma.",
+           tables=("aluno",)),
+    boolean("presente"),
+    *date_range("data_presenca")
+], sortable=("id_presenca", "data_presenca"))
+
+# Colunas que o PATCH pode alterar; a resposta traz as colunas da listagem
+EDICAO = PartialUpdate("presenca", "id_presenca", LISTAGEM.columns[1:], LISTAGEM.columns,
+                       previous=("id_aluno", "data_presenca", "presente"), prepare=True)
+
+# Comandos mais executados, preparados uma vez por conexão do pool
+INSERIR = prepared("presenca_inserir", "INSERT INTO presenca (id_aluno, data_presenca, presente) VALUES (%s, %s, %s) RETURNING id_presenca")
+ANTERIOR = prepared("presenca_anterior", "SELECT id_aluno, data_presenca, presente FROM presenca WHERE id_presenca = %s FOR UPDATE")
+ATUALIZAR = prepared("presenca_atualizar", "UPDATE presenca SET id_aluno = %s, data_presenca = %s, presente = %s WHERE id_presenca = %s")
+EXCLUIR = prepared("presenca_excluir", "DELETE FROM presenca WHERE id_presenca = %s RETURNING id_aluno, data_presenca, presente")
+
+# Limite de registros aceitos em uma chamada de /presencas/lote
+LOTE_MAX_REGISTROS = int(os.getenv("LOTE_MAX_REGISTROS", "1000"))
+
+def _taxa(presentes, ausentes):
+    total = presentes + ausentes
+    return round(presentes / total, 4) if total else None
+
+def _atualizar_resumo(cursor, deltas):
+    """Aplica deltas (id_aluno, data_presenca, presente, sinal) ao resumo mensal.
+
+    Soma em vez de recalcular: escritas concorrentes no mesmo mês se
+    serializam no lock da linha do resumo e nenhuma contagem se perde.
+    """
+    deltas = [d for d in deltas if d[0] is not None]
+    if not deltas:
+        return
+    execute_values(cursor, """
+        INSERT INTO presenca_resumo_mensal AS r (id_aluno, mes, presentes, ausentes)
+        SELECT id_aluno, date_trunc('month', data_presenca)::date,
+               sum(CASE WHEN presente THEN sinal ELSE 0 END),
+               sum(CASE WHEN presente THEN 0 ELSE sinal END)
+        FROM (VALUES %s) AS v(id_aluno, data_presenca, presente, sinal)
+        GROUP BY 1, 2
+        ON CONFLICT (id_aluno, mes) DO UPDATE
+        SET presentes = r.presentes + EXCLUDED.presentes,
+            ausentes = r.ausentes + EXCLUDED.ausentes
+    """, deltas, template="(%s::int, %s::date, %s::boolean, %s::int)", page_size=len(deltas))
+
 @presenca_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar presenças",
     "description": "Retorna todas as presenças registradas.",
     "tags": ["Presenca"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters + STREAM_PARAMETERS,
+    "produces": ["application/json", "application/x-ndjson"],
     "responses": {
         200: {
             "description": "Lista de presenças registradas.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -29,11 +88,30 @@ presenca_bp = Blueprint('presenca', __name__)
     }
 })
 def listar_presencas():
-    """Lista todas as presenças registradas no sistema."""
+    """Lista, por página, as presenças registradas no sistema."""
+    if wants_stream():
+        try:
+            consulta = LISTAGEM.full_query()
+            return stream_query(consulta.sql, consulta.params, LISTAGEM.to_item(consulta.columns))
+        except FilterError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": f"Erro ao exportar presenças: {str(e)}"}), 500
+
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM presenca")
+        # Com id_turma, a listagem também depende de aluno (troca de turma)
+        versao = tables_version(cursor, LISTAGEM.tables())
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        cursor.execute(consulta.sql, consulta.params)
         presencas = cursor.fetchall()
     except Exception as e:
         return jsonify({"error": f"Erro ao listar presenças: {str(e)}"}), 500
@@ -41,9 +119,7 @@ def listar_presencas():
         cursor.close()
         conn.close()
     
-    return jsonify([
-        {"id_presenca": row[0], "id_aluno": row[1], "data_presenca": row[2], "presente": row[3]} for row in presencas
-    ])
+    return with_version(page_response(LISTAGEM.to_items(presencas, consulta.columns), consulta.limit, consulta.key_columns), versao)
 
 @presenca_bp.route('/', methods=['POST'])
 @swag_from({
@@ -76,10 +152,9 @@ def criar_presenca():
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO presenca (id_aluno, data_presenca, presente)
-            VALUES (%s, %s, %s)
-        """, (dados['id_aluno'], dados['data_presenca'], dados['presente']))
+        INSERIR.execute(cursor, (dados['id_aluno'], dados['data_presenca'], dados['presente']))
+        presenca_id = cursor.fetchone()[0]
+        _atualizar_resumo(cursor, [(dados['id_aluno'], dados['data_presenca'], dados['presente'], 1)])
         conn.commit()
     except Exception as e:
         return jsonify({"error": f"Erro ao registrar presença: {str(e)}"}), 400
@@ -87,7 +162,195 @@ def criar_presenca():
         cursor.close()
         conn.close()
 
-    return jsonify({"message": "Presença registrada com sucesso!"}), 201
+    return jsonify({"message": "Presença registrada com sucesso!", "id_presenca": presenca_id}), 201
+
+@presenca_bp.route('/lote', methods=['POST'])
+@swag_from({
+    "summary": "Registrar presenças da turma em lote",
+    "description": "Registra a chamada de uma turma inteira em um dia, em uma única transação. Alunos que já têm presença na data são atualizados, inclusive quando outra chamada da mesma turma e data roda ao mesmo tempo.",
+    "tags": ["Presenca"],
+    "parameters": [
+        {
+            "name": "body",
+            "in": "body",
+            "required": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "id_turma": {"type": "integer", "example": 1},
+                    "data_presenca": {"type": "string", "format": "date", "example": "2025-05-01"},
+                    "registros": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id_aluno": {"type": "integer", "example": 101},
+                                "presente": {"type": "boolean", "example": True}
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    ],
+    "responses": {
+        200: {"description": "Resultado por registro (criado, atualizado ou rejeitado)."},
+        400: {"description": "Erro ao registrar presenças."}
+    }
+})
+def criar_presencas_lote():
+    """Registra as presenças de uma turma em uma data com uma validação e uma escrita em lote."""
+    dados = request.json
+    if not dados or not all(k in dados for k in ['id_turma', 'data_presenca', 'registros']) \
+            or not isinstance(dados['registros'], list):
+        return jsonify({"error": "Campos obrigatórios ausentes"}), 400
+    if len(dados['registros']) > LOTE_MAX_REGISTROS:
+        return jsonify({"error": f"Máximo de {LOTE_MAX_REGISTROS} registros por lote"}), 400
+    id_turma = dados['id_turma']
+    if isinstance(id_turma, str) and id_turma.strip().isdigit():
+        id_turma = int(id_turma)
+    if not isinstance(id_turma, int) or isinstance(id_turma, bool):
+        return jsonify({"error": "id_turma deve ser um inteiro"}), 400
+
+    resultados = []
+    validos = {}
+    for registro in dados['registros']:
+        id_aluno = registro.get('id_aluno') if isinstance(registro, dict) else None
+        presente = registro.get('presente') if isinstance(registro, dict) else None
+        if not isinstance(id_aluno, int) or isinstance(id_aluno, bool) or not isinstance(presente, bool):
+            resultados.append({"id_aluno": id_aluno, "status": "rejeitado", "error": "id_aluno (inteiro) e presente (booleano) são obrigatórios"})
+        elif id_aluno in validos:
+            resultados.append({"id_aluno": id_aluno, "status": "rejeitado", "error": "Aluno repetido no lote"})
+        else:
+            validos[id_aluno] = presente
+            resultados.append({"id_aluno": id_aluno, "presente": presente})
+
+    criados = atualizados = 0
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        # Uma consulta valida a turma de todos os alunos do lote
+        cursor.execute("SELECT id_aluno, id_turma FROM aluno WHERE id_aluno = ANY(%s)", (list(validos),))
+        turmas = dict(cursor.fetchall())
+
+        linhas = []
+        for resultado in resultados:
+            if "status" in resultado:
+                continue
+            id_aluno = resultado["id_aluno"]
+            if id_aluno not in turmas:
+                resultado.update(status="rejeitado", error="Aluno não encontrado")
+            elif turmas[id_aluno] != id_turma:
+                resultado.update(status="rejeitado", error="Aluno não pertence à turma")
+            else:
+                linhas.append((id_aluno, dados['data_presenca'], resultado["presente"]))
+
+        if linhas:
+            # Upsert: uma chamada concorrente da mesma turma e data espera a
+            # outra e atualiza as linhas dela, em vez de violar a unicidade.
+            # Só linhas novas ou com o valor trocado voltam no RETURNING; como
+            # presente é booleano, o valor anterior das trocadas é o oposto.
+            gravados = execute_values(cursor, """
+                INSERT INTO presenca AS p (id_aluno, data_presenca, presente)
+                VALUES %s
+                ON CONFLICT (id_aluno, data_presenca) DO UPDATE SET presente = EXCLUDED.presente
+                WHERE p.presente IS DISTINCT FROM EXCLUDED.presente
+                RETURNING p.id_aluno, p.id_presenca, p.xmax = 0
+            """, linhas, page_size=len(linhas), fetch=True)
+            ids = {id_aluno: (id_presenca, inserido) for id_aluno, id_presenca, inserido in gravados}
+            deltas = []
+            for id_aluno, data_presenca, presente in linhas:
+                if id_aluno not in ids:
+                    continue
+                if ids[id_aluno][1]:
+                    deltas.append((id_aluno, data_presenca, presente, 1))
+                else:
+                    deltas.append((id_aluno, data_presenca, not presente, -1))
+                    deltas.append((id_aluno, data_presenca, presente, 1))
+            inalterados = [linha[0] for linha in linhas if linha[0] not in ids]
+            if inalterados:
+                cursor.execute("SELECT id_aluno, id_presenca FROM presenca WHERE data_presenca = %s AND id_aluno = ANY(%s)",
+                               (dados['data_presenca'], inalterados))
+                ids.update((id_aluno, (id_presenca, False)) for id_aluno, id_presenca in cursor.fetchall())
+            for resultado in resultados:
+                if "status" not in resultado:
+                    id_presenca, inserido = ids[resultado["id_aluno"]]
+                    resultado.update(status="criado" if inserido else "atualizado", id_presenca=id_presenca)
+                    if inserido:
+                        criados += 1
+                    else:
+                        atualizados += 1
+            _atualizar_resumo(cursor, deltas)
+        conn.commit()
+    except Exception as e:
+        return jsonify({"error": f"Erro ao registrar presenças: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify({
+        "criados": criados,
+        "atualizados": atualizados,
+        "rejeitados": len(resultados) - criados - atualizados,
+        "resultados": resultados
+    })
+
+@presenca_bp.route('/relatorio', methods=['GET'])
+@swag_from({
+    "summary": "Relatório mensal de presenças da turma",
+    "description": "Retorna presenças, faltas e taxa de presença de cada aluno da turma e da turma inteira no mês, lidos do resumo mensal por aluno.",
+    "tags": ["Presenca"],
+    "parameters": [
+        {"name": "id_turma", "in": "query", "type": "integer", "required": True},
+        {"name": "mes", "in": "query", "type": "string", "required": True, "description": "Mês no formato AAAA-MM.", "example": "2025-03"}
+    ],
+    "responses": {
+        200: {"description": "Relatório de presenças da turma no mês."},
+        400: {"description": "Parâmetros inválidos."},
+        500: {"description": "Erro ao gerar relatório."}
+    }
+})
+def relatorio_presencas():
+    """Relatório de presenças por aluno e por turma em um mês."""
+    id_turma = request.args.get('id_turma', type=int)
+    mes = request.args.get('mes', '')
+    try:
+        inicio_mes = datetime.strptime(mes, "%Y-%m").date()
+    except ValueError:
+        inicio_mes = None
+    if id_turma is None or inicio_mes is None:
+        return jsonify({"error": "Informe id_turma (inteiro) e mes (AAAA-MM)"}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT a.id_aluno, a.nome_completo, coalesce(r.presentes, 0), coalesce(r.ausentes, 0)
+            FROM aluno a
+            LEFT JOIN presenca_resumo_mensal r ON r.id_aluno = a.id_aluno AND r.mes = %s
+            WHERE a.id_turma = %s
+            ORDER BY a.nome_completo
+        """, (inicio_mes, id_turma))
+        alunos = [
+            {"id_aluno": row[0], "nome_completo": row[1], "presentes": row[2], "ausentes": row[3],
+             "taxa_presenca": _taxa(row[2], row[3])} for row in cursor.fetchall()
+        ]
+    except Exception as e:
+        return jsonify({"error": f"Erro ao gerar relatório de presenças: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        conn.close()
+
+    presentes = sum(a["presentes"] for a in alunos)
+    ausentes = sum(a["ausentes"] for a in alunos)
+    return jsonify({
+        "id_turma": id_turma,
+        "mes": mes,
+        "presentes": presentes,
+        "ausentes": ausentes,
+        "taxa_presenca": _taxa(presentes, ausentes),
+        "alunos": alunos
+    })
 
 @presenca_bp.route('/<int:id>', methods=['PUT'])
 @swag_from({
@@ -126,11 +389,14 @@ def atualizar_presenca(id):
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE presenca
-            SET id_aluno=%s, data_presenca=%s, presente=%s
-            WHERE id_presenca=%s
-        """, (dados['id_aluno'], dados['data_presenca'], dados['presente'], id))
+        ANTERIOR.execute(cursor, (id,))
+        anterior = cursor.fetchone()
+        ATUALIZAR.execute(cursor, (dados['id_aluno'], dados['data_presenca'], dados['presente'], id))
+        if anterior:
+            _atualizar_resumo(cursor, [
+                (anterior[0], anterior[1], anterior[2], -1),
+                (dados['id_aluno'], dados['data_presenca'], dados['presente'], 1)
+            ])
         conn.commit()
     except Exception as e:
         return jsonify({"error": f"Erro ao atualizar presença: {str(e)}"}), 400
@@ -140,6 +406,46 @@ def atualizar_presenca(id):
 
     return jsonify({"message": "Presença atualizada com sucesso!"})
 
+@presenca_bp.route('/<int:id>', methods=['PATCH'])
+@swag_from({
+    "summary": "Atualizar presença parcialmente",
+    "description": "Altera só os campos enviados e devolve o registro atualizado, em um único comando (UPDATE ... RETURNING).",
+    "tags": ["Presenca"],
+    "parameters": EDICAO.parameters,
+    "responses": {
+        200: {"description": "Registro atualizado."},
+        400: {"description": "Campos inválidos ou erro ao atualizar."},
+        404: {"description": "Presença não encontrada."}
+    }
+})
+def atualizar_presenca_parcial(id):
+    """Atualiza só os campos enviados e devolve o registro atualizado."""
+    dados = request.get_json(silent=True)
+    try:
+        consulta = EDICAO.query(id, dados)
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        EDICAO.execute(cursor, consulta)
+        row = cursor.fetchone()
+        if row is None:
+            return jsonify({"error": "Presença não encontrada"}), 404
+        item, anterior = EDICAO.split(row, consulta)
+        novo = tuple(item[c] for c in EDICAO.previous)
+        if novo != tuple(anterior[c] for c in EDICAO.previous):
+            _atualizar_resumo(cursor, [(*anterior.values(), -1), (*novo, 1)])
+        conn.commit()
+    except Exception as e:
+        return jsonify({"error": f"Erro ao atualizar presença: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(item)
+
 @presenca_bp.route('/<int:id>', methods=['DELETE'])
 @swag_from({
     "summary": "Excluir presença",
@@ -163,10 +469,16 @@ def excluir_presenca(id):
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM presenca WHERE id_presenca=%s", (id,))
+        EXCLUIR.execute(cursor, (id,))
+        removida = cursor.fetchone()
+        if removida is None:
+            return jsonify({"error": "Presença não encontrada."}), 404
+        _atualizar_resumo(cursor, [(removida[0], removida[1], removida[2], -1)])
         conn.commit()
     except Exception as e:
         return jsonify({"error": f"Erro ao excluir presença: {str(e)}"}), 400
     finally:
         cursor.close()
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+    return jsonify({"message": "Presença excluída com sucesso!"})
\ No newline at end of file
@@ -1,18 +1,32 @@
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
+from apidocs import swag_from
+from cache import reference_cache
+from conditional import not_modified, table_version, with_version
 from db import connect_db
-from log_config import logger
+from filters import FilterError, Listing
+from partial_update import PartialUpdate, PatchError
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
+from log_config import SAMPLED, logger
 
 professor_bp = Blueprint('professor', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing("professor", ("id_professor",), ("id_professor", "nome_completo", "email", "telefone"),
+                   sortable=("id_professor", "nome_completo"))
+
+# Colunas que o PATCH pode alterar; a resposta traz as colunas da listagem
+EDICAO = PartialUpdate("professor", "id_professor", LISTAGEM.columns[1:], LISTAGEM.columns)
+
 @professor_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar professores",
     "description": "Retorna todos os professores cadastrados.",
     "tags": ["Professor"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters,
     "responses": {
         200: {
             "description": "Lista de professores cadastrados.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -30,23 +44,35 @@ professor_bp = Blueprint('professor', __name__)
     }
 })
 def listar_professores():
-    """Lista todos os professores cadastrados no banco de dados."""
+    """Lista, por página, os professores cadastrados no banco de dados."""
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM professor")
-        professores = cursor.fetchall()
-        logger.info(f"READ: Listagem de {len(professores)} professores realizada.")
+        versao = table_version(cursor, "professor")
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        # A versão na chave faz o cache de outros processos expirar após escritas
+        chave_cache = ("professor", versao and versao.version, consulta.sql, tuple(consulta.params))
+        professores = reference_cache.get(chave_cache)
+        if professores is None:
+            cursor.execute(consulta.sql, consulta.params)
+            professores = LISTAGEM.to_items(cursor.fetchall(), consulta.columns)
+            reference_cache.set(chave_cache, professores)
+        logger.info("READ: Listagem de %s professores realizada.", len(professores), extra=SAMPLED)
     except Exception as e:
-        logger.error(f"READ: Erro ao listar professores - {str(e)}")
+        logger.error("READ: Erro ao listar professores - %s", e)
         return jsonify({"error": f"Erro ao listar professores: {str(e)}"}), 500
     finally:
         cursor.close()
         conn.close()
-    
-    return jsonify([
-        {"id_professor": row[0], "nome_completo": row[1], "email": row[2], "telefone": row[3]} for row in professores
-    ])
+
+    return with_version(page_response(professores, consulta.limit, consulta.key_columns), versao)
 
 @professor_bp.route('/', methods=['POST'])
 @swag_from({
@@ -82,18 +108,20 @@ def criar_professor():
         cursor.execute("""
             INSERT INTO professor (nome_completo, email, telefone)
             VALUES (%s, %s, %s)
+            RETURNING id_professor
         """, (dados['nome_completo'], dados['email'], dados['telefone']))
+        professor_id = cursor.fetchone()[0]
         conn.commit()
-        professor_id = cursor.lastrowid
-        logger.info(f"CREATE: Professor {dados['nome_completo']} criado com sucesso. ID: {professor_id}")
+        reference_cache.invalidate("professor")
+        logger.info("CREATE: Professor %s criado com sucesso. ID: %s", dados['nome_completo'], professor_id)
     except Exception as e:
-        logger.error(f"CREATE: Erro ao criar professor {dados.get('nome_completo', 'N/A')} - {str(e)}")
+        logger.error("CREATE: Erro ao criar professor %s - %s", dados.get('nome_completo', 'N/A'), e)
         return jsonify({"error": f"Erro ao criar professor: {str(e)}"}), 400
     finally:
         cursor.close()
         conn.close()
 
-    return jsonify({"message": "Professor criado com sucesso!"}), 201
+    return jsonify({"message": "Professor criado com sucesso!", "id_professor": professor_id}), 201
 
 @professor_bp.route('/<int:id>', methods=['PUT'])
 @swag_from({
@@ -138,9 +166,10 @@ def atualizar_professor(id):
             WHERE id_professor=%s
         """, (dados['nome_completo'], dados['email'], dados['telefone'], id))
         conn.commit()
-        logger.info(f"UPDATE: Professor com ID {id} atualizado. Novos dados: {dados}")
+        reference_cache.invalidate("professor")
+        logger.info("UPDATE: Professor com ID %s atualizado. Campos: %s", id, ", ".join(dados))
     except Exception as e:
-        logger.error(f"UPDATE: Erro ao atualizar professor {id} - {str(e)}")
+        logger.error("UPDATE: Erro ao atualizar professor %s - %s", id, e)
         return jsonify({"error": f"Erro ao atualizar professor: {str(e)}"}), 400
     finally:
         cursor.close()
@@ -148,6 +177,46 @@ def atualizar_professor(id):
 
     return jsonify({"message": "Professor atualizado com sucesso!"})
 
+@professor_bp.route('/<int:id>', methods=['PATCH'])
+@swag_from({
+    "summary": "Atualizar professor parcialmente",
+    "description": "Altera só os campos enviados e devolve o registro atualizado, em um único comando (UPDATE ... RETURNING).",
+    "tags": ["Professor"],
+    "parameters": EDICAO.parameters,
+    "responses": {
+        200: {"description": "Registro atualizado."},
+        400: {"description": "Campos inválidos ou erro ao atualizar."},
+        404: {"description": "Professor não encontrado."}
+    }
+})
+def atualizar_professor_parcial(id):
+    """Atualiza só os campos enviados e devolve o registro atualizado."""
+    dados = request.get_json(silent=True)
+    try:
+        consulta = EDICAO.query(id, dados)
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute(consulta.sql, consulta.params)
+        row = cursor.fetchone()
+        if row is None:
+            return jsonify({"error": "Professor não encontrado"}), 404
+        item, _ = EDICAO.split(row, consulta)
+        conn.commit()
+        reference_cache.invalidate("professor")
+        logger.info("UPDATE: Professor com ID %s atualizado parcialmente. Campos: %s", id, ", ".join(dados))
+    except Exception as e:
+        logger.error("UPDATE: Erro ao atualizar professor %s - %s", id, e)
+        return jsonify({"error": f"Erro ao atualizar professor: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(item)
+
 @professor_bp.route('/<int:id>', methods=['DELETE'])
 @swag_from({
     "summary": "Excluir professor",
@@ -173,12 +242,13 @@ def excluir_professor(id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM professor WHERE id_professor=%s", (id,))
         if cursor.rowcount == 0:
-            logger.error(f"DELETE: Falha ao deletar professor {id} - Não encontrado.")
+            logger.error("DELETE: Falha ao deletar professor %s - Não encontrado.", id)
             return jsonify({"error": "Professor não encontrado."}), 404
         conn.commit()
-        logger.info(f"DELETE: Professor com ID {id} removido com sucesso.")
+        reference_cache.invalidate("professor")
+        logger.info("DELETE: Professor com ID %s removido com sucesso.", id)
     except Exception as e:
-        logger.error(f"DELETE: Erro ao excluir professor {id} - {str(e)}")
+        logger.error("DELETE: Erro ao excluir professor %s - %s", id, e)
         return jsonify({"error": f"Erro ao excluir professor: {str(e)}"}), 400
     finally:
         cursor.close()
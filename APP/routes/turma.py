@@ -1,17 +1,32 @@
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
+from apidocs import swag_from
+from cache import reference_cache
+from conditional import not_modified, table_version, with_version
 from db import connect_db
+from filters import FilterError, Listing, integer
+from partial_update import PartialUpdate, PatchError
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
 
 turma_bp = Blueprint('turma', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing("turma", ("id_turma",), ("id_turma", "nome_turma", "id_professor", "horario"), filters=[
+    integer("id_professor")
+], sortable=("id_turma", "nome_turma"))
+
+# Colunas que o PATCH pode alterar; a resposta traz as colunas da listagem
+EDICAO = PartialUpdate("turma", "id_turma", LISTAGEM.columns[1:], LISTAGEM.columns)
+
 @turma_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar turmas",
     "description": "Retorna todas as turmas cadastradas.",
     "tags": ["Turma"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters,
     "responses": {
         200: {
             "description": "Lista de turmas cadastradas.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -29,21 +44,33 @@ turma_bp = Blueprint('turma', __name__)
     }
 })
 def listar_turmas():
-    """Lista todas as turmas cadastradas no banco de dados."""
+    """Lista, por página, as turmas cadastradas no banco de dados."""
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM turma")
-        turmas = cursor.fetchall()
+        versao = table_version(cursor, "turma")
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        # A versão na chave faz o cache de outros processos expirar após escritas
+        chave_cache = ("turma", versao and versao.version, consulta.sql, tuple(consulta.params))
+        turmas = reference_cache.get(chave_cache)
+        if turmas is None:
+            cursor.execute(consulta.sql, consulta.params)
+            turmas = LISTAGEM.to_items(cursor.fetchall(), consulta.columns)
+            reference_cache.set(chave_cache, turmas)
     except Exception as e:
         return jsonify({"error": f"Erro ao listar turmas: {str(e)}"}), 500
     finally:
         cursor.close()
         conn.close()
-    
-    return jsonify([
-        {"id_turma": row[0], "nome_turma": row[1], "id_professor": row[2], "horario": row[3]} for row in turmas
-    ])
+
+    return with_version(page_response(turmas, consulta.limit, consulta.key_columns), versao)
 
 @turma_bp.route('/', methods=['POST'])
 @swag_from({
@@ -79,15 +106,18 @@ def criar_turma():
         cursor.execute("""
             INSERT INTO turma (nome_turma, id_professor, horario)
             VALUES (%s, %s, %s)
+            RETURNING id_turma
         """, (dados['nome_turma'], dados['id_professor'], dados['horario']))
+        turma_id = cursor.fetchone()[0]
         conn.commit()
+        reference_cache.invalidate("turma")
     except Exception as e:
         return jsonify({"error": f"Erro ao criar turma: {str(e)}"}), 400
     finally:
         cursor.close()
         conn.close()
 
-    return jsonify({"message": "Turma criada com sucesso!"}), 201
+    return jsonify({"message": "Turma criada com sucesso!", "id_turma": turma_id}), 201
 
 @turma_bp.route('/<int:id>', methods=['PUT'])
 @swag_from({
@@ -132,6 +162,7 @@ def atualizar_turma(id):
             WHERE id_turma=%s
         """, (dados['nome_turma'], dados['id_professor'], dados['horario'], id))
         conn.commit()
+        reference_cache.invalidate("turma")
     except Exception as e:
         return jsonify({"error": f"Erro ao atualizar turma: {str(e)}"}), 400
     finally:
@@ -140,6 +171,44 @@ def atualizar_turma(id):
 
     return jsonify({"message": "Turma atualizada com sucesso!"})
 
+@turma_bp.route('/<int:id>', methods=['PATCH'])
+@swag_from({
+    "summary": "Atualizar turma parcialmente",
+    "description": "Altera só os campos enviados e devolve o registro atualizado, em um único comando (UPDATE ... RETURNING).",
+    "tags": ["Turma"],
+    "parameters": EDICAO.parameters,
+    "responses": {
+        200: {"description": "Registro atualizado."},
+        400: {"description": "Campos inválidos ou erro ao atualizar."},
+        404: {"description": "Turma não encontrada."}
+    }
+})
+def atualizar_turma_parcial(id):
+    """Atualiza só os campos enviados e devolve o registro atualizado."""
+    dados = request.get_json(silent=True)
+    try:
+        consulta = EDICAO.query(id, dados)
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute(consulta.sql, consulta.params)
+        row = cursor.fetchone()
+        if row is None:
+            return jsonify({"error": "Turma não encontrada"}), 404
+        item, _ = EDICAO.split(row, consulta)
+        conn.commit()
+        reference_cache.invalidate("turma")
+    except Exception as e:
+        return jsonify({"error": f"Erro ao atualizar turma: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(item)
+
 @turma_bp.route('/<int:id>', methods=['DELETE'])
 @swag_from({
     "summary": "Excluir turma",
@@ -165,6 +234,7 @@ def excluir_turma(id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM turma WHERE id_turma=%s", (id,))
         conn.commit()
+        reference_cache.invalidate("turma")
     except Exception as e:
         return jsonify({"error": f"Erro ao excluir turma: {str(e)}"}), 400
     finally:
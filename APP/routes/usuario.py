@@ -1,17 +1,33 @@
 from flask import Blueprint, jsonify, request
-from flasgger import swag_from
+from apidocs import swag_from
+from conditional import not_modified, table_version, with_version
 from db import connect_db
+from filters import FilterError, Listing, eq, integer
+from partial_update import PartialUpdate, PatchError
+from pagination import PAGE_HEADERS, PAGE_PARAMETERS, PaginationError, page_response
 
 usuario_bp = Blueprint('usuario', __name__)
 
+# Filtros e ordenações aceitos na listagem
+LISTAGEM = Listing("usuario", ("id_usuario",), ("id_usuario", "login", "nivel_acesso", "id_professor"), filters=[
+    eq("nivel_acesso"),
+    integer("id_professor")
+], sortable=("id_usuario", "login"))
+
+# Colunas que o PATCH pode alterar; a resposta traz as colunas da listagem
+EDICAO = PartialUpdate("usuario", "id_usuario", ("login", "senha", "nivel_acesso", "id_professor"),
+                        LISTAGEM.columns)
+
 @usuario_bp.route('/', methods=['GET'])
 @swag_from({
     "summary": "Listar usuários",
     "description": "Retorna todos os usuários cadastrados.",
     "tags": ["Usuário"],
+    "parameters": PAGE_PARAMETERS + LISTAGEM.parameters,
     "responses": {
         200: {
             "description": "Lista de usuários cadastrados.",
+            "headers": PAGE_HEADERS,
             "schema": {
                 "type": "array",
                 "items": {
@@ -29,11 +45,20 @@ usuario_bp = Blueprint('usuario', __name__)
     }
 })
 def listar_usuarios():
-    """Lista todos os usuários cadastrados no sistema."""
+    """Lista, por página, os usuários cadastrados no sistema."""
+    try:
+        consulta = LISTAGEM.page_query()
+    except (PaginationError, FilterError) as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = connect_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM usuario")
+        versao = table_version(cursor, "usuario")
+        resposta = not_modified(versao)
+        if resposta is not None:
+            return resposta
+        cursor.execute(consulta.sql, consulta.params)
         usuarios = cursor.fetchall()
     except Exception as e:
         return jsonify({"error": f"Erro ao listar usuários: {str(e)}"}), 500
@@ -41,9 +66,7 @@ def listar_usuarios():
         cursor.close()
         conn.close()
     
-    return jsonify([
-        {"id_usuario": row[0], "login": row[1], "nivel_acesso": row[2], "id_professor": row[3]} for row in usuarios
-    ])
+    return with_version(page_response(LISTAGEM.to_items(usuarios, consulta.columns), consulta.limit, consulta.key_columns), versao)
 
 @usuario_bp.route('/', methods=['POST'])
 @swag_from({
@@ -80,7 +103,9 @@ def criar_usuario():
         cursor.execute("""
             INSERT INTO usuario (login, senha, nivel_acesso, id_professor)
             VALUES (%s, %s, %s, %s)
+            RETURNING id_usuario
         """, (dados['login'], dados['senha'], dados['nivel_acesso'], dados.get('id_professor')))
+        usuario_id = cursor.fetchone()[0]
         conn.commit()
     except Exception as e:
         return jsonify({"error": f"Erro ao criar usuário: {str(e)}"}), 400
@@ -88,7 +113,7 @@ def criar_usuario():
         cursor.close()
         conn.close()
 
-    return jsonify({"message": "Usuário criado com sucesso!"}), 201
+    return jsonify({"message": "Usuário criado com sucesso!", "id_usuario": usuario_id}), 201
 
 @usuario_bp.route('/<int:id>', methods=['PUT'])
 @swag_from({
@@ -142,6 +167,43 @@ def atualizar_usuario(id):
 
     return jsonify({"message": "Usuário atualizado com sucesso!"})
 
+@usuario_bp.route('/<int:id>', methods=['PATCH'])
+@swag_from({
+    "summary": "Atualizar usuário parcialmente",
+    "description": "Altera só os campos enviados e devolve o registro atualizado, em um único comando (UPDATE ... RETURNING).",
+    "tags": ["Usuário"],
+    "parameters": EDICAO.parameters,
+    "responses": {
+        200: {"description": "Registro atualizado."},
+        400: {"description": "Campos inválidos ou erro ao atualizar."},
+        404: {"description": "Usuário não encontrado."}
+    }
+})
+def atualizar_usuario_parcial(id):
+    """Atualiza só os campos enviados e devolve o registro atualizado."""
+    dados = request.get_json(silent=True)
+    try:
+        consulta = EDICAO.query(id, dados)
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute(consulta.sql, consulta.params)
+        row = cursor.fetchone()
+        if row is None:
+            return jsonify({"error": "Usuário não encontrado"}), 404
+        item, _ = EDICAO.split(row, consulta)
+        conn.commit()
+    except Exception as e:
+        return jsonify({"error": f"Erro ao atualizar usuário: {str(e)}"}), 400
+    finally:
+        cursor.close()
+        conn.close()
+
+    return jsonify(item)
+
 @usuario_bp.route('/<int:id>', methods=['DELETE'])
 @swag_from({
     "summary": "Excluir usuário",
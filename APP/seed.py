@@ -0,0 +1,310 @@
+"""Gerador de dados sintéticos da escola para testes em escala.
+
+Preenche todas as tabelas do init.sql mantendo as chaves estrangeiras
+válidas (professor -> turma -> aluno -> presenca/pagamento/atividade_aluno,
+mais atividade e usuario). Os dados são determinísticos: a mesma semente
+e os mesmos parâmetros geram exatamente as mesmas linhas e ids, qualquer
+que seja o número de processos, porque cada aluno tem o próprio gerador
+pseudoaleatório e os ids de presenca/pagamento são calculados a partir do
+aluno e da data.
+
+As tabelas grandes (presenca, pagamento, atividade_aluno) são divididas em
+faixas de alunos e carregadas com COPY por processos paralelos, cada um
+com a própria conexão. As conexões da carga usam session_replication_role
+= replica, que desliga os triggers (inclusive os de versão das tabelas, que
+fariam os processos disputarem as mesmas linhas de tabela_versao_faixa) e
+as verificações de chave estrangeira; por isso o usuário do banco precisa
+ser superusuário. No fim, as sequências são ajustadas, os resumos mensais
+são reconstruídos (recalcula_presenca_resumo_mensal e
+recalcula_pagamento_resumo_mensal) e a versão de cada tabela é
+incrementada uma vez.
+
+Uso (a partir de APP/, com DB_HOST etc. apontando para um banco descartável):
+    python seed.py --limpar --turmas 400 --alunos-por-turma 25 --anos 3 --workers 8
+    python seed.py --help
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import psycopg2
+from db import DB_CONFIG
+from migrate import apply_migrations
+
+# Linhas acumuladas em memória antes de cada envio ao COPY
+COPY_BUFFER_ROWS = 50000
+
+NOMES = ("Ana", "Beatriz", "Bruno", "Caio", "Camila", "Daniel", "Eduarda", "Enzo", "Felipe", "Gabriela",
+         "Heitor", "Helena", "Isabela", "João", "Laura", "Lucas", "Luiza", "Manuela", "Mateus", "Miguel",
+         "Pedro", "Rafael", "Sofia", "Theo", "Valentina")
+SOBRENOMES = ("Almeida", "Alves", "Barbosa", "Carvalho", "Costa", "Ferreira", "Gomes", "Lima", "Martins",
+              "Oliveira", "Pereira", "Ribeiro", "Rodrigues", "Santos", "Silva", "Souza")
+ATIVIDADES = ("Pintura com guache", "Contação de histórias", "Montagem de quebra-cabeça", "Musicalização",
+              "Horta da escola", "Circuito psicomotor", "Teatro de fantoches", "Massinha de modelar",
+              "Passeio ao parque", "Brincadeiras cantadas")
+FORMAS_PAGAMENTO = ("Cartão", "Boleto", "PIX")
+HORARIOS = ("08:00 - 12:00", "13:00 - 17:00")
+
+# Último dia dos dados quando --ate não é informado. Fixo, e não a data de
+# hoje: a mesma semente e os mesmos parâmetros geram os mesmos dias, linhas e
+# ids em qualquer dia em que o script rodar
+FIM_PADRAO = date(2025, 12, 19)
+
+TABELAS = ("atividade_aluno", "presenca", "pagamento", "usuario", "atividade", "aluno", "turma", "professor",
+           "presenca_resumo_mensal", "pagamento_resumo_mensal")
+
+
+def dias_letivos(inicio, fim):
+    """Dias úteis do período, sem férias de janeiro, fim de julho e fim de dezembro"""
+    dias, dia = [], inicio
+    while dia <= fim:
+        ferias = dia.month == 1 or (dia.month == 7 and dia.day > 15) or (dia.month == 12 and dia.day > 19)
+        if dia.weekday() < 5 and not ferias:
+            dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
+
+def inicio_periodo(fim, anos):
+    """Primeiro dia de um período de `anos` anos que termina em `fim`"""
+    return date(fim.year - anos, fim.month, min(fim.day, 28)) + timedelta(days=1)
+
+def meses(inicio, fim):
+    mes, lista = date(inicio.year, inicio.month, 1), []
+    while mes <= fim:
+        lista.append(mes)
+        mes = date(mes.year + (mes.month == 12), mes.month % 12 + 1, 1)
+    return lista
+
+def _nome(rng):
+    return f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+
+def _rng(seed, *chave):
+    return random.Random(f"{seed}:" + ":".join(map(str, chave)))
+
+def _texto(valor):
+    """Valor no formato texto do COPY"""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    return str(valor).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+def _copy(cursor, tabela, colunas, linhas):
+    """Envia as linhas ao COPY em blocos de COPY_BUFFER_ROWS; retorna quantas foram"""
+    sql = f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN"
+    buffer, total, pendentes = io.StringIO(), 0, 0
+    for linha in linhas:
+        buffer.write("\t".join(map(_texto, linha)) + "\n")
+        pendentes += 1
+        if pendentes == COPY_BUFFER_ROWS:
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += pendentes
+            buffer, pendentes = io.StringIO(), 0
+    if pendentes:
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+        total += pendentes
+    return total
+
+def _conectar():
+    conn = psycopg2.connect(**DB_CONFIG)
+    with conn.cursor() as cursor:
+        # Carga reconstruível: não vale esperar o fsync de cada commit
+        cursor.execute("SET synchronous_commit = off")
+        # Sem triggers: a versão das tabelas é incrementada uma vez, no fim
+        cursor.execute("SET session_replication_role = replica")
+    conn.commit()
+    return conn
+
+
+class Plano:
+    """Parâmetros da geração e a disposição dos ids derivada deles"""
+
+    def __init__(self, seed, turmas, alunos_por_turma, inicio, fim, atividades_por_mes):
+        self.seed = seed
+        self.turmas = turmas
+        self.alunos_por_turma = alunos_por_turma
+        self.alunos = turmas * alunos_por_turma
+        self.inicio = inicio
+        self.fim = fim
+        self.dias = dias_letivos(inicio, fim)
+        self.meses = meses(inicio, fim)
+        self.atividades = max(len(self.meses) * atividades_por_mes, 1)
+
+    def turma_do_aluno(self, id_aluno):
+        return (id_aluno - 1) // self.alunos_por_turma + 1
+
+    # Linhas de cada tabela ------------------------------------------------
+
+    def professores(self):
+        for i in range(1, self.turmas + 1):
+            rng = _rng(self.seed, "professor", i)
+            nome = _nome(rng)
+            email = f"{nome.split()[0].lower()}.{i}@escola.com"
+            yield i, nome, email, f"11{rng.randrange(10 ** 8, 10 ** 9)}"
+
+    def turmas_(self):
+        for i in range(1, self.turmas + 1):
+            yield i, f"Turma {i:05d}", i, HORARIOS[i % 2]
+
+    def alunos_(self, primeiro, ultimo):
+        for i in range(primeiro, ultimo + 1):
+            rng = _rng(self.seed, "aluno", i)
+            sobrenome = rng.choice(SOBRENOMES)
+            nascimento = self.inicio - timedelta(days=rng.randint(2 * 365, 6 * 365))
+            responsavel = f"{rng.choice(NOMES)} {sobrenome}"
+            info = rng.choice((None, None, None, "Alergia a amendoim", "Usa óculos", "Intolerância à lactose"))
+            yield (i, f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {sobrenome}", nascimento,
+                   self.turma_do_aluno(i), responsavel, f"11{rng.randrange(10 ** 8, 10 ** 9)}",
+                   f"responsavel.{i}@email.com", info)
+
+    def atividades_(self):
+        for i in range(1, self.atividades + 1):
+            rng = _rng(self.seed, "atividade", i)
+            mes = self.meses[(i - 1) % len(self.meses)]
+            dia = mes + timedelta(days=rng.randint(0, 27))
+            yield i, f"{rng.choice(ATIVIDADES)} #{i}", min(max(dia, self.inicio), self.fim)
+
+    def usuarios(self):
+        yield 1, "admin", "hash_senha_admin", "administrador", None
+        for i in range(1, self.turmas + 1):
+            yield i + 1, f"professor{i}", f"hash_senha_professor{i}", "professor", i
+
+    def presencas(self, primeiro, ultimo):
+        dias = [d.isoformat() for d in self.dias]
+        for id_aluno in range(primeiro, ultimo + 1):
+            rng = _rng(self.seed, "presenca", id_aluno)
+            frequencia = rng.uniform(0.75, 0.98)
+            base = (id_aluno - 1) * len(dias)
+            for indice, dia in enumerate(dias):
+                yield base + indice + 1, id_aluno, dia, rng.random() < frequencia
+
+    def pagamentos(self, primeiro, ultimo):
+        for id_aluno in range(primeiro, ultimo + 1):
+            rng = _rng(self.seed, "pagamento", id_aluno)
+            mensalidade = 450 + 25 * (self.turma_do_aluno(id_aluno) % 5)
+            forma = rng.choice(FORMAS_PAGAMENTO)
+            base = (id_aluno - 1) * len(self.meses)
+            for indice, mes in enumerate(self.meses):
+                recente = indice >= len(self.meses) - 2
+                status = "Pendente" if recente and rng.random() < 0.15 else "Pago"
+                dia = min(max(mes + timedelta(days=rng.randint(0, 9)), self.inicio), self.fim)
+                valor = f"{mensalidade * (0.9 if rng.random() < 0.1 else 1):.2f}"
+                yield (base + indice + 1, id_aluno, dia, valor, forma,
+                       f"Mensalidade {mes:%m/%Y}", status)
+
+    def atividades_alunos(self, primeiro, ultimo):
+        por_aluno = min(len(self.meses) * 2, self.atividades)
+        for id_aluno in range(primeiro, ultimo + 1):
+            rng = _rng(self.seed, "atividade_aluno", id_aluno)
+            for id_atividade in sorted(rng.sample(range(1, self.atividades + 1), por_aluno)):
+                yield id_atividade, id_aluno
+
+
+_CARGAS_PARALELAS = {
+    "presenca": (("id_presenca", "id_aluno", "data_presenca", "presente"), Plano.presencas),
+    "pagamento": (("id_pagamento", "id_aluno", "data_pagamento", "valor_pago", "forma_pagamento", "referencia",
+                   "status"), Plano.pagamentos),
+    "atividade_aluno": (("id_atividade", "id_aluno"), Plano.atividades_alunos),
+}
+
+def _carregar_faixa(plano, tabela, primeiro, ultimo):
+    """Tarefa de um processo: carrega a tabela para os alunos da faixa"""
+    colunas, gerar = _CARGAS_PARALELAS[tabela]
+    conn = _conectar()
+    try:
+        with conn.cursor() as cursor:
+            total = _copy(cursor, tabela, colunas, gerar(plano, primeiro, ultimo))
+        conn.commit()
+        return tabela, total
+    finally:
+        conn.close()
+
+def gerar(plano, workers=os.cpu_count(), faixa=1000, limpar=False, log=print):
+    """Popula o banco conforme o plano e retorna as linhas inseridas por tabela"""
+    contagens = {}
+    conn = _conectar()
+    try:
+        with conn.cursor() as cursor:
+            if limpar:
+                cursor.execute(f"TRUNCATE {', '.join(TABELAS)} RESTART IDENTITY CASCADE")
+            else:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM aluno) OR EXISTS (SELECT 1 FROM professor)")
+                if cursor.fetchone()[0]:
+                    raise SystemExit("O banco já tem dados: use --limpar para apagá-los antes da geração")
+            contagens["professor"] = _copy(cursor, "professor", ("id_professor", "nome_completo", "email", "telefone"),
+                                           plano.professores())
+            contagens["turma"] = _copy(cursor, "turma", ("id_turma", "nome_turma", "id_professor", "horario"),
+                                       plano.turmas_())
+            contagens["aluno"] = _copy(cursor, "aluno", ("id_aluno", "nome_completo", "data_nascimento", "id_turma",
+                                                         "nome_responsavel", "telefone_responsavel",
+                                                         "email_responsavel", "informacoes_adicionais"),
+                                       plano.alunos_(1, plano.alunos))
+            contagens["atividade"] = _copy(cursor, "atividade", ("id_atividade", "descricao", "data_realizacao"),
+                                           plano.atividades_())
+            contagens["usuario"] = _copy(cursor, "usuario", ("id_usuario", "login", "senha", "nivel_acesso",
+                                                             "id_professor"), plano.usuarios())
+        conn.commit()
+        log(f"Tabelas de referência carregadas: {contagens}")
+
+        tarefas = [(tabela, primeiro, min(primeiro + faixa - 1, plano.alunos))
+                   for tabela in _CARGAS_PARALELAS for primeiro in range(1, plano.alunos + 1, faixa)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = [executor.submit(_carregar_faixa, plano, *tarefa) for tarefa in tarefas]
+            for concluidas, futuro in enumerate(futuros, 1):
+                tabela, total = futuro.result()
+                contagens[tabela] = contagens.get(tabela, 0) + total
+                if concluidas % max(len(futuros) // 20, 1) == 0:
+                    log(f"{concluidas}/{len(futuros)} faixas carregadas")
+
+        with conn.cursor() as cursor:
+            for tabela, coluna in (("professor", "id_professor"), ("turma", "id_turma"), ("aluno", "id_aluno"),
+                                   ("atividade", "id_atividade"), ("usuario", "id_usuario"),
+                                   ("presenca", "id_presenca"), ("pagamento", "id_pagamento")):
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{tabela}', '{coluna}'), "
+                               f"coalesce(max({coluna}), 0) + 1, false) FROM {tabela}")
+            log("Reconstruindo os resumos mensais")
+            cursor.execute("SELECT recalcula_presenca_resumo_mensal()")
+            cursor.execute("SELECT recalcula_pagamento_resumo_mensal()")
+            # Os triggers de versão não rodaram durante a carga: invalida ETags e caches agora
+            cursor.execute("UPDATE tabela_versao_faixa SET versao = versao + 1, alterado_em = now() "
+                           "WHERE tabela = ANY(%s) AND faixa = 0", (list(TABELAS),))
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"VACUUM ANALYZE {', '.join(TABELAS)}")
+    finally:
+        conn.close()
+    return contagens
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos e determinísticos da escola")
+    parser.add_argument("--seed", type=int, default=42, help="semente (mesma semente, mesmos dados)")
+    parser.add_argument("--turmas", type=int, default=40, help="turmas (cada uma com um professor)")
+    parser.add_argument("--alunos-por-turma", type=int, default=25)
+    parser.add_argument("--anos", type=int, default=1, help="anos de presenças e pagamentos até --ate")
+    parser.add_argument("--ate", type=date.fromisoformat, default=FIM_PADRAO,
+                        help=f"último dia dos dados (AAAA-MM-DD, padrão {FIM_PADRAO.isoformat()})")
+    parser.add_argument("--atividades-por-mes", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processos de carga em paralelo")
+    parser.add_argument("--faixa", type=int, default=1000, help="alunos por tarefa de carga")
+    parser.add_argument("--limpar", action="store_true", help="APAGA os dados existentes antes de gerar")
+    args = parser.parse_args(argv)
+
+    plano = Plano(args.seed, args.turmas, args.alunos_por_turma, inicio_periodo(args.ate, args.anos), args.ate,
+                  args.atividades_por_mes)
+    print(f"{plano.alunos} alunos, {len(plano.dias)} dias letivos e {len(plano.meses)} meses: "
+          f"~{plano.alunos * len(plano.dias):,} presenças".replace(",", "."))
+    apply_migrations()
+    t0 = time.perf_counter()
+    contagens = gerar(plano, workers=args.workers, faixa=args.faixa, limpar=args.limpar)
+    print(f"Concluído em {time.perf_counter() - t0:.1f}s: {contagens}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
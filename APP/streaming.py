@@ -0,0 +1,92 @@
+import os
+import uuid
+from flask import Response, current_app, request
+from db import connect_db
+from log_config import logger
+
+# Linhas buscadas do servidor por ida ao banco durante a exportação
+STREAM_ITERSIZE = int(os.getenv("STREAM_ITERSIZE", "2000"))
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Parâmetro documentado no Swagger das rotas com exportação em streaming
+STREAM_PARAMETERS = [
+    {
+        "name": "stream",
+        "in": "query",
+        "type": "integer",
+        "required": False,
+        "description": "Com stream=1 (ou Accept: application/x-ndjson) exporta a tabela inteira em streaming, sem paginação."
+    }
+]
+
+
+def _wants_ndjson():
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def wants_stream():
+    """Indica se a requisição pediu exportação completa em streaming"""
+    return request.args.get("stream", "").lower() in ("1", "true") or _wants_ndjson()
+
+def stream_query(sql, params, to_item):
+    """Executa `sql` em um cursor nomeado (do lado do servidor) e transmite o resultado.
+
+    As linhas chegam do Postgres em lotes de STREAM_ITERSIZE e cada lote é
+    serializado e enviado antes do próximo, então a memória do processo não
+    cresce com o tamanho da tabela. Responde NDJSON se o cliente aceitar,
+    senão um array JSON transmitido aos pedaços.
+
+    A conexão volta ao pool no fim do corpo ou no close() da resposta, o
+    que vier primeiro: um HEAD ou um cliente que desconecta antes do
+    primeiro pedaço fecham o gerador sem executá-lo.
+    """
+    ndjson = _wants_ndjson()
+    dumps = current_app.json.dumps
+    conn = connect_db()
+    try:
+        cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = STREAM_ITERSIZE
+        cursor.execute(sql, params)
+    except Exception:
+        conn.close()
+        raise
+    released = []
+
+    def release():
+        if released:
+            return
+        released.append(True)
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    def generate():
+        first = True
+        try:
+            if not ndjson:
+                yield "["
+            while True:
+                rows = cursor.fetchmany(STREAM_ITERSIZE)
+                if not rows:
+                    break
+                if ndjson:
+                    yield "".join(dumps(to_item(row)) + "\n" for row in rows)
+                else:
+                    chunk = ",".join(dumps(to_item(row)) for row in rows)
+                    yield chunk if first else "," + chunk
+                    first = False
+            if not ndjson:
+                yield "]"
+        except Exception as e:
+            logger.error("STREAM: Exportação interrompida - %s", e)
+            raise
+        finally:
+            release()
+
+    mimetype = NDJSON_MIMETYPE if ndjson else "application/json"
+    response = Response(generate(), mimetype=mimetype)
+    response.call_on_close(release)
+    return response
@@ -1,10 +1,34 @@
+import os
+# A especificação é montada das rotas pelo flasgger (desabilitado por padrão)
+os.environ.setdefault("SWAGGER_ENABLED", "1")
+import gzip
+import io
+import logging
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
 import pytest
-from unittest.mock import patch
+from flask import Flask
+from unittest.mock import MagicMock, patch
+from prometheus_client import REGISTRY
+from psycopg2 import errors, extensions
+import apidocs
 from app import app
+from cache import TTLCache, reference_cache
+import db
+from db import ConnectionPool, PoolTimeout, TimedCursor, db_time, reset_db_time
+from json_provider import IsoJSONProvider, OrjsonProvider
+import log_config
+from log_config import JsonFormatter, SamplingFilter
+from migrate import NO_TRANSACTION, concurrent_indexes, discover, split_statements
+from pagination import decode_cursor, encode_cursor
+from prepared import PreparedStatement, prepared, prepared_stats
+from seed import Plano, inicio_periodo
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
+    reference_cache.clear()
     with app.test_client() as client:
         yield client
 
@@ -21,6 +45,7 @@ def test_listar_alunos(mock_connect_db, client):
 @patch('routes.aluno.connect_db')
 def test_criar_aluno(mock_connect_db, client):
     mock_connect_db.return_value.cursor.return_value.rowcount = 1
+    mock_connect_db.return_value.cursor.return_value.fetchone.return_value = (7,)
     response = client.post('/alunos/', json={
         "nome_completo": "Maria Oliveira",
         "data_nascimento": "2010-08-15",
@@ -31,7 +56,7 @@ def test_criar_aluno(mock_connect_db, client):
         "informacoes_adicionais": "Sem alergias"
     })
     assert response.status_code == 201
-    assert response.json['message'] == "Aluno criado com sucesso!"
+    assert response.json == {"message": "Aluno criado com sucesso!", "id_aluno": 7}
 
 @patch('routes.aluno.connect_db')
 def test_atualizar_aluno(mock_connect_db, client):
@@ -74,15 +99,19 @@ def test_listar_turmas(mock_connect_db, client):
 @patch('routes.usuario.connect_db')
 def test_listar_usuarios(mock_connect_db, client):
     mock_connect_db.return_value.cursor.return_value.fetchall.return_value = [
-        (1, "admin", "hashed_password", "administrador", None)
+        (1, "admin", "administrador", None)
     ]
     response = client.get('/usuarios/')
     assert response.status_code == 200
     assert len(response.json) == 1
+    assert response.json[0]["nivel_acesso"] == "administrador"
+    sql = mock_connect_db.return_value.cursor.return_value.execute.call_args[0][0]
+    assert "senha" not in sql and "*" not in sql
 
 @patch('routes.usuario.connect_db')
 def test_criar_usuario(mock_connect_db, client):
     mock_connect_db.return_value.cursor.return_value.rowcount = 1
+    mock_connect_db.return_value.cursor.return_value.fetchone.return_value = (3,)
     response = client.post('/usuarios/', json={
         "login": "novo_usuario",
         "senha": "nova_senha",
@@ -90,11 +119,713 @@ def test_criar_usuario(mock_connect_db, client):
         "id_professor": 1
     })
     assert response.status_code == 201
-    assert response.json['message'] == "Usuário criado com sucesso!"
+    assert response.json == {"message": "Usuário criado com sucesso!", "id_usuario": 3}
 
 @patch('routes.usuario.connect_db')
 def test_excluir_usuario(mock_connect_db, client):
     mock_connect_db.return_value.cursor.return_value.rowcount = 1
     response = client.delete('/usuarios/1')
     assert response.status_code == 200
-    assert response.json['message'] == "Usuário excluído com sucesso!"
\ No newline at end of file
+    assert response.json['message'] == "Usuário excluído com sucesso!"
+
+# Testes para o pool de conexões
+def _fake_conn():
+    conn = MagicMock()
+    conn.closed = 0
+    conn.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+@patch('db.psycopg2.connect')
+def test_pool_reutiliza_conexao(mock_connect):
+    mock_connect.side_effect = lambda **kw: _fake_conn()
+    pool = ConnectionPool(minconn=1, maxconn=2, timeout=0.1, max_lifetime=0, check_idle=60)
+    conn = pool.getconn()
+    raw = conn.raw
+    conn.close()
+    assert pool.getconn().raw is raw
+    assert mock_connect.call_count == 1
+    assert pool.stats()["in_use"] == 1
+
+@patch('db.psycopg2.connect')
+def test_pool_timeout_e_descarte(mock_connect):
+    mock_connect.side_effect = lambda **kw: _fake_conn()
+    pool = ConnectionPool(minconn=0, maxconn=1, timeout=0.05, max_lifetime=0, check_idle=60)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    conn.raw.closed = 1
+    conn.close()
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["discarded"] == 1
+    assert stats["idle"] == 0
+
+# Testes para a paginação por cursor
+@patch('routes.turma.connect_db')
+def test_listar_turmas_paginado(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchall.return_value = [
+        (1, "Turma A", 1, "08:00 - 12:00"),
+        (2, "Turma B", 2, "13:00 - 17:00")
+    ]
+    response = client.get('/turmas/?limit=1')
+    assert response.status_code == 200
+    assert len(response.json) == 1
+    assert decode_cursor(response.headers['X-Next-Cursor'], ("id_turma",)) == [1]
+    assert 'rel="next"' in response.headers['Link']
+
+    cursor.fetchall.return_value = [(2, "Turma B", 2, "13:00 - 17:00")]
+    response = client.get('/turmas/?limit=1&after=' + encode_cursor([1]))
+    sql, params = cursor.execute.call_args[0]
+    assert "WHERE (id_turma) > (%s)" in sql
+    assert params == [1, 2]
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_listar_cursor_invalido(client):
+    response = client.get('/presencas/?after=nao-e-um-cursor')
+    assert response.status_code == 400
+    response = client.get('/presencas/?limit=0')
+    assert response.status_code == 400
+
+# Testes para a exportação em streaming
+@patch('streaming.connect_db')
+def test_exportar_presencas_ndjson(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchmany.side_effect = [[(1, 1, "2025-03-20", True), (2, 2, "2025-03-20", False)], []]
+    response = client.get('/presencas/', headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    linhas = response.get_data(as_text=True).splitlines()
+    assert [json.loads(linha)["id_presenca"] for linha in linhas] == [1, 2]
+    assert mock_connect_db.return_value.cursor.call_args.kwargs["name"].startswith("stream_")
+    mock_connect_db.return_value.close.assert_called_once()
+
+@patch('streaming.connect_db')
+def test_exportar_pagamentos_array(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchmany.side_effect = [[(1, 1, "2025-03-15", 500, "Cartão", "Mensalidade", "Pago")], [(2, 2, "2025-03-16", 500, "Boleto", None, "Pendente")], []]
+    response = client.get('/pagamentos/?stream=1')
+    assert response.status_code == 200
+    assert [p["id_pagamento"] for p in response.json] == [1, 2]
+
+@patch('streaming.connect_db')
+def test_exportacao_devolve_conexao_sem_iterar_o_corpo(mock_connect_db, client):
+    conn = mock_connect_db.return_value
+    response = client.head('/presencas/?stream=1')
+    assert response.status_code == 200
+    # O servidor WSGI chama close() no corpo, que no HEAD nunca é iterado
+    response.close()
+    conn.close.assert_called_once()
+    conn.cursor.return_value.close.assert_called_once()
+
+    # Fechada antes do primeiro pedaço (cliente desconectou)
+    conn.reset_mock()
+    response = client.get('/presencas/?stream=1', buffered=False)
+    response.close()
+    conn.close.assert_called_once()
+    conn.cursor.return_value.fetchmany.assert_not_called()
+
+# Testes para a chamada em lote
+@patch('routes.presenca.execute_values')
+@patch('routes.presenca.connect_db')
+def test_criar_presencas_lote(mock_connect_db, mock_execute_values, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    # Turma dos alunos; depois, o id da presença que já tinha o mesmo valor
+    cursor.fetchall.side_effect = [[(1, 1), (2, 1), (3, 2), (5, 1)], [(5, 12)]]
+    # Upsert: aluno 1 inserido, aluno 2 trocado de valor, aluno 5 inalterado (não volta)
+    mock_execute_values.side_effect = [[(1, 11, True), (2, 10, False)], None]
+    response = client.post('/presencas/lote', json={
+        "id_turma": "1",
+        "data_presenca": "2025-03-21",
+        "registros": [
+            {"id_aluno": 1, "presente": True},
+            {"id_aluno": 2, "presente": False},
+            {"id_aluno": 3, "presente": True},
+            {"id_aluno": 4, "presente": True},
+            {"id_aluno": 1, "presente": False},
+            {"id_aluno": 5, "presente": True}
+        ]
+    })
+    assert response.status_code == 200
+    assert (response.json["criados"], response.json["atualizados"], response.json["rejeitados"]) == (1, 2, 3)
+    assert [r["status"] for r in response.json["resultados"]] == ["criado", "atualizado", "rejeitado", "rejeitado", "rejeitado", "atualizado"]
+    assert [r.get("id_presenca") for r in response.json["resultados"]] == [11, 10, None, None, None, 12]
+    assert "ON CONFLICT (id_aluno, data_presenca) DO UPDATE" in mock_execute_values.call_args_list[0][0][1]
+    assert mock_execute_values.call_args[0][2] == [
+        (1, "2025-03-21", True, 1), (2, "2025-03-21", True, -1), (2, "2025-03-21", False, 1)
+    ]
+    mock_connect_db.return_value.commit.assert_called_once()
+
+    assert client.post('/presencas/lote', json={"id_turma": "um", "data_presenca": "2025-03-21",
+                                                "registros": []}).status_code == 400
+
+# Testes para a importação de pagamentos
+@patch('routes.pagamento.connect_db')
+def test_importar_pagamentos(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.rowcount = 2
+    cursor.fetchall.return_value = [(3, "Aluno não encontrado")]
+    csv = "status,id_aluno,data_pagamento,valor_pago,forma_pagamento,referencia\nPago,1,2025-04-10,500.00,Pix,Abril\nPago,999,2025-04-10,500.00,Pix,Abril\n"
+    response = client.post('/pagamentos/importar', data={"arquivo": (io.BytesIO(csv.encode()), "pagamentos.csv")})
+    assert response.status_code == 200
+    assert response.json["linhas_rejeitadas"] == [{"linha": 3, "motivo": "Aluno não encontrado"}]
+    sql, arquivo = cursor.copy_expert.call_args[0]
+    assert "(status, id_aluno, data_pagamento, valor_pago, forma_pagamento, referencia)" in sql
+    mock_connect_db.return_value.commit.assert_called_once()
+
+@patch('routes.pagamento.green_enabled', return_value=True)
+@patch('routes.pagamento.execute_values')
+@patch('routes.pagamento.connect_db')
+def test_importar_pagamentos_modo_assincrono_sem_copy(mock_connect_db, mock_execute_values, _green, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.rowcount = 2
+    cursor.fetchall.return_value = []
+    csv = 'id_aluno,data_pagamento,valor_pago,forma_pagamento,referencia,status\n1,2025-04-10,500.00,Pix,,Pago\n2,2025-04-10,450.00,Boleto,"Abril, material",Pago\n'
+    response = client.post('/pagamentos/importar', data=csv, content_type="text/csv")
+    assert response.status_code == 200
+    cursor.copy_expert.assert_not_called()
+    _, sql, linhas = mock_execute_values.call_args_list[0][0]
+    assert sql.startswith("INSERT INTO pagamento_importacao (id_aluno,")
+    assert linhas == [["1", "2025-04-10", "500.00", "Pix", None, "Pago"],
+                      ["2", "2025-04-10", "450.00", "Boleto", "Abril, material", "Pago"]]
+
+def test_importar_pagamentos_cabecalho_invalido(client):
+    response = client.post('/pagamentos/importar', data="id_aluno,valor\n1,2\n", content_type="text/csv")
+    assert response.status_code == 400
+
+# Testes para as migrações
+def test_migracoes_ordenadas_e_comandos_separados():
+    migracoes = discover()
+    assert [versao for versao, _, _ in migracoes] == sorted(versao for versao, _, _ in migracoes)
+    caminho = next(c for _, nome, c in migracoes if nome == "indices_consultas")
+    with open(caminho, encoding="utf-8") as f:
+        sql = f.read()
+    assert sql.startswith(NO_TRANSACTION)
+    comandos = split_statements(sql)
+    assert len(comandos) == 4
+    assert all(c.startswith("CREATE") and "CONCURRENTLY" in c for c in comandos)
+    assert concurrent_indexes(comandos) == ["uq_presenca_aluno_data", "idx_pagamento_aluno_status_data",
+                                            "idx_aluno_turma", "idx_atividade_aluno_aluno"]
+
+# Testes para o cache das tabelas de referência
+@patch('routes.professor.connect_db')
+def test_listar_professores_cache_e_invalidacao(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchall.return_value = [(1, "Ana Souza", "ana.souza@escola.com", "11987654321")]
+    cursor.fetchone.return_value = (7, None)
+    assert len(client.get('/professores/').json) == 1
+    assert len(client.get('/professores/').json) == 1
+    # PREPARE da leitura da versão na conexão; a segunda listagem só lê a versão, a página vem do cache
+    assert cursor.execute.call_count == 4
+
+    cursor.rowcount = 1
+    client.put('/professores/1', json={"nome_completo": "Ana", "email": "ana@escola.com", "telefone": "1"})
+    client.get('/professores/')
+    assert cursor.execute.call_count == 7
+
+def test_cache_ttl_e_lru():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(("turma", 1), "a")
+    cache.set(("turma", 2), "b")
+    cache.get(("turma", 1))
+    cache.set(("professor", 1), "c")
+    assert cache.get(("turma", 2)) is None
+    assert cache.get(("turma", 1)) == "a"
+    cache.invalidate("turma")
+    assert cache.get(("turma", 1)) is None
+    assert cache.stats()["evictions"] == 1
+
+    expirado = TTLCache(maxsize=2, ttl=-1)
+    expirado.set(("turma", 1), "a")
+    assert expirado.get(("turma", 1)) is None
+
+# Testes para o GET condicional
+@patch('routes.aluno.connect_db')
+def test_listar_alunos_etag_304(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchone.return_value = (42, datetime(2025, 3, 20, 10, 0, tzinfo=timezone.utc))
+    cursor.fetchall.return_value = [
+        (1, "João Silva", "2010-05-22", 1, "Maria Silva", "11987654322", "maria.silva@gmail.com", "Sem alergias")
+    ]
+    response = client.get('/alunos/')
+    etag = response.headers['ETag']
+    assert response.status_code == 200
+    assert 'aluno-42-' in etag
+    assert response.headers['Last-Modified'] == "Thu, 20 Mar 2025 10:00:00 GMT"
+
+    cursor.execute.reset_mock()
+    response = client.get('/alunos/', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert cursor.execute.call_count == 1
+
+    # Só a data não basta: alterado_em não é a hora do commit
+    response = client.get('/alunos/', headers={"If-Modified-Since": "Fri, 21 Mar 2025 10:00:00 GMT"})
+    assert response.status_code == 200
+
+    cursor.fetchone.return_value = (43, datetime(2025, 3, 21, 10, 0, tzinfo=timezone.utc))
+    response = client.get('/alunos/', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+@patch('routes.presenca.connect_db')
+def test_listar_presencas_por_turma_etag_inclui_aluno(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    alterado = datetime(2025, 3, 20, 10, 0, tzinfo=timezone.utc)
+    linhas = [(1, 1, date(2025, 3, 20), True)]
+    cursor.fetchall.side_effect = [[("presenca", 5, alterado), ("aluno", 7, alterado)], linhas]
+    response = client.get('/presencas/?id_turma=1')
+    etag = response.headers['ETag']
+    assert 'presenca+aluno-5.7-' in etag
+
+    # Aluno trocado de turma: presenca não mudou, mas a versão de aluno sim
+    cursor.fetchall.side_effect = [[("presenca", 5, alterado), ("aluno", 8, alterado)], linhas]
+    response = client.get('/presencas/?id_turma=1', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+# Testes para as métricas
+@patch('routes.usuario.connect_db')
+def test_metrics_endpoint(mock_connect_db, client):
+    mock_connect_db.return_value.cursor.return_value.fetchall.return_value = []
+    client.get('/usuarios/')
+    client.get('/rota-inexistente')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    corpo = response.get_data(as_text=True)
+    assert 'lumina_http_request_duration_seconds_count{blueprint="usuario",endpoint="usuario.listar_usuarios",method="GET"}' in corpo
+    assert 'lumina_http_errors_total{blueprint="app",endpoint="desconhecido",method="GET",status="404"}' in corpo
+    assert 'lumina_http_requests_in_progress 0.0' in corpo
+
+def test_timed_cursor_acumula_tempo_do_banco():
+    cursor = MagicMock()
+    timed = TimedCursor(cursor)
+    reset_db_time()
+    timed.execute("SELECT 1")
+    timed.itersize = 500
+    assert cursor.execute.called
+    assert cursor.itersize == 500
+    assert db_time() > 0
+
+# Testes para o modo assíncrono (gevent)
+def test_modo_assincrono_registra_espera_cooperativa():
+    assert not db.green_enabled()
+    db.enable_green()
+    try:
+        assert extensions.get_wait_callback() is db._gevent_wait
+        assert db.green_enabled()
+    finally:
+        extensions.set_wait_callback(None)
+
+# Testes para o pool após fork
+@patch('db.psycopg2.connect')
+def test_pool_recriado_apos_fork(mock_connect):
+    mock_connect.side_effect = lambda **kw: _fake_conn()
+    with patch.object(db, '_pool', None), patch.object(db, '_inherited_pools', []):
+        pai = db.get_pool()
+        assert db.get_pool() is pai
+        with patch('db.os.getpid', return_value=-1):
+            filho = db.get_pool()
+        assert filho is not pai
+        assert db._inherited_pools == [pai]
+        assert not pai.stats()["discarded"]
+
+# Testes para o relatório de presenças
+@patch('routes.presenca.connect_db')
+def test_relatorio_presencas(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchall.return_value = [(1, "João Silva", 18, 2), (3, "Pedro Lima", 0, 0)]
+    response = client.get('/presencas/relatorio?id_turma=1&mes=2025-03')
+    assert response.status_code == 200
+    assert (response.json["presentes"], response.json["ausentes"], response.json["taxa_presenca"]) == (18, 2, 0.9)
+    assert [a["taxa_presenca"] for a in response.json["alunos"]] == [0.9, None]
+    sql, params = cursor.execute.call_args[0]
+    assert "presenca_resumo_mensal" in sql
+    assert params == (date(2025, 3, 1), 1)
+
+def test_relatorio_presencas_parametros_invalidos(client):
+    assert client.get('/presencas/relatorio?id_turma=1&mes=03-2025').status_code == 400
+    assert client.get('/presencas/relatorio?mes=2025-03').status_code == 400
+
+@patch('routes.presenca.execute_values')
+@patch('routes.presenca.connect_db')
+def test_excluir_presenca_atualiza_resumo(mock_connect_db, mock_execute_values, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchone.return_value = (1, date(2025, 3, 20), True)
+    response = client.delete('/presencas/5')
+    assert response.status_code == 200
+    assert mock_execute_values.call_args[0][2] == [(1, date(2025, 3, 20), True, -1)]
+
+    cursor.fetchone.return_value = None
+    assert client.delete('/presencas/5').status_code == 404
+
+@patch('routes.presenca.execute_values')
+@patch('routes.presenca.connect_db')
+def test_patch_presenca_altera_so_o_campo_enviado(mock_connect_db, mock_execute_values, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    # Linha atualizada seguida dos valores anteriores (CTE com FOR UPDATE)
+    cursor.fetchone.return_value = (5, 1, date(2025, 3, 20), False, 1, date(2025, 3, 20), True)
+    response = client.patch('/presencas/5', json={"presente": False})
+    assert response.status_code == 200
+    assert response.json == {"id_presenca": 5, "id_aluno": 1, "data_presenca": "2025-03-20", "presente": False}
+    (preparo,), (sql, params) = [c[0] for c in cursor.execute.call_args_list[:2]]
+    assert preparo.startswith("PREPARE presenca_patch_2 AS WITH anterior")
+    assert "SET presente = $2 FROM anterior" in preparo and "FOR UPDATE" in preparo
+    assert sql == "EXECUTE presenca_patch_2 (%s, %s, %s)"
+    assert params == [5, False, 5]
+    assert mock_execute_values.call_args[0][2] == [(1, date(2025, 3, 20), True, -1), (1, date(2025, 3, 20), False, 1)]
+    mock_connect_db.return_value.commit.assert_called_once()
+
+    cursor.fetchone.return_value = None
+    assert client.patch('/presencas/5', json={"presente": True}).status_code == 404
+
+@patch('routes.usuario.connect_db')
+def test_patch_usuario_lista_branca(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchone.return_value = (3, "carlos", "administrador", None)
+    response = client.patch('/usuarios/3', json={"nivel_acesso": "administrador", "senha": "nova"})
+    assert response.status_code == 200
+    assert response.json == {"id_usuario": 3, "login": "carlos", "nivel_acesso": "administrador", "id_professor": None}
+    sql, params = cursor.execute.call_args[0]
+    assert sql.startswith("UPDATE usuario SET senha = %s, nivel_acesso = %s WHERE id_usuario = %s")
+    assert sql.endswith("RETURNING id_usuario, login, nivel_acesso, id_professor")
+    assert params == ["nova", "administrador", 3]
+
+    assert client.patch('/usuarios/3', json={"id_usuario": 9}).status_code == 400
+    assert client.patch('/usuarios/3', json={}).status_code == 400
+
+# Testes para o resumo financeiro
+@patch('routes.pagamento.connect_db')
+def test_resumo_pagamentos(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchall.return_value = [
+        (date(2025, 3, 1), "Pago", 2, Decimal("1000.00")),
+        (date(2025, 3, 1), "Pendente", 1, Decimal("500.50"))
+    ]
+    response = client.get('/pagamentos/resumo?agrupar=status,mes&mes_inicio=2025-01&forma_pagamento=Pix')
+    assert response.status_code == 200
+    assert response.json["quantidade"] == 3
+    assert Decimal(str(response.json["total"])) == Decimal("1500.50")
+    assert response.json["grupos"][0]["mes"] == "2025-03"
+    assert response.json["grupos"][1]["status"] == "Pendente"
+    sql, params = cursor.execute.call_args[0]
+    assert "GROUP BY mes, status" in sql
+    assert params == [date(2025, 1, 1), "Pix"]
+
+def test_resumo_pagamentos_dimensao_invalida(client):
+    assert client.get('/pagamentos/resumo?agrupar=id_aluno').status_code == 400
+    assert client.get('/pagamentos/resumo?mes_fim=2025').status_code == 400
+
+# Testes para o perfil completo do aluno
+@patch('routes.aluno.connect_db')
+def test_perfil_aluno(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchone.return_value = (json.dumps({
+        "id_aluno": 1, "nome_completo": "João Silva",
+        "turma": {"id_turma": 1, "nome_turma": "Turma A", "horario": "08:00 - 12:00"},
+        "professor": {"id_professor": 1, "nome_completo": "Ana Souza"},
+        "pagamentos_recentes": [{"id_pagamento": 1, "valor_pago": 500.10}],
+        "presencas": {"presentes": 18, "ausentes": 2, "meses": []},
+        "atividades": []
+    }),)
+    response = client.get('/alunos/1/completo?pagamentos=500')
+    assert response.status_code == 200
+    assert response.json["turma"]["nome_turma"] == "Turma A"
+    assert Decimal(str(response.json["pagamentos_recentes"][0]["valor_pago"])) == Decimal("500.10")
+    assert cursor.execute.call_count == 1
+    assert cursor.execute.call_args[0][1] == {"id": 1, "pagamentos": 120, "meses": 12}
+
+    cursor.fetchone.return_value = None
+    assert client.get('/alunos/99/completo').status_code == 404
+
+# Testes para os filtros e a ordenação das listagens
+@patch('routes.pagamento.connect_db')
+def test_listar_pagamentos_filtros_e_ordenacao(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchall.return_value = [
+        (7, 1, date(2025, 3, 15), Decimal("500.00"), "Boleto", None, "Pendente"),
+        (3, 1, date(2025, 3, 10), Decimal("500.00"), "Boleto", None, "Pendente")
+    ]
+    response = client.get('/pagamentos/?status=Pendente&data_inicio=2025-03-01&order_by=-data_pagamento&limit=1')
+    assert response.status_code == 200
+    sql, params = cursor.execute.call_args[0]
+    assert "WHERE status = %s AND data_pagamento >= %s" in sql
+    assert sql.endswith("ORDER BY data_pagamento DESC, id_pagamento DESC LIMIT %s")
+    assert params == ["Pendente", date(2025, 3, 1), 2]
+    proximo = response.headers['X-Next-Cursor']
+    assert decode_cursor(proximo, ("data_pagamento", "id_pagamento"))[1] == 7
+
+    client.get(f'/pagamentos/?status=Pendente&order_by=-data_pagamento&after={proximo}')
+    sql, params = cursor.execute.call_args[0]
+    assert "(data_pagamento, id_pagamento) < (%s, %s)" in sql
+
+def test_listar_filtro_ou_ordenacao_invalidos(client):
+    assert client.get('/alunos/?id_turma=abc').status_code == 400
+    assert client.get('/presencas/?data_fim=31-03-2025').status_code == 400
+    response = client.get('/pagamentos/?order_by=senha')
+    assert response.status_code == 400
+    assert "order_by" in response.json["error"]
+
+# Testes para a seleção de campos (fields=)
+@patch('routes.aluno.connect_db')
+def test_listar_alunos_fields(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchall.return_value = [(1, "João Silva"), (2, "Maria Souza")]
+    response = client.get('/alunos/?fields=nome_completo&limit=1')
+    assert response.status_code == 200
+    assert response.json == [{"id_aluno": 1, "nome_completo": "João Silva"}]
+    assert cursor.execute.call_args[0][0].startswith("SELECT id_aluno, nome_completo FROM aluno")
+    assert decode_cursor(response.headers['X-Next-Cursor'], ("id_aluno",)) == [1]
+
+    cursor.fetchall.return_value = [(1, date(2015, 4, 2))]
+    response = client.get('/alunos/?fields=data_nascimento&order_by=data_nascimento')
+    assert response.json == [{"id_aluno": 1, "data_nascimento": "2015-04-02"}]
+
+def test_listar_fields_invalido(client):
+    response = client.get('/usuarios/?fields=login,senha')
+    assert response.status_code == 400
+    assert "fields" in response.json["error"]
+
+# Testes para o provedor de JSON
+@pytest.mark.parametrize("provider_class", [IsoJSONProvider, OrjsonProvider])
+def test_json_datas_iso_e_decimal_numerico(provider_class):
+    provider = provider_class(app)
+    texto = provider.dumps({
+        "data": date(2025, 3, 15),
+        "momento": datetime(2025, 3, 15, 8, 30, tzinfo=timezone.utc),
+        "valor": Decimal("500.10"),
+        "grande": Decimal("12345678901234567.89")
+    })
+    dados = json.loads(texto, parse_float=Decimal)
+    assert dados["data"] == "2025-03-15"
+    assert dados["momento"].startswith("2025-03-15T08:30:00")
+    assert dados["valor"] == Decimal("500.10")
+    assert dados["grande"] == "12345678901234567.89"
+
+# Testes para a compressão das respostas
+@patch('routes.pagamento.connect_db')
+def test_listagem_comprimida_com_gzip(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchone.return_value = (3, None)
+    cursor.fetchall.return_value = [
+        (i, 1, date(2025, 3, 15), Decimal("500.00"), "Boleto", "Mensalidade", "Pago") for i in range(1, 51)
+    ]
+    response = client.get('/pagamentos/', headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(json.loads(gzip.decompress(response.data))) == 50
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"pagamento-3-')
+
+    response = client.get('/pagamentos/', headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+
+    cursor.fetchall.return_value = cursor.fetchall.return_value[:1]
+    response = client.get('/pagamentos/', headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+@patch('streaming.connect_db')
+def test_exportacao_comprimida_por_pedacos(mock_connect_db, client):
+    cursor = mock_connect_db.return_value.cursor.return_value
+    cursor.fetchmany.side_effect = [[(1, 1, "2025-03-20", True)], [(2, 2, "2025-03-20", False)], []]
+    response = client.get('/presencas/', headers={"Accept": "application/x-ndjson", "Accept-Encoding": "gzip"})
+    assert response.is_streamed
+    assert response.headers["Content-Encoding"] == "gzip"
+    linhas = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(linha)["id_presenca"] for linha in linhas] == [1, 2]
+
+# Testes para os logs
+def test_request_id_propagado(client):
+    response = client.get('/', headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+    response = client.get('/', headers={"X-Request-ID": "inválido com espaços"})
+    assert len(response.headers["X-Request-ID"]) == 32
+
+def test_log_json_e_amostragem():
+    record = logging.LogRecord("routes.aluno", logging.INFO, __file__, 1, "READ: Listagem de %s alunos", (3,), None)
+    record.request_id = "abc-123"
+    linha = json.loads(JsonFormatter().format(record))
+    assert linha["message"] == "READ: Listagem de 3 alunos"
+    assert linha["request_id"] == "abc-123"
+
+    assert SamplingFilter(0.0).filter(record)
+    record.sampled = True
+    assert not SamplingFilter(0.0).filter(record)
+    assert SamplingFilter(1.0).filter(record)
+    record.levelno = logging.ERROR
+    assert SamplingFilter(0.0).filter(record)
+
+def test_log_thread_de_escrita_so_no_primeiro_registro_apos_fork():
+    log_config.stop_listener()
+    log_config._restart_after_fork()
+    # Processo filho que não registra nada (ex.: carga do seed.py) não ganha thread
+    assert log_config._listener is None
+    logging.getLogger("teste").warning("primeiro registro do processo")
+    assert log_config._listener is not None and not log_config._handler.start_on_emit
+
+# Testes para a documentação Swagger
+def test_apispec_documenta_rotas(client):
+    paths = client.get('/apispec.json').json["paths"]
+    assert "/alunos/{id}/completo" in paths
+    assert "/metrics" not in paths and "/health" not in paths
+
+def test_apispec_pre_gerada_sem_swagger_ui(tmp_path, monkeypatch):
+    arquivo = tmp_path / "apispec.json"
+    arquivo.write_text(json.dumps({"swagger": "2.0", "paths": {}}))
+    monkeypatch.setattr(apidocs, "SWAGGER_ENABLED", False)
+    monkeypatch.setattr(apidocs, "APISPEC_FILE", str(arquivo))
+    outra = Flask(__name__)
+    assert apidocs.init_docs(outra) is None
+    cliente = outra.test_client()
+    assert cliente.get('/apispec.json').json == {"swagger": "2.0", "paths": {}}
+    assert cliente.get('/apidocs/').status_code == 404
+
+# Testes para o gerador de dados sintéticos
+def test_gerador_deterministico_e_chaves_validas():
+    def plano(seed):
+        return Plano(seed, 3, 4, inicio_periodo(date(2025, 6, 30), 1), date(2025, 6, 30), 2)
+
+    a, b = plano(7), plano(7)
+    assert list(a.alunos_(1, a.alunos)) == list(b.alunos_(1, b.alunos))
+    # Faixas diferentes (outra divisão entre processos) geram as mesmas linhas
+    presencas = list(a.presencas(1, a.alunos))
+    assert presencas == list(b.presencas(1, 5)) + list(b.presencas(6, b.alunos))
+    assert list(plano(8).presencas(1, 1)) != presencas[:len(a.dias)]
+
+    assert [p[0] for p in presencas] == list(range(1, a.alunos * len(a.dias) + 1))
+    assert len({(p[1], p[2]) for p in presencas}) == len(presencas)
+    assert {t[2] for t in a.turmas_()} == {p[0] for p in a.professores()}
+    assert {al[3] for al in a.alunos_(1, a.alunos)} == {t[0] for t in a.turmas_()}
+    pares = list(a.atividades_alunos(1, a.alunos))
+    assert len(set(pares)) == len(pares) and all(1 <= at <= a.atividades for at, _ in pares)
+    assert all(a.inicio <= pg[2] <= a.fim for pg in a.pagamentos(1, a.alunos))
+
+# Testes para o lote de operações
+ALUNO_LOTE = {"nome_completo": "Maria Oliveira", "data_nascimento": "2020-08-15", "id_turma": 1,
+              "nome_responsavel": "Ana Oliveira", "telefone_responsavel": "11987654321",
+              "email_responsavel": "ana.oliveira@gmail.com"}
+
+def _comandos_lote(conn):
+    return [c[0][0] for c in conn.cursor.return_value.__enter__.return_value.execute.call_args_list]
+
+@patch('db.get_pool')
+def test_lote_atomico_com_referencia(mock_get_pool, client):
+    conn = mock_get_pool.return_value.getconn.return_value
+    cursor = conn.cursor.return_value
+    cursor.fetchone.return_value = (7,)
+    response = client.post('/batch', json={"operacoes": [
+        {"metodo": "POST", "caminho": "/alunos/", "corpo": ALUNO_LOTE},
+        {"metodo": "POST", "caminho": "/atividades_alunos/", "corpo": {"id_atividade": 2, "id_aluno": "$0.id_aluno"}}
+    ]})
+    assert response.status_code == 200
+    assert response.json["confirmado"] is True
+    assert [r["status"] for r in response.json["resultados"]] == [201, 201]
+    assert cursor.execute.call_args[0][1] == (2, 7)
+    assert _comandos_lote(conn) == ["SAVEPOINT operacao_lote", "RELEASE SAVEPOINT operacao_lote"] * 2
+    # Uma conexão e um commit para o lote inteiro
+    mock_get_pool.return_value.getconn.assert_called_once()
+    conn.commit.assert_called_once()
+    conn.close.assert_called_once()
+
+@patch('db.get_pool')
+def test_lote_atomico_desfeito_na_falha(mock_get_pool, client):
+    conn = mock_get_pool.return_value.getconn.return_value
+    conn.cursor.return_value.fetchone.return_value = (7,)
+    response = client.post('/batch', json={"modo": "atomico", "operacoes": [
+        {"metodo": "POST", "caminho": "/alunos/", "corpo": ALUNO_LOTE},
+        {"metodo": "POST", "caminho": "/turmas/", "corpo": {"nome_turma": "Turma C"}},
+        {"metodo": "DELETE", "caminho": "/alunos/$0.id_aluno"}
+    ]})
+    assert response.status_code == 400
+    assert response.json["confirmado"] is False
+    assert [r["status"] for r in response.json["resultados"]] == [201, 400, None]
+    assert _comandos_lote(conn)[-1] == "ROLLBACK TO SAVEPOINT operacao_lote"
+    conn.commit.assert_not_called()
+    conn.close.assert_called_once()
+
+@patch('db.get_pool')
+def test_lote_por_operacao_confirma_as_validas(mock_get_pool, client):
+    conn = mock_get_pool.return_value.getconn.return_value
+    conn.cursor.return_value.fetchone.return_value = (7,)
+    response = client.post('/batch', json={"modo": "por_operacao", "operacoes": [
+        {"metodo": "POST", "caminho": "/turmas/", "corpo": {"nome_turma": "Turma C"}},
+        {"metodo": "POST", "caminho": "/atividades_alunos/", "corpo": {"id_atividade": 2, "id_aluno": "$0.id_turma"}},
+        {"metodo": "POST", "caminho": "/alunos/", "corpo": ALUNO_LOTE}
+    ]})
+    assert response.status_code == 200
+    resultados = response.json["resultados"]
+    assert [r["status"] for r in resultados] == [400, 400, 201]
+    assert resultados[1]["corpo"] == {"error": "Referência inválida: $0.id_turma"}
+    assert resultados[2]["corpo"]["id_aluno"] == 7
+    conn.commit.assert_called_once()
+
+@patch('db.get_pool')
+def test_lote_preserva_contexto_da_requisicao(mock_get_pool, client):
+    labels = {"blueprint": "batch", "endpoint": "batch.executar_lote", "method": "POST"}
+    observadas = REGISTRY.get_sample_value("lumina_http_request_duration_seconds_count", labels) or 0
+    mock_get_pool.return_value.getconn.return_value.cursor.return_value.fetchone.return_value = (7,)
+    response = client.post('/batch', headers={"X-Request-ID": "outer"}, json={"operacoes": [
+        {"metodo": "POST", "caminho": "/alunos/", "corpo": ALUNO_LOTE},
+        {"metodo": "POST", "caminho": "/alunos/", "corpo": ALUNO_LOTE}
+    ]})
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "outer"
+    assert REGISTRY.get_sample_value("lumina_http_requests_in_progress") == 0
+    assert REGISTRY.get_sample_value("lumina_http_request_duration_seconds_count", labels) == observadas + 1
+
+@pytest.mark.parametrize("corpo", [
+    {"operacoes": []},
+    {"modo": "talvez", "operacoes": [{"metodo": "POST", "caminho": "/alunos/"}]},
+    {"operacoes": [{"metodo": "GET", "caminho": "/alunos/"}]},
+    {"operacoes": [{"metodo": "POST", "caminho": "/batch"}]},
+])
+def test_lote_invalido(corpo, client):
+    assert client.post('/batch', json=corpo).status_code == 400
+
+# Testes dos comandos preparados
+def test_comando_preparado_uma_vez_por_conexao():
+    comando = PreparedStatement("teste_buscar", "SELECT nome FROM aluno WHERE id_aluno = %s AND ativo = %s")
+    assert comando.prepare_sql == "PREPARE teste_buscar AS SELECT nome FROM aluno WHERE id_aluno = $1 AND ativo = $2"
+    cursor = MagicMock()
+    comando.execute(cursor, (1, True))
+    comando.execute(cursor, (2, True))
+    assert [c[0] for c in cursor.execute.call_args_list] == [
+        (comando.prepare_sql,),
+        ("EXECUTE teste_buscar (%s, %s)", (1, True)),
+        ("EXECUTE teste_buscar (%s, %s)", (2, True)),
+    ]
+
+    # Outra conexão prepara de novo; comando perdido na sessão é preparado e repetido na mesma chamada
+    outro = MagicMock()
+    outro.execute.side_effect = [None, None, errors.InvalidSqlStatementName("não existe"), None, None]
+    comando.execute(outro, (3, True))
+    comando.execute(outro, (4, True))
+    assert [c[0] for c in outro.execute.call_args_list[2:]] == [
+        ("EXECUTE teste_buscar (%s, %s)", (4, True)),
+        (comando.prepare_sql,),
+        ("EXECUTE teste_buscar (%s, %s)", (4, True)),
+    ]
+    # No início da transação não havia nada a preservar: ela é desfeita
+    outro.connection.rollback.assert_called_once()
+    assert (comando.prepares, comando.executions) == (3, 4)
+
+    # No meio da transação o EXECUTE vai sem savepoint; a perda falha a requisição
+    # e a próxima chamada prepara de novo
+    meio = MagicMock()
+    meio.connection.get_transaction_status.return_value = extensions.TRANSACTION_STATUS_INTRANS
+    comando.execute(meio, (5, True))
+    assert [c[0][0] for c in meio.execute.call_args_list] == [
+        "SAVEPOINT comando_preparado", comando.prepare_sql, "EXECUTE teste_buscar (%s, %s)"
+    ]
+    meio.execute.reset_mock()
+    meio.execute.side_effect = [errors.InvalidSqlStatementName("não existe"), None, None, None]
+    with pytest.raises(errors.InvalidSqlStatementName):
+        comando.execute(meio, (6, True))
+    assert [c[0][0] for c in meio.execute.call_args_list] == ["EXECUTE teste_buscar (%s, %s)"]
+    comando.execute(meio, (6, True))
+    assert meio.execute.call_args_list[2][0][0] == comando.prepare_sql
+
+    with pytest.raises(ValueError):
+        prepared("presenca_inserir", "SELECT 1")
+    assert prepared_stats()["statements"]["presenca_inserir"]["parses_saved"] >= 0
+